@@ -0,0 +1,186 @@
+import asyncio
+import collections
+import json
+import math
+import threading
+import time
+
+from starlette.routing import Match
+
+# =========================
+# Admission control & load shedding
+# =========================
+# Runs in front of the scoring routes, before the body is read or validated:
+#   1. per-client token bucket (keyed on the client address): over-eager clients get 429
+#      with a Retry-After computed from their bucket, without touching anyone else's budget
+#   2. in-flight cap: at most ``max_in_flight`` scoring requests run at once; up to
+#      ``max_queued`` more wait at most ``queue_timeout`` for a slot, the rest get 503 at once
+# Under overload the API answers the excess quickly instead of letting every request slow
+# down together until timeouts cascade.
+
+
+class TokenBuckets:
+    """Per-key token buckets, refilled lazily on access and bounded in number.
+
+    A bucket that would be full again is indistinguishable from a new one, so when there
+    are more than ``max_keys`` clients the least recently seen buckets are simply dropped.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Spend one token; returns 0.0 if allowed, else the seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1.0:
+                tokens, wait = tokens - 1.0, 0.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Rate limits and concurrency cap shared by every request of this worker process."""
+
+    def __init__(self, rate_per_second=50.0, burst=100, max_in_flight=32, max_queued=64,
+                 queue_timeout=0.25, paths=("/predict", "/explain", "/test_case")):
+        self.buckets = TokenBuckets(rate_per_second, burst) if rate_per_second > 0 else None
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.paths = tuple(paths)
+        # Everything below is only touched from the event loop, so it needs no lock
+        self._waiters = collections.deque()  # futures of requests waiting for a slot
+        self.in_flight = 0
+        # Bookkeeping, exported by /admin/admission and /metrics
+        self.admitted = 0
+        self.rejected = collections.Counter()  # reason -> count
+        self.queue_wait_total = 0.0
+        self.queue_wait_count = 0
+
+    def applies_to(self, path):
+        return path.startswith(self.paths)
+
+    async def acquire(self, client):
+        """Admit the request or return ``(status, detail, retry_after)`` for the rejection."""
+        if self.buckets is not None:
+            wait = self.buckets.take(client)
+            if wait:
+                self.rejected["rate_limited"] += 1
+                return 429, "Too many requests from this client.", max(1, math.ceil(wait))
+
+        if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.max_queued:
+            self.rejected["queue_full"] += 1
+            return 503, "Server busy: request queue is full.", 1
+
+        # Wait for release() to hand this request a slot (FIFO)
+        slot = asyncio.get_running_loop().create_future()
+        self._waiters.append(slot)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(slot, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not (slot.done() and not slot.cancelled()):
+                self.rejected["queue_timeout"] += 1
+                return 503, "Server busy: timed out waiting for a scoring slot.", 1
+            # The slot was handed over just as the wait timed out; it is ours, use it
+        except asyncio.CancelledError:
+            # Client gone (or shutdown) after release() handed us the slot: pass it on, or it
+            # stays counted in in_flight forever
+            if slot.done() and not slot.cancelled():
+                self.release()
+            raise
+        finally:
+            if slot in self._waiters:
+                self._waiters.remove(slot)
+            self.queue_wait_total += time.perf_counter() - started
+            self.queue_wait_count += 1
+        self.admitted += 1
+        return None
+
+    def release(self):
+        # Hand the slot straight to the oldest waiter, or free it
+        while self._waiters:
+            slot = self._waiters.popleft()
+            if not slot.done():
+                slot.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def stats(self):
+        return {
+            "rate_per_second": self.buckets.rate if self.buckets else None,
+            "burst": self.buckets.burst if self.buckets else None,
+            "tracked_clients": len(self.buckets) if self.buckets else 0,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "queue_timeout_ms": round(self.queue_timeout * 1000.0, 1),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "mean_queue_wait_ms": round(self.queue_wait_total / self.queue_wait_count * 1000.0, 3)
+            if self.queue_wait_count else 0.0,
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to the scoring routes."""
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.applies_to(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        client = scope.get("client")
+        rejection = await self.controller.acquire(client[0] if client else "unknown")
+        if rejection is not None:
+            status, detail, retry_after = rejection
+            # Routing has not run yet; resolve the route so metrics label the rejection by template
+            app = scope.get("app")
+            for route in getattr(getattr(app, "router", None), "routes", ()):
+                if route.matches(scope)[0] == Match.FULL:
+                    scope["route"] = route
+                    break
+            body = json.dumps({"detail": detail}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        # Handlers time body parsing + validation from here, so queue wait stays out of that stage
+        scope.setdefault("state", {})["admitted_at"] = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -0,0 +1,248 @@
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# =========================
+# Prediction audit trail
+# =========================
+# Request handlers only put the scored arrays on a bounded in-memory queue. A background
+# writer thread turns them into rows and inserts whole batches into an append-only SQLite
+# table, one transaction per batch, so a prediction never waits on disk. When the queue is
+# full (disk stalled), rows are dropped and counted instead of blocking requests.
+#
+# The database runs in WAL mode, so several API workers can append to the same file while
+# /admin/predictions reads from it.
+#
+# Rows hold patient feature vectors, so nothing touches disk until start() (the API's startup
+# event), rows older than ``retention_days`` are deleted by the writer thread, and the client
+# address is only stored with ``record_clients=True``.
+
+_STOP = object()
+PRUNE_INTERVAL_SECONDS = 3600.0  # how often the writer deletes rows past the retention limit
+
+
+class AuditTrail:
+    """Append-only, asynchronously bulk-written history of predictions.
+
+    One row per scored patient: time, endpoint, client (NULL unless ``record_clients``), model
+    version, the feature values (one column per feature, NULL when missing), the prediction,
+    its probability and the request latency. ``retention_days=0`` keeps rows forever.
+    """
+
+    def __init__(self, path, feature_names, max_queue_rows=100000, batch_rows=1000, flush_seconds=1.0,
+                 retention_days=30.0, record_clients=False, log=None):
+        for name in feature_names:
+            if not name.isidentifier():
+                raise ValueError(f"Feature name '{name}' cannot be used as a column name.")
+        self.path = path
+        self.feature_names = list(feature_names)
+        self.max_queue_rows = max_queue_rows
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.retention_days = retention_days
+        self.record_clients = record_clients
+        self._queue = queue.Queue()
+        self._queued_rows = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._log = log or (lambda event, data=None, is_error=False: None)
+        # Writer bookkeeping, exported by /admin/audit and /metrics
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.last_flush_ms = 0.0
+        self.pruned = 0
+        self._next_prune = 0.0
+
+        self._insert = (
+            f"INSERT INTO predictions (ts, endpoint, client, model_version, prediction, probability, latency_ms, "
+            f"{', '.join('f_' + name for name in self.feature_names)}) "
+            f"VALUES ({', '.join('?' * (7 + len(self.feature_names)))})"
+        )
+
+    def _create(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        columns = ", ".join(f"f_{name} REAL" for name in self.feature_names)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, endpoint TEXT NOT NULL, client TEXT, "
+                f"model_version TEXT, prediction TEXT NOT NULL, probability REAL NOT NULL, latency_ms REAL, {columns})"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS predictions_ts ON predictions (ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS predictions_model_version ON predictions (model_version, ts)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # Generous busy timeout: other API workers may be committing a batch to the same file
+        return sqlite3.connect(self.path, timeout=30.0)
+
+    # -------- request side --------
+    def record(self, endpoint, client, model_version, X, labels, probabilities, latency_ms):
+        """Queue one audit row per row of ``X``. Never blocks; returns False if the rows were dropped."""
+        n = len(X)
+        with self._lock:
+            if self._queued_rows + n > self.max_queue_rows:
+                self.dropped += n
+                return False
+            self._queued_rows += n
+        # Arrays are queued as they are; turning them into table rows is the writer's job
+        self._queue.put((time.time(), endpoint, client if self.record_clients else None, model_version,
+                         X, labels, probabilities, latency_ms))
+        return True
+
+    # -------- writer thread --------
+    @staticmethod
+    def _rows(item):
+        ts, endpoint, client, model_version, X, labels, probabilities, latency_ms = item
+        return [
+            (ts, endpoint, client, model_version, str(label), float(p), latency_ms,
+             *(None if math.isnan(v) else v for v in row))
+            for row, label, p in zip(X.tolist(), labels, probabilities)
+        ]
+
+    def _write(self, conn, rows):
+        started = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(self._insert, rows)
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            self.dropped += len(rows)
+            self._log("Audit trail write failed", str(e), is_error=True)
+        else:
+            self.written += len(rows)
+            self.batches += 1
+        finally:
+            self.last_flush_ms = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                self._queued_rows -= len(rows)
+
+    def _prune(self, conn):
+        """Delete rows past the retention limit, at most once per PRUNE_INTERVAL_SECONDS."""
+        if not self.retention_days or time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+        try:
+            with conn:
+                cursor = conn.execute("DELETE FROM predictions WHERE ts < ?",
+                                      (time.time() - self.retention_days * 86400.0,))
+        except sqlite3.Error as e:
+            self._log("Audit trail pruning failed", str(e), is_error=True)
+        else:
+            self.pruned += cursor.rowcount
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            stop = False
+            while not stop:
+                self._prune(conn)
+                try:
+                    # Wake up now and then even without traffic, so old rows still expire
+                    item = self._queue.get(timeout=PRUNE_INTERVAL_SECONDS)
+                except queue.Empty:
+                    continue
+                if item is _STOP:
+                    break
+                # Wait up to flush_seconds for more rows, so a trickle of requests still
+                # produces batched inserts rather than one transaction per prediction
+                rows = self._rows(item)
+                deadline = time.monotonic() + self.flush_seconds
+                while len(rows) < self.batch_rows:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    rows.extend(self._rows(item))
+                self._write(conn, rows)
+            # Shutdown: whatever is still queued is written before the thread exits
+            rows = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    rows.extend(self._rows(item))
+            if rows:
+                self._write(conn, rows)
+        finally:
+            conn.close()
+
+    def start(self):
+        """Create the database if needed and start the writer thread."""
+        if self._thread is None:
+            self._create()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=10.0):
+        """Flush every queued row and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # -------- queries --------
+    def recent(self, limit=100, model_version=None, since=None):
+        """Most recent rows first, as dicts (feature values under ``input``)."""
+        if self._thread is None:
+            return []  # not started: the database may not exist yet, and connecting would create it
+        where, params = [], []
+        if model_version:
+            where.append("model_version = ?")
+            params.append(model_version)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        sql = "SELECT * FROM predictions" + (f" WHERE {' AND '.join(where)}" if where else "")
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(int(limit))
+
+        conn = self._connect()
+        try:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "id": row["id"],
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["ts"])),
+                "endpoint": row["endpoint"],
+                "client": row["client"],
+                "model_version": row["model_version"],
+                "input": {name: row[f"f_{name}"] for name in self.feature_names},
+                "prediction": row["prediction"],
+                "probability": row["probability"],
+                "latency_ms": row["latency_ms"],
+            }
+            for row in rows
+        ]
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "queued": self._queued_rows,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "retention_days": self.retention_days,
+            "pruned": self.pruned,
+            "record_clients": self.record_clients,
+        }
@@ -0,0 +1,197 @@
+import numpy as np
+
+# =========================
+# Columnar binary batch format
+# =========================
+# JSON batches cost a json.loads of every field plus a PatientData per record; for bulk clients
+# that is most of the server's CPU. /predict/batch also accepts the whole batch as columns of
+# floats, which are read with np.frombuffer and range-checked with a handful of vectorised
+# comparisons (the same bounds as the PatientData Field constraints).
+#
+# Packed (CONTENT_TYPE, no dependencies):
+#   request   one block per feature, in PatientData field order, each holding one value per
+#             row: little-endian float64, or float32 with "; dtype=float32". The row count is
+#             the body size / (features x item size). NaN marks a missing value, like null in
+#             JSON; the NaN mask is the missing-value mask.
+#   response  three blocks, one value per request row (same order):
+#               probability  winning-class probability, request dtype (NaN if not scored)
+#               error_mask   uint32: bit i set = feature i out of range,
+#                            NO_FEATURES_BIT = no feature present (0 = scored)
+#               prediction   int8 index into the X-CKD-Classes header (-1 if not scored)
+#             with the counts and the model version in X-CKD-* headers.
+# Arrow IPC stream (ARROW_CONTENT_TYPE, needs pyarrow): one float column per feature, named
+# like the PatientData fields (absent columns and nulls are missing values); the response is
+# a stream with prediction (string), probability and error_mask columns.
+#
+# encode_request()/decode_response() implement the client side of the packed format.
+CONTENT_TYPE = "application/vnd.ckd.columnar"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+DTYPES = {"float64": np.dtype("<f8"), "float32": np.dtype("<f4")}
+NO_FEATURES_BIT = 1 << 31
+MASK_DTYPE = np.dtype("<u4")
+PREDICTION_DTYPE = np.dtype("i1")
+
+
+class UnsupportedFormat(Exception):
+    """Raised for a binary format this server cannot decode (e.g. Arrow without pyarrow)."""
+
+
+def _parse_content_type(content_type):
+    media_type, _, params = content_type.partition(";")
+    options = {}
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip():
+            options[key.strip().lower()] = value.strip().strip('"').lower()
+    return media_type.strip().lower(), options
+
+
+def request_format(content_type):
+    """``("packed", dtype)``, ``("arrow", None)`` or ``None`` (not a columnar request)."""
+    media_type, options = _parse_content_type(content_type)
+    if media_type == ARROW_CONTENT_TYPE:
+        return "arrow", None
+    if media_type != CONTENT_TYPE:
+        return None
+    dtype = options.get("dtype", "float64")
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}'. Choose one of: {', '.join(DTYPES)}.")
+    return "packed", DTYPES[dtype]
+
+
+def media_type(fmt, dtype=None):
+    if fmt == "arrow":
+        return ARROW_CONTENT_TYPE
+    return f"{CONTENT_TYPE}; dtype={dtype.name}"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise UnsupportedFormat("Arrow payloads need pyarrow on the server; send "
+                                f"{CONTENT_TYPE} instead.")
+    return pyarrow
+
+
+# -------- bounds --------
+def field_bounds(model, columns):
+    """Range limits of ``columns`` from the pydantic Field constraints of ``model``.
+
+    Returns ``(lower, lower_inclusive, upper, upper_inclusive)`` arrays in column order.
+    """
+    n = len(columns)
+    lower, upper = np.full(n, -np.inf), np.full(n, np.inf)
+    lower_inclusive, upper_inclusive = np.ones(n, dtype=bool), np.ones(n, dtype=bool)
+    for i, column in enumerate(columns):
+        for constraint in model.model_fields[column].metadata:
+            if getattr(constraint, "gt", None) is not None:
+                lower[i], lower_inclusive[i] = constraint.gt, False
+            elif getattr(constraint, "ge", None) is not None:
+                lower[i], lower_inclusive[i] = constraint.ge, True
+            elif getattr(constraint, "lt", None) is not None:
+                upper[i], upper_inclusive[i] = constraint.lt, False
+            elif getattr(constraint, "le", None) is not None:
+                upper[i], upper_inclusive[i] = constraint.le, True
+    return lower, lower_inclusive, upper, upper_inclusive
+
+
+def validate_matrix(X, bounds):
+    """Vectorised range checks: the uint32 error mask of every row of ``X`` (0 = valid).
+
+    NaN is a missing value and always passes; infinities fail like any out-of-range value.
+    """
+    lower, lower_inclusive, upper, upper_inclusive = bounds
+    present = ~np.isnan(X)
+    with np.errstate(invalid="ignore"):
+        in_range = (np.where(lower_inclusive, X >= lower, X > lower)
+                    & np.where(upper_inclusive, X <= upper, X < upper))
+    bad = present & ~in_range
+    masks = bad.astype(MASK_DTYPE) @ (np.uint32(1) << np.arange(X.shape[1], dtype=MASK_DTYPE))
+    masks = masks.astype(MASK_DTYPE)
+    masks[~present.any(axis=1)] |= NO_FEATURES_BIT
+    return masks
+
+
+def describe_error(mask, columns, bounds):
+    """JSON error detail for one row's error mask (the shape of the JSON batch ``errors``)."""
+    if mask & NO_FEATURES_BIT:
+        return "No valid input features provided."
+    lower, lower_inclusive, upper, upper_inclusive = bounds
+    details = []
+    for i, column in enumerate(columns):
+        if mask >> i & 1:
+            low = f"{'>=' if lower_inclusive[i] else '>'} {lower[i]:g}"
+            high = f"{'<=' if upper_inclusive[i] else '<'} {upper[i]:g}"
+            details.append({"type": "range", "loc": [column], "msg": f"Input should be {low} and {high}"})
+    return details
+
+
+# -------- packed format --------
+def decode_packed(body, dtype, n_features):
+    """Feature matrix (rows x features, float64, C order) of a packed request body."""
+    row_bytes = n_features * dtype.itemsize
+    if len(body) % row_bytes:
+        raise ValueError(f"Packed body must hold {n_features} columns of {dtype.name} values: "
+                         f"got {len(body)} bytes, not a multiple of {row_bytes}.")
+    columns = np.frombuffer(body, dtype=dtype).reshape(n_features, -1)
+    # One copy, transposing to row-major float64: what both scoring backends and the audit expect
+    return np.ascontiguousarray(columns.T, dtype=np.float64)
+
+
+def encode_packed(probability, masks, predictions, dtype):
+    return b"".join((
+        np.asarray(probability, dtype=dtype).tobytes(),
+        np.asarray(masks, dtype=MASK_DTYPE).tobytes(),
+        np.asarray(predictions, dtype=PREDICTION_DTYPE).tobytes(),
+    ))
+
+
+def encode_request(X, dtype="float64"):
+    """Client side: a packed request body for the matrix ``X`` (rows x features, NaN = missing)."""
+    return np.ascontiguousarray(np.asarray(X, dtype=DTYPES[dtype]).T).tobytes()
+
+
+def decode_response(body, headers, dtype="float64"):
+    """Client side: ``{"probability", "error_mask", "prediction"}`` arrays from a packed response.
+
+    ``prediction`` holds the class labels (None for rows that were not scored).
+    """
+    dtype = DTYPES[dtype]
+    n = int(headers["X-CKD-Count"])
+    probability = np.frombuffer(body, dtype=dtype, count=n)
+    offset = n * dtype.itemsize
+    masks = np.frombuffer(body, dtype=MASK_DTYPE, count=n, offset=offset)
+    codes = np.frombuffer(body, dtype=PREDICTION_DTYPE, count=n, offset=offset + n * MASK_DTYPE.itemsize)
+    classes = np.array(headers["X-CKD-Classes"].split(",") + [None], dtype=object)
+    return {"probability": probability, "error_mask": masks, "prediction": classes[codes]}
+
+
+# -------- Arrow IPC --------
+def decode_arrow(body, columns):
+    pa = _import_pyarrow()
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Invalid Arrow stream: {e}")
+    X = np.full((table.num_rows, len(columns)), np.nan)
+    for i, column in enumerate(columns):
+        if column in table.column_names:
+            values = table.column(column).cast(pa.float64())
+            X[:, i] = values.fill_null(np.nan).to_numpy()
+    return X
+
+
+def encode_arrow(labels, probability, masks, metadata):
+    pa = _import_pyarrow()
+    scored = masks == 0
+    table = pa.table({
+        "prediction": pa.array(labels, type=pa.string()),
+        "probability": pa.array(probability, mask=~scored),
+        "error_mask": pa.array(masks, type=pa.uint32()),
+    }).replace_schema_metadata({k: str(v) for k, v in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
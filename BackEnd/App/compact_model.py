@@ -0,0 +1,323 @@
+import argparse
+import copy
+import io
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from fast_forest import compile_pipeline, verify_parity
+from model_bundle import file_sha256, load_bundle, save_bundle
+
+# =========================
+# Post-training compaction
+# =========================
+# Shrinks a trained bundle so every worker loads less and scores faster:
+#   1. depth pruning    - cut every tree at the shallowest depth that keeps accuracy in tolerance
+#                         (internal nodes at the cut become leaves with their class distribution)
+#   2. tree selection   - greedy ordered aggregation: add the tree that helps the ensemble most,
+#                         keep the shortest prefix that stays within tolerance
+#   3. compact arrays   - the compiled forest is stored in the bundle with float32 thresholds
+#                         (rounded down, so routing is exact), float32 leaf values and int32/uint8
+#                         indices; the API uses it directly with CKD_INFERENCE_BACKEND=compiled
+# The result is still a regular bundle with a (smaller) sklearn pipeline, so main.py loads it
+# like any other model.
+MODEL_PATH = "ckd_model.pkl"
+OUTPUT_PATH = "ckd_model.compact.pkl"
+# Compact leaf values are float32, so served probabilities may differ from sklearn by ~1e-7
+COMPILED_ATOL = 1e-6
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+def prune_tree(estimator, max_depth):
+    """Copy of a fitted decision tree cut at ``max_depth``; returns the estimator unchanged if shallower."""
+    from sklearn.tree._tree import Tree
+
+    tree = estimator.tree_
+    if tree.max_depth <= max_depth:
+        return estimator
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Depth-first (pre-order) renumbering of the nodes that survive the cut
+    keep, depth_of, new_id = [], {}, {}
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        new_id[node] = len(keep)
+        keep.append(node)
+        depth_of[node] = depth
+        left, right = nodes["left_child"][node], nodes["right_child"][node]
+        if left != TREE_LEAF and depth < max_depth:
+            stack.append((right, depth + 1))
+            stack.append((left, depth + 1))
+
+    new_nodes = nodes[keep].copy()
+    for i, node in enumerate(keep):
+        left, right = nodes["left_child"][node], nodes["right_child"][node]
+        if left == TREE_LEAF or depth_of[node] >= max_depth:
+            new_nodes["left_child"][i] = new_nodes["right_child"][i] = TREE_LEAF
+            new_nodes["feature"][i] = TREE_UNDEFINED
+            new_nodes["threshold"][i] = TREE_UNDEFINED
+        else:
+            new_nodes["left_child"][i] = new_id[left]
+            new_nodes["right_child"][i] = new_id[right]
+
+    pruned = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    pruned.__setstate__({
+        **state,
+        "max_depth": min(tree.max_depth, max_depth),
+        "node_count": len(keep),
+        "nodes": new_nodes,
+        "values": np.ascontiguousarray(values[keep]),
+    })
+    estimator = copy.copy(estimator)
+    estimator.tree_ = pruned
+    return estimator
+
+
+def with_forest(pipeline, estimators):
+    """Shallow copy of the pipeline whose forest holds ``estimators``."""
+    forest = copy.copy(pipeline.named_steps["classifier"])
+    forest.estimators_ = list(estimators)
+    forest.n_estimators = len(estimators)
+    steps = [(name, forest if name == "classifier" else step) for name, step in pipeline.steps]
+    pipeline = copy.copy(pipeline)
+    pipeline.steps = steps
+    return pipeline
+
+
+def tree_probabilities(engine, X):
+    """Per-tree class distributions, shape (n_trees, n_rows, n_classes)."""
+    return engine.value[engine._leaves(X)]
+
+
+def greedy_tree_order(per_tree, y):
+    """Ordered aggregation: repeatedly add the tree that maximises ensemble accuracy, breaking
+    ties on the mean probability given to the true class."""
+    n_trees, n_rows, _ = per_tree.shape
+    true_class = per_tree[:, np.arange(n_rows), y]          # (n_trees, n_rows)
+    remaining = list(range(n_trees))
+    order, running = [], np.zeros(per_tree.shape[1:], dtype=np.float64)
+    while remaining:
+        candidates = running[None] + per_tree[remaining]    # (n_remaining, n_rows, n_classes)
+        accuracy = (candidates.argmax(axis=2) == y).mean(axis=1)
+        margin = (running[None, np.arange(n_rows), y] + true_class[remaining]).mean(axis=1)
+        best = int(np.lexsort((-margin, -accuracy))[0])
+        tree = remaining.pop(best)
+        order.append(tree)
+        running += per_tree[tree]
+    return order
+
+
+def accuracy(engine, X, y):
+    return float((engine.predict_proba(X).argmax(axis=1) == y).mean())
+
+
+def _as_reference(X, y, bundle):
+    """``X`` in the bundle's feature order and ``y`` (indices into bundle classes) as model classes."""
+    features = [f["name"] for f in bundle["features"]]
+    X = X.reindex(columns=features).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    model_classes = list(bundle["model"].classes_)
+    return X, np.array([model_classes.index(c) for c in y]), features
+
+
+def reference_data(data_path, bundle):
+    """Labelled rows in the bundle's feature order, with the model's encoded class as target."""
+    from preprocessing import load_dataset
+
+    X, y, _, _ = load_dataset(data_path)
+    classes = list(bundle["classes"])
+    known = y.isin(classes).to_numpy()
+    return _as_reference(X[known], [classes.index(label) for label in y[known]], bundle)
+
+
+def holdout_data(bundle):
+    """The hold-out rows of the run that trained ``bundle``: same data, resampling and split.
+
+    Pruning on rows the forest was fitted on would keep "accuracy" at 1.0 while it shrinks;
+    only rows it never saw show what compaction costs. Returns (X, y, features, description).
+    """
+    from sklearn.model_selection import train_test_split
+
+    import model_3
+    from preprocessing import load_dataset, smote_resample
+
+    metadata = bundle.get("metadata", {})
+    data_path = metadata.get("data_path")
+    if metadata.get("training_mode") == "streaming":
+        raise ValueError("Streamed bundles keep their hold-out rows in the shards; pass --data with held-out rows.")
+    if not data_path or not os.path.exists(data_path) or file_sha256(data_path) != metadata.get("data_sha256"):
+        raise ValueError("The bundle's training data is not available unchanged; pass --data with held-out rows.")
+
+    X, y, numeric_cols, categorical_cols = load_dataset(data_path)
+    classes = list(bundle["classes"])
+    y = np.array([classes.index(label) for label in y])
+    if "search" in metadata:
+        # model_search.py splits the real rows first and resamples inside the training part
+        _, X_test, _, y_test = train_test_split(
+            X, y, test_size=model_3.TEST_SIZE, random_state=model_3.SPLIT_SEED, stratify=y
+        )
+        description = "model_search hold-out split"
+    else:
+        # model_3.train_model resamples first, then splits
+        X, y = smote_resample(X, y, numeric_cols, categorical_cols, method=metadata.get("oversampler", "smote"))
+        _, X_test, _, y_test = train_test_split(X, y, test_size=model_3.TEST_SIZE, random_state=model_3.SPLIT_SEED)
+        description = "model_3.train_model hold-out split"
+    if "n_test" in metadata and len(X_test) != metadata["n_test"]:
+        raise ValueError(f"Reproduced {len(X_test)} hold-out rows, the bundle recorded {metadata['n_test']}; "
+                         "pass --data with held-out rows.")
+    return (*_as_reference(X_test, y_test, bundle), f"{description} of {os.path.basename(data_path)}")
+
+
+def measure(bundle, X, features, repeat=50):
+    """Size, load time and latency of a bundle (sklearn and compiled)."""
+    buffer = io.BytesIO()
+    pickle.dump(bundle, buffer)
+    payload = buffer.getvalue()
+    started = time.perf_counter()
+    for _ in range(5):
+        pickle.loads(payload)
+    load_ms = (time.perf_counter() - started) / 5 * 1000.0
+
+    pipeline = bundle["model"]
+    engine = compile_pipeline(pipeline, features)
+    if "compiled" in bundle:
+        engine = engine.compact()
+    one, batch = X[:1], X[np.resize(np.arange(len(X)), 1000)]
+    frame_one = pd.DataFrame(one, columns=features)
+    frame_batch = pd.DataFrame(batch, columns=features)
+
+    def best_ms(fn, n):
+        fn()
+        samples = []
+        for _ in range(n):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000.0)
+        return round(min(samples), 3)
+
+    forest = pipeline.named_steps["classifier"]
+    return {
+        "bytes": len(payload),
+        "load_ms": round(load_ms, 2),
+        "trees": len(forest.estimators_),
+        "nodes": int(sum(t.tree_.node_count for t in forest.estimators_)),
+        "max_depth": int(max(t.tree_.max_depth for t in forest.estimators_)),
+        "compiled_bytes": engine.nbytes(),
+        "sklearn_single_ms": best_ms(lambda: pipeline.predict_proba(frame_one), repeat // 5),
+        "sklearn_batch_ms": best_ms(lambda: pipeline.predict_proba(frame_batch), repeat // 5),
+        "compiled_single_ms": best_ms(lambda: engine.predict_proba(one), repeat),
+        "compiled_batch_ms": best_ms(lambda: engine.predict_proba(batch), repeat // 5),
+    }
+
+
+def compact_bundle(bundle, X, y, features, tolerance=0.01, min_trees=10, prune_depth=True, select_trees=True,
+                   reference="unspecified"):
+    """Return (compacted bundle, report). Accuracy is measured on (X, y) against the original model;
+    ``reference`` says which rows those are and is recorded in the report."""
+    pipeline = bundle["model"]
+    forest = pipeline.named_steps["classifier"]
+    engine = compile_pipeline(pipeline, features)
+    baseline = accuracy(engine, X, y)
+    floor = baseline - tolerance
+    estimators = list(forest.estimators_)
+
+    depth = engine.max_depth
+    if prune_depth:
+        # Accuracy is not monotonic in depth; take the shallowest depth that is within tolerance
+        for candidate in range(engine.max_depth - 1, 0, -1):
+            pruned = with_forest(pipeline, [prune_tree(e, candidate) for e in estimators])
+            if accuracy(compile_pipeline(pruned, features), X, y) >= floor:
+                depth = candidate
+        estimators = [prune_tree(e, depth) for e in estimators]
+
+    n_trees = len(estimators)
+    if select_trees and n_trees > min_trees:
+        per_tree = tree_probabilities(compile_pipeline(with_forest(pipeline, estimators), features), X)
+        order = greedy_tree_order(per_tree, y)
+        running = np.cumsum(per_tree[order], axis=0)        # ensemble of the first k trees
+        prefix_accuracy = (running.argmax(axis=2) == y).mean(axis=1)
+        ok = np.flatnonzero(prefix_accuracy >= floor)
+        n_trees = max(min_trees, int(ok[0]) + 1) if ok.size else len(order)
+        # Keep the selected trees in their original order, so the sklearn sum order is stable
+        estimators = [estimators[i] for i in sorted(order[:n_trees])]
+
+    compacted_pipeline = with_forest(pipeline, estimators)
+    compiled = compile_pipeline(compacted_pipeline, features).compact()
+    verify_parity(compacted_pipeline, compiled, features, atol=COMPILED_ATOL)
+    arrays, meta = compiled.to_arrays()
+
+    full = engine.predict_proba(X)
+    small = compiled.predict_proba(X)
+    report = {
+        "tolerance": tolerance,
+        "reference_data": reference,
+        "reference_rows": int(len(X)),
+        "accuracy_before": round(baseline, 4),
+        "accuracy_after": round(float((small.argmax(axis=1) == y).mean()), 4),
+        "agreement": round(float((full.argmax(axis=1) == small.argmax(axis=1)).mean()), 4),
+        "max_probability_delta": round(float(np.abs(full - small).max()), 4),
+        "max_depth": int(depth),
+        "trees": len(estimators),
+    }
+    compacted = dict(bundle)
+    compacted["model"] = compacted_pipeline
+    compacted["compiled"] = {"input_features": list(features), "arrays": arrays, **meta, "atol": COMPILED_ATOL}
+    compacted["metadata"] = {**bundle["metadata"], "compaction": report}
+    return compacted, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune and compact a trained model bundle.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Bundle to compact")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Where to write the compacted bundle")
+    parser.add_argument("--data",
+                        help="Labelled CSV of rows the model was not trained on to measure accuracy on "
+                             "(default: the hold-out split of the training run, reproduced from the bundle)")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Allowed accuracy drop (default: 0.01)")
+    parser.add_argument("--min-trees", type=int, default=10, help="Never keep fewer trees than this")
+    parser.add_argument("--no-prune-depth", action="store_true", help="Keep the original tree depth")
+    parser.add_argument("--no-select-trees", action="store_true", help="Keep every tree")
+    args = parser.parse_args()
+
+    print(f"📂 Loading {args.model}...")
+    bundle = load_bundle(args.model)
+    if args.data:
+        X, y, features = reference_data(args.data, bundle)
+        reference = os.path.abspath(args.data)
+    else:
+        try:
+            X, y, features, reference = holdout_data(bundle)
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+    print(f"🎯 Measuring accuracy on {len(X)} rows: {reference}")
+
+    print("✂️  Compacting...")
+    compacted, report = compact_bundle(
+        bundle, X, y, features, args.tolerance, args.min_trees,
+        prune_depth=not args.no_prune_depth, select_trees=not args.no_select_trees, reference=reference,
+    )
+    print(f"   depth {report['max_depth']}, {report['trees']} trees; accuracy "
+          f"{report['accuracy_before']} -> {report['accuracy_after']}, agreement {report['agreement']}, "
+          f"max probability delta {report['max_probability_delta']}")
+
+    print("⏱️  Measuring size, load time and latency...")
+    before, after = measure(bundle, X, features), measure(compacted, X, features)
+    print(f"\n   {'':<20} {'before':>12} {'after':>12} {'saving':>8}")
+    for key in before:
+        saving = 1 - after[key] / before[key] if before[key] else 0.0
+        print(f"   {key:<20} {before[key]:>12} {after[key]:>12} {saving:>7.0%}")
+    compacted["metadata"]["compaction"]["before"] = before
+    compacted["metadata"]["compaction"]["after"] = after
+
+    save_bundle(compacted, args.output)
+    print(f"\n💾 Compacted bundle saved to {args.output} (serve it with CKD_MODEL_PATH={args.output})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import threading
+import time
+
+import numpy as np
+
+# =========================
+# Feature drift & data quality
+# =========================
+# At training time build_reference_profile() summarises every numeric feature of the real
+# (pre-SMOTE) training rows: quantile bin edges, the share of rows per bin, the missing rate
+# and the observed range. The profile is saved in the model bundle ("reference_profile").
+#
+# At serving time DriftMonitor keeps, per feature, counts over the same bins plus missing and
+# out-of-range counts, so memory is constant however much traffic is seen. Requests only
+# append their feature matrix to a short buffer; the buffer is folded into the counts in one
+# vectorised pass every FOLD_ROWS rows (or when statistics are read), so the per-request cost
+# is a list append. PSI and KS are computed on read.
+PROFILE_VERSION = 1
+DEFAULT_BINS = 10
+# PSI rule of thumb: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant shift
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Bins with no rows would make PSI infinite
+_PSI_FLOOR = 1e-4
+
+
+def build_reference_profile(X, numeric_cols, bins=DEFAULT_BINS):
+    """Per-feature reference histogram of the training data (a plain, JSON-friendly dict)."""
+    features = {}
+    for col in numeric_cols:
+        values = np.asarray(X[col], dtype=np.float64)
+        present = values[~np.isnan(values)]
+        if not present.size:
+            continue
+        # Interior quantile cut points; ties collapse, so discrete features get fewer bins
+        edges = np.unique(np.quantile(present, np.linspace(0.0, 1.0, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, present, side="right"), minlength=len(edges) + 1)
+        features[col] = {
+            "edges": edges.tolist(),
+            "proportions": (counts / present.size).tolist(),
+            "missing_rate": float(1.0 - present.size / len(values)),
+            "min": float(present.min()),
+            "max": float(present.max()),
+            "mean": float(present.mean()),
+        }
+    return {"version": PROFILE_VERSION, "n_rows": int(len(X)), "bins": bins, "features": features}
+
+
+def psi(expected, actual):
+    """Population stability index between two histograms given as proportions."""
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), _PSI_FLOOR)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64), _PSI_FLOOR)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(expected, actual):
+    """Kolmogorov-Smirnov distance between the binned CDFs (a lower bound of the exact KS)."""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+class _Counts:
+    """Histogram, missing and out-of-range counts for every monitored feature."""
+
+    def __init__(self, n_features, n_bins):
+        self.rows = 0
+        self.bins = np.zeros((n_features, n_bins), dtype=np.int64)
+        self.missing = np.zeros(n_features, dtype=np.int64)
+        self.below = np.zeros(n_features, dtype=np.int64)
+        self.above = np.zeros(n_features, dtype=np.int64)
+        self.started_at = time.time()
+
+
+class DriftMonitor:
+    """Constant-memory running statistics of live inputs, compared against a reference profile.
+
+    ``window_rows`` > 0 also keeps the most recent complete window of that many rows, so a
+    recent shift is not diluted by everything seen since startup.
+    """
+
+    FOLD_ROWS = 256
+
+    def __init__(self, feature_names, profile=None, window_rows=5000, min_rows=100):
+        self.feature_names = list(feature_names)
+        self.window_rows = window_rows
+        self.min_rows = min_rows
+        self._lock = threading.Lock()
+        self._pending, self._pending_rows = [], 0
+        self.set_profile(profile)
+
+    def set_profile(self, profile):
+        """Start over against a new reference profile (``None`` disables drift scores)."""
+        features = (profile or {}).get("features", {})
+        # Features the API accepts and the profile describes, as (input column, profile entry)
+        self._monitored = [
+            (self.feature_names.index(name), name, ref) for name, ref in features.items()
+            if name in self.feature_names
+        ]
+        self._edges = [np.asarray(ref["edges"], dtype=np.float64) for _, _, ref in self._monitored]
+        self._lows = np.array([ref["min"] for _, _, ref in self._monitored], dtype=np.float64)
+        self._highs = np.array([ref["max"] for _, _, ref in self._monitored], dtype=np.float64)
+        self._columns = np.array([i for i, _, _ in self._monitored], dtype=np.intp)
+        n_bins = max((len(e) + 1 for e in self._edges), default=1)
+        with self._lock:
+            self.profile = profile
+            self._pending, self._pending_rows = [], 0
+            self._total = _Counts(len(self._monitored), n_bins)
+            self._window = _Counts(len(self._monitored), n_bins)
+            self._last_window = None
+
+    def on_model_swap(self, state, previous):
+        self.set_profile(state.bundle.get("reference_profile"))
+
+    # -------- request side --------
+    def observe(self, X):
+        """Record scored rows (rows x feature_names). Cheap: the real work is batched."""
+        if not self._monitored:
+            return
+        with self._lock:
+            self._pending.append(X)
+            self._pending_rows += len(X)
+            if self._pending_rows >= self.FOLD_ROWS:
+                self._fold()
+
+    # -------- aggregation --------
+    def _fold(self):
+        """Merge pending rows into the counts (caller holds the lock)."""
+        if not self._pending:
+            return
+        X = np.concatenate(self._pending)[:, self._columns]
+        self._pending, self._pending_rows = [], 0
+        if self.window_rows > 0 and self._window.rows + len(X) > self.window_rows:
+            # Split so windows hold exactly window_rows rows
+            head = self.window_rows - self._window.rows
+            self._add(X[:head])
+            self._last_window = self._window
+            self._window = _Counts(*self._total.bins.shape)
+            for start in range(head, len(X), self.window_rows):
+                chunk = X[start:start + self.window_rows]
+                self._add(chunk)
+                if self._window.rows == self.window_rows:
+                    self._last_window = self._window
+                    self._window = _Counts(*self._total.bins.shape)
+        else:
+            self._add(X)
+
+    def _add(self, X):
+        if not len(X):
+            return
+        missing = np.isnan(X)
+        below = X < self._lows
+        above = X > self._highs
+        for counts in (self._total, self._window):
+            counts.rows += len(X)
+            counts.missing += missing.sum(axis=0)
+            counts.below += below.sum(axis=0)
+            counts.above += above.sum(axis=0)
+        for j, edges in enumerate(self._edges):
+            column = X[:, j][~missing[:, j]]
+            binned = np.bincount(np.searchsorted(edges, column, side="right"), minlength=len(edges) + 1)
+            self._total.bins[j, :len(binned)] += binned
+            self._window.bins[j, :len(binned)] += binned
+
+    def _report(self, counts):
+        features = {}
+        for j, (_, name, ref) in enumerate(self._monitored):
+            n_bins = len(self._edges[j]) + 1
+            present = counts.rows - int(counts.missing[j])
+            entry = {
+                "missing_rate": round(float(counts.missing[j]) / counts.rows, 4) if counts.rows else None,
+                "reference_missing_rate": round(ref["missing_rate"], 4),
+                "below_training_range": int(counts.below[j]),
+                "above_training_range": int(counts.above[j]),
+            }
+            if present >= self.min_rows:
+                actual = counts.bins[j, :n_bins] / present
+                score = psi(ref["proportions"], actual)
+                entry.update({
+                    "psi": round(score, 4),
+                    "ks": round(ks_statistic(ref["proportions"], actual), 4),
+                    "status": ("significant" if score > PSI_SIGNIFICANT
+                               else "moderate" if score > PSI_MODERATE else "stable"),
+                })
+            else:
+                entry["status"] = "insufficient_data"
+            features[name] = entry
+        drifted = sorted(name for name, f in features.items() if f["status"] in ("moderate", "significant"))
+        return {
+            "rows": counts.rows,
+            "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(counts.started_at)),
+            "drifted_features": drifted,
+            "features": features,
+        }
+
+    def report(self):
+        """Drift and data-quality statistics since startup and for the latest window."""
+        with self._lock:
+            if self.profile is None:
+                return {"enabled": False, "reason": "The served model bundle has no reference profile."}
+            self._fold()
+            window = self._last_window if self._last_window is not None else self._window
+            return {
+                "enabled": True,
+                "reference_rows": self.profile.get("n_rows"),
+                "thresholds": {"psi_moderate": PSI_MODERATE, "psi_significant": PSI_SIGNIFICANT},
+                "total": self._report(self._total),
+                "window": {"size": self.window_rows, "complete": self._last_window is not None,
+                           **self._report(window)},
+            }
@@ -0,0 +1,320 @@
+import numpy as np
+
+# =========================
+# Compiled RandomForest inference
+# =========================
+# The sklearn Pipeline used for serving is
+#   ColumnTransformer(num: SimpleImputer) -> RandomForestClassifier
+# For a 12-feature forest the actual arithmetic takes microseconds; the rest of a
+# predict_proba call is pandas/sklearn validation and joblib dispatch. CompiledForest exports
+# the imputer statistics and all trees into flat NumPy arrays and walks every tree for
+# every row at once, one tree level per step.
+
+
+class CompiledForest:
+    """Flattened-array evaluator for an imputer + RandomForestClassifier pipeline.
+
+    All trees share one set of node arrays; ``roots[t]`` is the index of tree ``t``'s root.
+    Leaves point to themselves in ``children``, with feature 0 and an infinite threshold.
+    """
+
+    CHUNK_ROWS = 256
+    ARRAY_NAMES = ("fill_values", "input_index", "roots", "feature", "threshold", "children", "value", "classes")
+
+    def __init__(self, fill_values, input_index, roots, feature, threshold, children, value, classes, max_depth):
+        self.fill_values = fill_values    # (n_features,) imputation value per input column
+        self.input_index = input_index    # (n_model_features,) input column feeding each model feature
+        self.roots = roots                # (n_trees,) root node of each tree
+        self.feature = feature            # (n_nodes,) split feature (0 for leaves)
+        self.threshold = threshold        # (n_nodes,) split threshold (+inf for leaves)
+        self.children = children          # (n_nodes, 2) [left, right]; leaves point to themselves
+        self.value = value                # (n_nodes, n_classes) normalised class distribution
+        self.classes_ = classes           # encoded classes, same as the sklearn model's classes_
+        self.max_depth = int(max_depth)
+        # Traversal helpers derived from the packed arrays (kept in their stored dtypes, so a
+        # compacted forest stays compact in memory too)
+        self._children_flat = np.ascontiguousarray(children).ravel()
+        self._roots = np.asarray(roots)
+        self._feature = np.asarray(feature)
+        self._is_leaf = self._children_flat[0::2] == np.arange(len(feature))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def to_arrays(self):
+        arrays = {name: getattr(self, name) for name in self.ARRAY_NAMES if name != "classes"}
+        arrays["classes"] = self.classes_
+        return arrays, {"max_depth": self.max_depth}
+
+    @classmethod
+    def from_arrays(cls, arrays, max_depth):
+        return cls(**{name: arrays[name] for name in cls.ARRAY_NAMES}, max_depth=max_depth)
+
+    def nbytes(self):
+        arrays, _ = self.to_arrays()
+        return int(sum(a.nbytes for a in arrays.values()))
+
+    def compact(self):
+        """Copy with the smallest dtypes that keep every routing decision identical.
+
+        Thresholds are rounded *down* to float32: for a float32 input x, ``x <= t`` holds exactly
+        when ``x <= largest float32 <= t``, so every row still reaches the same leaf. Leaf
+        distributions become float32, so probabilities match sklearn to ~1e-7, not bit for bit.
+        """
+        threshold = self.threshold.astype(np.float32)
+        above = threshold.astype(np.float64) > self.threshold
+        threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+        n_features = int(self.feature.max()) + 1 if self.n_nodes else 1
+        feature_dtype = np.uint8 if n_features <= np.iinfo(np.uint8).max else np.uint16
+        index_dtype = np.int32 if self.n_nodes < np.iinfo(np.int32).max // 2 else np.int64
+        return CompiledForest(
+            fill_values=self.fill_values,
+            input_index=self.input_index.astype(np.int32),
+            roots=self.roots.astype(index_dtype),
+            feature=self.feature.astype(feature_dtype),
+            threshold=threshold,
+            children=np.ascontiguousarray(self.children.astype(index_dtype)),
+            value=np.ascontiguousarray(self.value.astype(np.float32)),
+            classes=self.classes_,
+            max_depth=self.max_depth,
+        )
+
+    @property
+    def is_compact(self):
+        return self.value.dtype == np.float32
+
+    # -------- inference --------
+    def _prepare(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        X = X[:, self.input_index]
+        X = np.where(np.isnan(X), self.fill_values[self.input_index], X)
+        # sklearn trees compare float32 inputs against float64 thresholds
+        return X.astype(np.float32)
+
+    def _leaves(self, X, visit=None):
+        """Leaf index reached in every tree, shape (n_trees, n_rows).
+
+        ``visit(start, m, pairs, parent, child)`` is called for every step down a tree, where
+        ``pairs`` indexes (tree, row) pairs of the current chunk as ``tree * m + row - start``.
+        """
+        Xf = self._prepare(X)
+        n_rows, n_cols = Xf.shape
+        flat_x = Xf.ravel()
+        leaves = np.empty((self.n_trees, n_rows), dtype=np.intp)
+        # Small row chunks keep the working set in cache; within a chunk, (tree, row) pairs
+        # that reached a leaf drop out so shallow branches stop costing work
+        for start in range(0, n_rows, self.CHUNK_ROWS):
+            stop = min(start + self.CHUNK_ROWS, n_rows)
+            m = stop - start
+            nodes = np.repeat(self._roots, m)
+            x_offset = np.tile(np.arange(start, stop, dtype=np.intp) * n_cols, self.n_trees)
+            active = np.arange(nodes.size)
+            current = nodes
+            while active.size:
+                go_right = flat_x[x_offset + self._feature[current]] > self.threshold[current]
+                parent, current = current, self._children_flat[2 * current + go_right]
+                if visit is not None:
+                    visit(start, m, active, parent, current)
+                nodes[active] = current
+                pending = ~self._is_leaf[current]
+                active, current, x_offset = active[pending], current[pending], x_offset[pending]
+            leaves[:, start:stop] = nodes.reshape(self.n_trees, m)
+        return leaves
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)."""
+        return self._leaves(X).T
+
+    def predict_proba(self, X):
+        # Reducing over the leading (tree) axis adds trees one after another, matching the
+        # accumulation order of RandomForestClassifier.predict_proba bit for bit
+        proba = self.value[self._leaves(X)].sum(axis=0, dtype=np.float64)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    # -------- explanations --------
+    def prepare_explanations(self):
+        """Precompute what explain() needs: how much each split moves the class distribution.
+
+        For every node, ``value[node] - value[parent]`` is the change in expected class
+        probabilities caused by the parent's split, credited to the input column it tests.
+        These are private (n_nodes, n_classes) float64 arrays, so callers run this on first use
+        rather than in every process that maps the model. Safe to race: ``_delta`` is published
+        last, so a concurrent caller either recomputes or sees everything ready.
+        """
+        if getattr(self, "_delta", None) is not None:
+            return
+        parent = np.arange(self.n_nodes)
+        internal = np.flatnonzero(~self._is_leaf)
+        children = np.asarray(self.children)
+        parent[children[internal, 0]] = internal
+        parent[children[internal, 1]] = internal
+        value = np.asarray(self.value, dtype=np.float64)
+        self._split_input = np.asarray(self.input_index)[self._feature].astype(np.intp)
+        self.base_value = value[self._roots].mean(axis=0)
+        self._delta = value - value[parent]
+
+    def explain(self, X):
+        """Saabas per-feature contributions along each tree's decision path.
+
+        Returns ``(proba, contributions)``; ``contributions`` has shape
+        (n_rows, n_input_features, n_classes) and, with ``base_value`` (the training-set class
+        distribution), adds up to ``proba`` for every row.
+        """
+        self.prepare_explanations()
+        n_rows = len(X) if np.ndim(X) == 2 else 1
+        n_features, n_classes = len(self.fill_values), self.value.shape[1]
+        cells, steps = [], []
+
+        def visit(start, m, pairs, parent, child):
+            # (row, input column) cell credited by each (tree, row) pair's step; summed at the end
+            cells.append((start + pairs % m) * n_features + self._split_input[parent])
+            steps.append(child)
+
+        leaves = self._leaves(X, visit)
+        proba = self.value[leaves].sum(axis=0, dtype=np.float64)
+        proba /= self.n_trees
+        flat = np.zeros((n_rows * n_features, n_classes), dtype=np.float64)
+        if cells:
+            cells = np.concatenate(cells)
+            delta = self._delta[np.concatenate(steps)]
+            for c in range(n_classes):
+                flat[:, c] = np.bincount(cells, weights=delta[:, c], minlength=flat.shape[0])
+        return proba, flat.reshape(n_rows, n_features, n_classes) / self.n_trees
+
+
+# =========================
+# Export from sklearn
+# =========================
+def compile_pipeline(pipeline, input_features):
+    """Build a CompiledForest from a fitted ``preprocessor -> classifier`` Pipeline.
+
+    ``input_features`` is the column order of the matrices that will be scored. Raises
+    ValueError for pipeline shapes this engine does not reproduce exactly.
+    """
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.impute import SimpleImputer
+
+    steps = dict(pipeline.named_steps)
+    preprocessor, forest = steps.get("preprocessor"), steps.get("classifier")
+    if not isinstance(forest, (RandomForestClassifier, ExtraTreesClassifier)) or forest.n_outputs_ != 1:
+        raise ValueError("Only single-output RandomForest/ExtraTrees classifiers can be compiled.")
+
+    model_features, fill_values = [], {}
+    for name, transformer, columns in preprocessor.transformers_:
+        if len(columns) == 0 or transformer == "drop":
+            continue
+        if name == "remainder" or transformer == "passthrough":
+            raise ValueError("Passthrough/remainder columns are not supported.")
+        imputers = [step for _, step in transformer.steps] if hasattr(transformer, "steps") else [transformer]
+        if len(imputers) != 1 or not isinstance(imputers[0], SimpleImputer):
+            raise ValueError(f"Transformer '{name}' is not a plain SimpleImputer.")
+        imputer = imputers[0]
+        if imputer.add_indicator or not (isinstance(imputer.missing_values, float) and np.isnan(imputer.missing_values)):
+            raise ValueError(f"Imputer in '{name}' must impute NaN without indicator columns.")
+        statistics = np.asarray(imputer.statistics_, dtype=np.float64)
+        if np.isnan(statistics).any():
+            raise ValueError(f"Imputer in '{name}' has empty (all-NaN) training columns.")
+        for col, stat in zip(columns, statistics):
+            model_features.append(col)
+            fill_values[col] = stat
+
+    missing = [col for col in model_features if col not in input_features]
+    if missing:
+        raise ValueError(f"Model features not present in the input schema: {missing}")
+    input_index = np.array([input_features.index(col) for col in model_features], dtype=np.intp)
+    fill = np.array([fill_values.get(col, 0.0) for col in input_features], dtype=np.float64)
+
+    roots, features, thresholds, children, values = [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(n) + offset
+
+        left = np.where(is_leaf, node_ids, tree.children_left + offset)
+        right = np.where(is_leaf, node_ids, tree.children_right + offset)
+        value = tree.value[:, 0, :].astype(np.float64)
+        # Same normalisation DecisionTreeClassifier.predict_proba applies to leaf values
+        normalizer = value.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        value = value / normalizer[:, None]
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        children.append(np.stack([left, right], axis=1))
+        values.append(value)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    index_dtype = np.int32 if offset < np.iinfo(np.int32).max else np.int64
+    return CompiledForest(
+        fill_values=fill,
+        input_index=input_index,
+        roots=np.array(roots, dtype=index_dtype),
+        feature=np.concatenate(features).astype(np.intp),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        children=np.ascontiguousarray(np.concatenate(children).astype(index_dtype)),
+        value=np.ascontiguousarray(np.concatenate(values)),
+        classes=np.asarray(forest.classes_),
+        max_depth=max_depth,
+    )
+
+
+# =========================
+# Parity check
+# =========================
+def parity_probe(forest, n_rows=512, missing_rate=0.1, seed=0):
+    """Random rows that straddle the forest's split thresholds, with some missing values."""
+    rng = np.random.default_rng(seed)
+    n_features = len(forest.fill_values)
+    X = np.empty((n_rows, n_features), dtype=np.float64)
+    is_split = np.isfinite(forest.threshold)
+    for j in range(n_features):
+        model_cols = np.flatnonzero(forest.input_index == j)
+        thr = forest.threshold[is_split & np.isin(forest.feature, model_cols)]
+        if thr.size:
+            # Half the rows sit exactly on a threshold (the <= boundary), half in between
+            lo, hi = thr.min(), thr.max()
+            span = max(hi - lo, 1.0)
+            X[:, j] = rng.uniform(lo - 0.1 * span, hi + 0.1 * span, n_rows)
+            on_threshold = rng.random(n_rows) < 0.5
+            X[on_threshold, j] = rng.choice(thr, on_threshold.sum())
+        else:
+            X[:, j] = forest.fill_values[j]
+    X[rng.random(X.shape) < missing_rate] = np.nan
+    return X
+
+
+def verify_parity(pipeline, forest, input_features, X=None, atol=0.0):
+    """Raise AssertionError unless the compiled forest matches pipeline.predict_proba.
+
+    With the default ``atol=0`` the match must be bit for bit; compacted forests pass a small
+    tolerance instead, and must then still pick the same class for every row.
+    """
+    import pandas as pd
+
+    X = parity_probe(forest) if X is None else X
+    expected = pipeline.predict_proba(pd.DataFrame(X, columns=input_features))
+    actual = forest.predict_proba(X)
+    if atol:
+        same = np.allclose(expected, actual, rtol=0.0, atol=atol) and np.array_equal(
+            expected.argmax(axis=1), actual.argmax(axis=1))
+    else:
+        same = np.array_equal(expected, actual)
+    if not same:
+        diff = float(np.abs(expected - actual).max())
+        raise AssertionError(f"Compiled forest differs from sklearn predict_proba (max abs diff {diff:.3g}).")
+    return len(X)
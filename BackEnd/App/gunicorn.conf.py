@@ -0,0 +1,29 @@
+# Production launch configuration for the CKD Prediction API.
+#
+#   cd BackEnd/App
+#   gunicorn main:app -c gunicorn.conf.py
+#
+# Each gunicorn worker is a separate uvicorn process with its own copy of the model, so
+# throughput scales with cores. Serving a mapped model file (mapped_model.py) lets the workers
+# share one read-only copy of the forest arrays instead. Pick ONE way of using the cores:
+#   - many HTTP workers (default below), CKD_SCORING_WORKERS=0, or
+#   - a few HTTP workers, each with a scoring process pool (CKD_SCORING_WORKERS=N).
+# HTTP workers x (1 + scoring workers) should not exceed the number of cores.
+import multiprocessing
+import os
+
+bind = os.getenv("CKD_BIND", "0.0.0.0:9000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Slow model loads must not be mistaken for a hung worker
+timeout = int(os.getenv("CKD_WORKER_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.getenv("CKD_MAX_REQUESTS", "50000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
@@ -1,71 +1,103 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+
+# Used to report cold-start latency (import -> ready to serve); taken before the heavy imports
+PROCESS_START = time.perf_counter()
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field, ValidationError
-import pickle
-import pandas as pd
+from starlette.concurrency import run_in_threadpool
+import hmac
+import json
+import logging
+import numpy as np
 import os
-import time
+import sys
+import threading
 import traceback
-from sklearn.preprocessing import LabelEncoder
+from admission_control import AdmissionController, AdmissionMiddleware
+from audit_trail import AuditTrail
+import columnar_format
+from columnar_format import UnsupportedFormat
+from drift_monitor import DriftMonitor
+from model_registry import ModelRegistry
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from scoring_pool import PoolNotReady, PoolSaturated, ScoringPool, ScoringTimeout
+from shadow_scoring import ShadowScorer
+import metrics
+import structured_logging
 
 # =========================
 # Constants & File Paths
 # =========================
-MODEL_PATH = "ckd_model.pkl"
-CSV_PATH = r"D:\Work\Others\Hamed\Project\BackEnd\Data\csv_result-chronic_kidney_disease_full.csv"
+MODEL_PATH = os.getenv("CKD_MODEL_PATH", "ckd_model.pkl")
+MAX_BATCH_SIZE = int(os.getenv("CKD_MAX_BATCH_SIZE", "100000"))
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+MODEL_POLL_SECONDS = float(os.getenv("CKD_MODEL_POLL_SECONDS", "5"))  # 0 disables the file watcher
+INFERENCE_BACKEND = os.getenv("CKD_INFERENCE_BACKEND", "sklearn")  # "sklearn" or "compiled"
+COMPILED_MAX_ROWS = int(os.getenv("CKD_COMPILED_MAX_ROWS", "2048"))  # larger batches go to sklearn (0 = never)
+SCORING_WORKERS = int(os.getenv("CKD_SCORING_WORKERS", "0"))  # >0 scores in a process pool of this size
+MAX_PENDING_SCORES = int(os.getenv("CKD_MAX_PENDING_SCORES", "64"))  # queued scoring jobs before 503
+SCORING_TIMEOUT_SECONDS = float(os.getenv("CKD_SCORING_TIMEOUT_SECONDS", "10"))
+MICROBATCH_ENABLED = os.getenv("CKD_MICROBATCH", "0") == "1"  # coalesce concurrent /predict calls
+MICROBATCH_MAX_ROWS = int(os.getenv("CKD_MICROBATCH_MAX_ROWS", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("CKD_MICROBATCH_MAX_WAIT_MS", "2"))
+CACHE_ENABLED = os.getenv("CKD_CACHE", "1") == "1"  # cache predictions of repeated feature vectors
+CACHE_MAX_ENTRIES = int(os.getenv("CKD_CACHE_MAX_ENTRIES", "100000"))
+CACHE_MAX_MB = float(os.getenv("CKD_CACHE_MAX_MB", "64"))
+CACHE_TTL_SECONDS = float(os.getenv("CKD_CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_ROWS = int(os.getenv("CKD_CACHE_MAX_ROWS", "256"))  # larger batches bypass the cache
+LOG_LEVEL = os.getenv("CKD_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("CKD_LOG_FORMAT", "json")  # "json" or "text"
+LOG_SAMPLE_RATE = float(os.getenv("CKD_LOG_SAMPLE_RATE", "1.0"))  # share of per-prediction events logged
+ADMIN_TOKEN = os.getenv("CKD_ADMIN_TOKEN")  # /admin routes require X-Admin-Token; unset = they answer 404
+AUDIT_ENABLED = os.getenv("CKD_AUDIT", "0") == "1"  # durable prediction history in SQLite (patient data: opt-in)
+AUDIT_PATH = os.getenv("CKD_AUDIT_PATH", "predictions_audit.sqlite3")
+AUDIT_MAX_QUEUE_ROWS = int(os.getenv("CKD_AUDIT_MAX_QUEUE_ROWS", "100000"))  # rows buffered before dropping
+AUDIT_BATCH_ROWS = int(os.getenv("CKD_AUDIT_BATCH_ROWS", "1000"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("CKD_AUDIT_FLUSH_SECONDS", "1.0"))
+AUDIT_RETENTION_DAYS = float(os.getenv("CKD_AUDIT_RETENTION_DAYS", "30"))  # older rows are deleted; 0 = keep forever
+AUDIT_CLIENT_IP = os.getenv("CKD_AUDIT_CLIENT_IP", "0") == "1"  # store the client address with each row
+DRIFT_ENABLED = os.getenv("CKD_DRIFT", "1") == "1"  # compare live inputs with the training profile
+DRIFT_WINDOW_ROWS = int(os.getenv("CKD_DRIFT_WINDOW_ROWS", "5000"))  # rows per recent-drift window (0 = off)
+EXPLAIN_ENABLED = os.getenv("CKD_EXPLAIN", "1") == "1"  # precompute per-node contributions for /explain
+MAX_EXPLAIN_BATCH_SIZE = int(os.getenv("CKD_MAX_EXPLAIN_BATCH_SIZE", "1000"))
+RATE_LIMIT_PER_SECOND = float(os.getenv("CKD_RATE_LIMIT_PER_SECOND", "50"))  # per client (0 disables)
+RATE_LIMIT_BURST = int(os.getenv("CKD_RATE_LIMIT_BURST", "100"))
+MAX_IN_FLIGHT = int(os.getenv("CKD_MAX_IN_FLIGHT", "32"))  # concurrent scoring requests (0 = unlimited)
+MAX_QUEUED_REQUESTS = int(os.getenv("CKD_MAX_QUEUED_REQUESTS", "64"))  # waiting beyond that get 503
+QUEUE_TIMEOUT_MS = float(os.getenv("CKD_QUEUE_TIMEOUT_MS", "250"))  # longest wait for a scoring slot
+CANDIDATE_MODEL_PATH = os.getenv("CKD_CANDIDATE_MODEL_PATH", "ckd_model.candidate.pkl")  # challenger ("" disables)
+SHADOW_SAMPLE_RATE = float(os.getenv("CKD_SHADOW_SAMPLE_RATE", "0.1"))  # share of scored requests replayed on it
+SHADOW_MAX_QUEUE_ROWS = int(os.getenv("CKD_SHADOW_MAX_QUEUE_ROWS", "10000"))  # rows buffered before dropping
+SHADOW_MIN_ROWS = int(os.getenv("CKD_SHADOW_MIN_ROWS", "1000"))  # compared rows before promotion is allowed
+SHADOW_MAX_DEFER_MS = float(os.getenv("CKD_SHADOW_MAX_DEFER_MS", "1000"))  # longest wait for idle time
+LOAD_IN_BACKGROUND = os.getenv("CKD_LOAD_IN_BACKGROUND", "0") == "1"  # accept connections while the model loads
+CORS_ORIGINS = [o.strip() for o in os.getenv("CKD_CORS_ORIGINS", "*").split(",") if o.strip()]
 
 # =========================
 # Globals
 # =========================
-model = None
-label_encoder = None
-last_model_timestamp = None
+startup_metrics = {}
+# Whether this worker should receive traffic; /health/ready reports it to the load balancer
+readiness = {"ready": False, "reason": "starting"}
 
 # =========================
 # Utility: Logging helper
 # =========================
-def log_event(event: str, data=None, is_error=False):
-    ts = time.strftime("%Y-%m-%d %H:%M:%S")
-    prefix = "❌ ERROR" if is_error else "✅ INFO"
-    if data is not None:
-        print(f"[{ts}] {prefix} | {event} | Data: {data}")
-    else:
-        print(f"[{ts}] {prefix} | {event}")
+logger = structured_logging.configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE)
 
-# =========================
-# Load label encoder
-# =========================
-def load_label_encoder():
-    global label_encoder
-    try:
-        df = pd.read_csv(CSV_PATH, on_bad_lines='skip')
-        df.replace("?", None, inplace=True)
-        df.columns = df.columns.str.strip().str.replace("'", "")
-        label_encoder = LabelEncoder()
-        label_encoder.fit(df["class"])
-        log_event("LabelEncoder initialized", list(label_encoder.classes_))
-    except Exception as e:
-        log_event("Failed to load label encoder", str(e), is_error=True)
-        raise
+def log_event(event: str, data=None, is_error=False):
+    # Only builds a record and queues it; formatting and I/O happen on the listener thread
+    level = logging.ERROR if is_error else logging.INFO
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"data": data})
 
-# =========================
-# Load or hot-reload model
-# =========================
-def load_model():
-    global model, last_model_timestamp
-    try:
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Model file '{MODEL_PATH}' not found. Train it first using model_3.py.")
-
-        current_timestamp = os.path.getmtime(MODEL_PATH)
-        if model is None or current_timestamp != last_model_timestamp:
-            with open(MODEL_PATH, "rb") as f:
-                model = pickle.load(f)
-            last_model_timestamp = current_timestamp
-            log_event("Model loaded successfully", {"last_modified": time.ctime(last_model_timestamp)})
-    except Exception as e:
-        log_event("Failed to load model", traceback.format_exc(), is_error=True)
-        raise
+def should_log_prediction():
+    """Per-prediction events are sampled; check before building their (large) payload."""
+    return logger.isEnabledFor(logging.INFO) and structured_logging.settings.sampled()
 
 # =========================
 # Input Schema
@@ -84,6 +116,345 @@ class PatientData(BaseModel):
     wbcc: float | None = Field(None, gt=1000, lt=25000)
     rbcc: float | None = Field(None, gt=1, lt=10)
 
+# Column order the model was trained on (same as the PatientData field order)
+FEATURE_COLUMNS = list(PatientData.model_fields)
+_MISSING_ROW = np.full(len(FEATURE_COLUMNS), np.nan)
+# The Field ranges above as arrays, for the vectorised checks of columnar batches
+FEATURE_BOUNDS = columnar_format.field_bounds(PatientData, FEATURE_COLUMNS)
+
+def patient_to_row(patient: PatientData, out=None):
+    """Write a validated PatientData into a float64 row in FEATURE_COLUMNS order (NaN = missing).
+
+    Returns ``(row, n_present)``. This replaces a one-row DataFrame, which costs ~1 ms of pandas
+    machinery per request; filling the array directly takes a couple of microseconds.
+    """
+    row = _MISSING_ROW.copy() if out is None else out
+    if out is not None:
+        row[:] = np.nan
+    values = patient.__dict__
+    n_present = 0
+    for i, col in enumerate(FEATURE_COLUMNS):
+        v = values[col]
+        if v is not None:
+            row[i] = v
+            n_present += 1
+    return row, n_present
+
+# =========================
+# Model registry (background hot-reload)
+# =========================
+registry = ModelRegistry(
+    MODEL_PATH,
+    input_features=FEATURE_COLUMNS,
+    poll_interval=MODEL_POLL_SECONDS,
+    backend=INFERENCE_BACKEND,
+    compiled_max_rows=COMPILED_MAX_ROWS,
+    explain=EXPLAIN_ENABLED,
+    candidate_path=CANDIDATE_MODEL_PATH or None,
+    log=log_event
+)
+
+def current_model():
+    state = registry.current
+    if state is None:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return state
+
+# Scoring runs off the event loop: in the thread pool, or in worker processes when
+# CKD_SCORING_WORKERS > 0. Each worker loads the model once and is rebuilt on model swaps.
+scoring_pool = ScoringPool(
+    workers=SCORING_WORKERS,
+    max_pending=MAX_PENDING_SCORES,
+    timeout=SCORING_TIMEOUT_SECONDS,
+    log=log_event
+)
+
+# Optional dynamic batching: concurrent small requests wait up to MICROBATCH_MAX_WAIT_MS
+# and are scored together in one matrix call
+micro_batcher = MicroBatcher(
+    scoring_pool.predict_proba,
+    max_rows=MICROBATCH_MAX_ROWS,
+    max_wait_ms=MICROBATCH_MAX_WAIT_MS,
+    max_concurrency=max(1, SCORING_WORKERS)
+) if MICROBATCH_ENABLED else None
+
+# Repeat submissions of the same feature vector skip forest evaluation; cleared on model swap
+prediction_cache = PredictionCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=CACHE_TTL_SECONDS
+) if CACHE_ENABLED else None
+
+# Append-only prediction history, written in bulk by a background thread. The SQLite file is
+# only created when the startup event starts it, never on import
+audit_trail = AuditTrail(
+    AUDIT_PATH,
+    FEATURE_COLUMNS,
+    max_queue_rows=AUDIT_MAX_QUEUE_ROWS,
+    batch_rows=AUDIT_BATCH_ROWS,
+    flush_seconds=AUDIT_FLUSH_SECONDS,
+    retention_days=AUDIT_RETENTION_DAYS,
+    record_clients=AUDIT_CLIENT_IP,
+    log=log_event
+) if AUDIT_ENABLED else None
+
+# Per-client rate limits and a cap on concurrent scoring requests, enforced before the body is read
+admission = AdmissionController(
+    rate_per_second=RATE_LIMIT_PER_SECOND,
+    burst=RATE_LIMIT_BURST,
+    max_in_flight=MAX_IN_FLIGHT,
+    max_queued=MAX_QUEUED_REQUESTS,
+    queue_timeout=QUEUE_TIMEOUT_MS / 1000.0
+)
+
+# Challenger model scored on a sample of live traffic by a background thread
+shadow_scorer = ShadowScorer(
+    sample_rate=SHADOW_SAMPLE_RATE,
+    max_queue_rows=SHADOW_MAX_QUEUE_ROWS,
+    min_rows=SHADOW_MIN_ROWS,
+    # Shadow work waits for a moment with no scoring request in flight
+    busy=lambda: admission.in_flight > 0,
+    max_defer=SHADOW_MAX_DEFER_MS / 1000.0,
+    log=log_event
+) if CANDIDATE_MODEL_PATH else None
+
+# Running histograms of live inputs, scored against the bundle's reference profile
+drift_monitor = DriftMonitor(FEATURE_COLUMNS, window_rows=DRIFT_WINDOW_ROWS) if DRIFT_ENABLED else None
+
+# =========================
+# Metrics
+# =========================
+STAGE_SECONDS = metrics.REGISTRY.histogram(
+    "ckd_stage_seconds",
+    "Time spent in each stage of a prediction request.",
+    ["endpoint", "stage"]
+)
+BATCH_ROWS = metrics.REGISTRY.histogram(
+    "ckd_batch_rows",
+    "Rows per /predict/batch request.",
+    buckets=(1, 10, 100, 1000, 10000, 100000)
+)
+
+def elapsed_since_received(request: Request):
+    """Time since the request hit the app, including any wait in the admission queue."""
+    received_at = getattr(request.state, "received_at", None)
+    return time.perf_counter() - received_at if received_at else 0.0
+
+def elapsed_since_admitted(request: Request):
+    """Time from admission to the handler running (body read + parsing + validation).
+
+    Queue wait is left out; admission control reports it (mean_queue_wait_ms).
+    """
+    started = getattr(request.state, "admitted_at", None) or getattr(request.state, "received_at", None)
+    return time.perf_counter() - started if started else 0.0
+
+def collect_service_metrics():
+    state = registry.current
+    families = [
+        ("ckd_model_reloads", "counter", "Successful model loads from disk.",
+         [("ckd_model_reloads_total", {}, registry.reloads)]),
+        ("ckd_model_reload_failures", "counter", "Failed model loads.",
+         [("ckd_model_reload_failures_total", {}, registry.reload_failures)]),
+        ("ckd_model_rollbacks", "counter", "Admin rollbacks to a previous model.",
+         [("ckd_model_rollbacks_total", {}, registry.rollbacks)]),
+        ("ckd_model_reload_seconds", "summary", "Model load + compile + warm-up duration.",
+         [("ckd_model_reload_seconds_sum", {}, registry.reload_seconds_total),
+          ("ckd_model_reload_seconds_count", {}, registry.reloads)]),
+        ("ckd_startup_seconds", "gauge", "Cold-start timings of this process.",
+         [("ckd_startup_seconds", {"phase": phase}, value) for phase, value in startup_metrics.items()]),
+        ("ckd_scoring_pending", "gauge", "Scoring jobs currently queued or running.",
+         [("ckd_scoring_pending", {}, scoring_pool.pending)]),
+        ("ckd_admission_admitted", "counter", "Scoring requests admitted by admission control.",
+         [("ckd_admission_admitted_total", {}, admission.admitted)]),
+        ("ckd_admission_rejected", "counter", "Scoring requests rejected (429 rate_limited, 503 queue_full/queue_timeout).",
+         [("ckd_admission_rejected_total", {"reason": r}, admission.rejected[r])
+          for r in ("rate_limited", "queue_full", "queue_timeout")]),
+        ("ckd_admission_in_flight", "gauge", "Scoring requests currently running.",
+         [("ckd_admission_in_flight", {}, admission.in_flight)]),
+        ("ckd_admission_queued", "gauge", "Scoring requests waiting for a slot.",
+         [("ckd_admission_queued", {}, admission.queued)]),
+        ("ckd_admission_queue_wait_seconds", "summary", "Time admitted or shed requests waited for a slot.",
+         [("ckd_admission_queue_wait_seconds_sum", {}, admission.queue_wait_total),
+          ("ckd_admission_queue_wait_seconds_count", {}, admission.queue_wait_count)]),
+        ("ckd_log_dropped", "counter", "Log records dropped because the log queue was full.",
+         [("ckd_log_dropped_total", {}, structured_logging.settings.stats()["dropped"])]),
+    ]
+    if audit_trail is not None:
+        stats = audit_trail.stats()
+        families += [
+            ("ckd_audit_written", "counter", "Predictions written to the audit trail.",
+             [("ckd_audit_written_total", {}, stats["written"])]),
+            ("ckd_audit_dropped", "counter", "Predictions dropped because the audit queue was full or a write failed.",
+             [("ckd_audit_dropped_total", {}, stats["dropped"])]),
+            ("ckd_audit_queued", "gauge", "Predictions waiting to be written to the audit trail.",
+             [("ckd_audit_queued", {}, stats["queued"])]),
+        ]
+    if shadow_scorer is not None:
+        report = shadow_scorer.report()
+        comparison = report["comparison"] or {}
+        families += [
+            ("ckd_shadow_sampled_rows", "counter", "Rows queued for shadow scoring on the candidate model.",
+             [("ckd_shadow_sampled_rows_total", {}, report["sampled_rows"])]),
+            ("ckd_shadow_dropped_rows", "counter", "Rows not shadow scored because the shadow queue was full.",
+             [("ckd_shadow_dropped_rows_total", {}, report["dropped_rows"])]),
+            ("ckd_shadow_skipped_busy_rows", "counter",
+             "Rows not shadow scored because live traffic kept the server busy past CKD_SHADOW_MAX_DEFER_MS.",
+             [("ckd_shadow_skipped_busy_rows_total", {}, report["skipped_busy_rows"])]),
+            ("ckd_shadow_compared_rows", "gauge", "Rows compared between the live and the candidate model.",
+             [("ckd_shadow_compared_rows", {}, comparison.get("rows_compared", 0))]),
+        ]
+        if comparison.get("agreement_rate") is not None:
+            families.append(("ckd_shadow_agreement_rate", "gauge",
+                             "Share of shadow-scored rows where the candidate predicts the live label.",
+                             [("ckd_shadow_agreement_rate", {"candidate": comparison["candidate_version"]},
+                               comparison["agreement_rate"])]))
+    if state is not None:
+        families.append(("ckd_model_info", "gauge", "Currently served model (value is always 1).", [(
+            "ckd_model_info",
+            {"version": state.version, "backend": state.backend,
+             "trained_at": state.metadata.get("trained_at") or "unknown"},
+            1
+        )]))
+    if prediction_cache is not None:
+        stats = prediction_cache.stats()
+        families += [
+            ("ckd_cache_hits", "counter", "Prediction cache hits.", [("ckd_cache_hits_total", {}, stats["hits"])]),
+            ("ckd_cache_misses", "counter", "Prediction cache misses.",
+             [("ckd_cache_misses_total", {}, stats["misses"])]),
+            ("ckd_cache_evictions", "counter", "Prediction cache evictions by reason.",
+             [("ckd_cache_evictions_total", {"reason": r}, n) for r, n in stats["evictions"].items()]),
+            ("ckd_cache_entries", "gauge", "Entries in the prediction cache.",
+             [("ckd_cache_entries", {}, stats["entries"])]),
+            ("ckd_cache_bytes", "gauge", "Estimated memory used by the prediction cache.",
+             [("ckd_cache_bytes", {}, stats["bytes"])]),
+        ]
+    if drift_monitor is not None and drift_monitor.profile is not None:
+        report = drift_monitor.report()["total"]["features"]
+        families += [
+            ("ckd_drift_psi", "gauge", "Population stability index of each input feature since startup.",
+             [("ckd_drift_psi", {"feature": name}, f["psi"]) for name, f in report.items() if "psi" in f]),
+            ("ckd_drift_missing_rate", "gauge", "Share of live requests missing each input feature.",
+             [("ckd_drift_missing_rate", {"feature": name}, f["missing_rate"])
+              for name, f in report.items() if f["missing_rate"] is not None]),
+        ]
+    if micro_batcher is not None:
+        stats = micro_batcher.stats()
+        cumulative, buckets = 0, []
+        for size, count in sorted(micro_batcher.size_buckets.items()):
+            cumulative += count
+            buckets.append(("ckd_microbatch_rows_bucket", {"le": str(size)}, cumulative))
+        buckets.append(("ckd_microbatch_rows_bucket", {"le": "+Inf"}, micro_batcher.batches))
+        buckets.append(("ckd_microbatch_rows_sum", {}, micro_batcher.rows))
+        buckets.append(("ckd_microbatch_rows_count", {}, micro_batcher.batches))
+        families.append(("ckd_microbatch_rows", "histogram", "Rows per coalesced micro-batch.", buckets))
+        families.append(("ckd_microbatch_queue_wait_seconds", "summary", "Delay added by micro-batching.", [
+            ("ckd_microbatch_queue_wait_seconds_sum", {}, micro_batcher.wait_total),
+            ("ckd_microbatch_queue_wait_seconds_count", {}, stats["queue_wait_ms"]["count"]),
+        ]))
+    return families
+
+metrics.REGISTRY.register_collector(collect_service_metrics)
+
+# =========================
+# Scoring helpers
+# =========================
+async def score_matrix(X: np.ndarray, endpoint="predict"):
+    """Score a float matrix (rows x FEATURE_COLUMNS) with a single predict_proba pass.
+
+    Returns the decoded labels, the winning-class probability for each row and the model state
+    that scored them (not registry.current, which a reload may have replaced meanwhile). Rows
+    already in the prediction cache are answered from it; only the misses reach the model.
+    """
+    state = current_model()
+    if prediction_cache is None or len(X) > CACHE_MAX_ROWS:
+        return await score_uncached(X, endpoint)
+
+    with STAGE_SECONDS.time(endpoint=endpoint, stage="cache_lookup"):
+        keys = [prediction_cache.key(state.version, row) for row in X]
+        cached = [prediction_cache.get(key) for key in keys]
+        misses = [i for i, hit in enumerate(cached) if hit is None]
+
+    labels = np.empty(len(X), dtype=object)
+    probabilities = np.empty(len(X), dtype=np.float64)
+    for i, hit in enumerate(cached):
+        if hit is not None:
+            labels[i], probabilities[i] = hit
+
+    scored_by = state
+    if misses:
+        miss_labels, miss_probabilities, scored_by = await score_uncached(X[misses], endpoint)
+        labels[misses], probabilities[misses] = miss_labels, miss_probabilities
+        for i, label, p in zip(misses, miss_labels, miss_probabilities):
+            # Key on the model that actually scored the row (it may have been swapped meanwhile)
+            key = keys[i] if scored_by.version == state.version else prediction_cache.key(scored_by.version, X[i])
+            prediction_cache.put(key, label, float(p))
+    return labels, probabilities, scored_by
+
+async def score_uncached(X: np.ndarray, endpoint):
+    """Run the model on ``X``; returns labels, winning-class probabilities and the model state used."""
+    try:
+        with STAGE_SECONDS.time(endpoint=endpoint, stage="predict_proba"):
+            if micro_batcher is not None and len(X) < MICROBATCH_MAX_ROWS:
+                proba, state = await micro_batcher.submit(X)
+            else:
+                proba, state = await scoring_pool.predict_proba(X)
+    except PoolNotReady as e:
+        # Same answer as /health/ready until the pool has the model
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=f"Server busy: {e}", headers={"Retry-After": "1"})
+    except ScoringTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    with STAGE_SECONDS.time(endpoint=endpoint, stage="decode"):
+        best = proba.argmax(axis=1)
+        labels = state.classes[state.model_classes[best]]
+        return labels, proba[np.arange(len(best)), best], state
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """Decode a batch payload: a JSON array (optionally wrapped in {"records": [...]}) or NDJSON."""
+    if content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES:
+        records = []
+        for line_no, line in enumerate(body.decode("utf-8").splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid NDJSON on line {line_no}: {e.msg}")
+        return records
+
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON body: {e.msg}")
+    if isinstance(payload, dict) and "records" in payload:
+        payload = payload["records"]
+    if not isinstance(payload, list):
+        raise ValueError("Batch body must be a JSON array of patient records.")
+    return payload
+
+def validate_batch(records: list):
+    """Validate every record, returning the feature matrix of valid rows, their indices and per-row errors."""
+    X = np.empty((len(records), len(FEATURE_COLUMNS)), dtype=np.float64)
+    valid_idx, errors = [], []
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({"index": i, "detail": "Record must be a JSON object."})
+            continue
+        try:
+            patient = PatientData(**record)
+        except ValidationError as ve:
+            errors.append({"index": i, "detail": ve.errors(include_url=False, include_context=False)})
+            continue
+        # Valid rows are packed to the front of the preallocated matrix
+        _, n_present = patient_to_row(patient, X[len(valid_idx)])
+        if not n_present:
+            errors.append({"index": i, "detail": "No valid input features provided."})
+            continue
+        valid_idx.append(i)
+
+    return X[:len(valid_idx)], valid_idx, errors
+
 # =========================
 # App Initialization
 # =========================
@@ -93,10 +464,16 @@ app = FastAPI(
     version="1.1.0"
 )
 
+# Admission control runs inside the metrics middleware, so shed requests are counted too
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Request/error counters and latency per route (outermost, so it also sees 422s and CORS)
+app.add_middleware(metrics.MetricsMiddleware, registry=metrics.REGISTRY, prefix="ckd_http")
+
 # Enable CORS for frontend access
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -108,9 +485,62 @@ app.add_middleware(
 @app.on_event("startup")
 def startup_event():
     log_event("Starting API...")
-    load_label_encoder()
-    load_model()
-    log_event("API startup complete")
+    if LOAD_IN_BACKGROUND:
+        # The process answers /health/live at once; /health/ready flips once the model is in
+        readiness["reason"] = "loading_model"
+        threading.Thread(target=load_and_start, name="model-loader", daemon=True).start()
+    else:
+        load_and_start()
+
+def load_and_start():
+    try:
+        registry.reload(force=True)
+    except Exception:
+        readiness["reason"] = "model_load_failed"
+        log_event("Failed to load model", traceback.format_exc(), is_error=True)
+        if LOAD_IN_BACKGROUND:
+            # Stay alive but never ready, so the failure shows on /health/ready instead of a crash loop
+            return
+        raise
+    scoring_pool.start(registry.current)
+    registry.add_listener(scoring_pool.on_model_swap)
+    if prediction_cache is not None:
+        registry.add_listener(prediction_cache.on_model_swap)
+    if drift_monitor is not None:
+        drift_monitor.on_model_swap(registry.current, None)
+        registry.add_listener(drift_monitor.on_model_swap)
+    if shadow_scorer is not None:
+        registry.add_listener(shadow_scorer.on_model_swap)
+        registry.add_candidate_listener(shadow_scorer.set_candidate)
+        shadow_scorer.start()
+        try:
+            registry.reload_candidate()
+        except Exception:
+            # A broken candidate never keeps the live model from serving
+            log_event("Failed to load candidate model", traceback.format_exc(), is_error=True)
+    registry.start()
+    if audit_trail is not None:
+        audit_trail.start()
+    startup_metrics["model_load_seconds"] = round(registry.current.load_seconds, 4)
+    startup_metrics["startup_seconds"] = round(time.perf_counter() - PROCESS_START, 4)
+    readiness.update(ready=True, reason=None)
+    log_event("API startup complete", startup_metrics)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop taking new traffic before anything is torn down
+    readiness.update(ready=False, reason="shutting_down")
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+    registry.stop()
+    scoring_pool.shutdown()
+    if shadow_scorer is not None:
+        await run_in_threadpool(shadow_scorer.close)
+    if audit_trail is not None:
+        # Queued audit rows are written before the process exits
+        await run_in_threadpool(audit_trail.close)
+    log_event("API shutdown complete")
+    structured_logging.shutdown_logging()
 
 # =========================
 # Routes
@@ -119,37 +549,225 @@ def startup_event():
 def read_root():
     return {
         "message": "✅ CKD Prediction API is running.",
-        "usage": "POST to /predict with patient data.",
-        "model_last_loaded": time.ctime(last_model_timestamp) if last_model_timestamp else None
+        "usage": "POST to /predict with patient data, or to /predict/batch with a list (or NDJSON) of records.",
+        "model_last_loaded": time.ctime(registry.current.source_mtime) if registry.current else None
+    }
+
+@app.get("/health")
+def health():
+    state = registry.current
+    return {
+        "status": "ok" if state is not None else "loading",
+        "model_version": state.version if state else None,
+        "model_trained_at": state.metadata.get("trained_at") if state else None,
+        "model_legacy": state.metadata.get("legacy", False) if state else None,
+        "startup": startup_metrics
+    }
+
+@app.get("/health/live")
+def health_live():
+    # Liveness only says the event loop answers; it never depends on the model
+    return {"status": "alive", "uptime_seconds": round(time.perf_counter() - PROCESS_START, 3)}
+
+@app.get("/health/ready")
+def health_ready():
+    state = registry.current
+    body = {
+        "status": "ready" if readiness["ready"] else "not_ready",
+        "reason": readiness["reason"],
+        "model_version": state.version if state else None,
+        "backend": state.backend if state else None,
+        # The serving-only path never needs sklearn/pandas; this shows when something pulled them in
+        "sklearn_loaded": "sklearn" in sys.modules,
+        "pandas_loaded": "pandas" in sys.modules,
+        "startup": startup_metrics,
     }
+    if not readiness["ready"]:
+        return JSONResponse(body, status_code=503)
+    return body
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+# =========================
+# Admin: model hot-swap
+# =========================
+def require_admin(x_admin_token: str | None = Header(None)):
+    # Fail closed: admin routes can replace the served model
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@app.get("/admin/model", dependencies=[Depends(require_admin)])
+def model_info():
+    return {"current": current_model().describe(), "history": registry.history()}
+
+@app.post("/admin/model/reload", dependencies=[Depends(require_admin)])
+def reload_model():
+    try:
+        # Loads and warms the new model in this admin request; /predict keeps using the old one meanwhile
+        swapped = registry.reload(force=True)
+    except Exception as e:
+        log_event("Manual model reload failed", traceback.format_exc(), is_error=True)
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving the previous model: {e}")
+    return {"reloaded": swapped, "current": current_model().describe()}
+
+@app.get("/admin/logging", dependencies=[Depends(require_admin)])
+def logging_stats():
+    return {"level": logging.getLevelName(logger.level), "format": LOG_FORMAT, **structured_logging.settings.stats()}
+
+@app.get("/admin/cache", dependencies=[Depends(require_admin)])
+def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+@app.post("/admin/cache/clear", dependencies=[Depends(require_admin)])
+def clear_cache():
+    if prediction_cache is not None:
+        prediction_cache.clear(reason="admin")
+    return {"cleared": prediction_cache is not None}
+
+@app.get("/admin/batching", dependencies=[Depends(require_admin)])
+def batching_stats():
+    if micro_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **micro_batcher.stats()}
+
+@app.get("/admin/admission", dependencies=[Depends(require_admin)])
+def admission_stats():
+    return admission.stats()
+
+@app.get("/admin/audit", dependencies=[Depends(require_admin)])
+def audit_stats():
+    if audit_trail is None:
+        return {"enabled": False}
+    return {"enabled": True, **audit_trail.stats()}
+
+@app.get("/admin/drift", dependencies=[Depends(require_admin)])
+def drift_report():
+    if drift_monitor is None:
+        return {"enabled": False, "reason": "Drift monitoring is disabled (CKD_DRIFT=0)."}
+    return drift_monitor.report()
+
+@app.get("/admin/predictions", dependencies=[Depends(require_admin)])
+def recent_predictions(limit: int = 100, model_version: str | None = None, since: float | None = None):
+    """Most recent audited predictions, newest first (``since`` is a Unix timestamp)."""
+    if audit_trail is None:
+        raise HTTPException(status_code=404, detail="Audit trail is disabled (set CKD_AUDIT=1).")
+    if not 1 <= limit <= 10000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 10000.")
+    return {"predictions": audit_trail.recent(limit, model_version, since)}
+
+@app.post("/admin/model/rollback", dependencies=[Depends(require_admin)])
+def rollback_model():
+    try:
+        state = registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"rolled_back": True, "current": state.describe()}
+
+# =========================
+# Admin: champion/challenger
+# =========================
+def shadow_for_request():
+    if shadow_scorer is None:
+        raise HTTPException(status_code=404, detail="Shadow scoring is disabled (CKD_CANDIDATE_MODEL_PATH is empty).")
+    return shadow_scorer
+
+@app.get("/admin/candidate", dependencies=[Depends(require_admin)])
+def candidate_report():
+    """The candidate model and how it compares with the live one on shadow-scored traffic."""
+    report = shadow_for_request().report()
+    state = registry.current
+    return {"path": CANDIDATE_MODEL_PATH, "live": state.describe() if state else None, **report}
+
+@app.post("/admin/candidate/reload", dependencies=[Depends(require_admin)])
+def reload_candidate():
+    shadow_for_request()
+    try:
+        loaded = registry.reload_candidate(force=True)
+    except Exception as e:
+        log_event("Manual candidate load failed", traceback.format_exc(), is_error=True)
+        raise HTTPException(status_code=500, detail=f"Candidate load failed: {e}")
+    if registry.candidate is None:
+        raise HTTPException(status_code=404, detail=f"No candidate model at '{CANDIDATE_MODEL_PATH}'.")
+    return {"reloaded": loaded, "candidate": registry.candidate.describe()}
+
+@app.post("/admin/candidate/promote", dependencies=[Depends(require_admin)])
+def promote_candidate(force: bool = False):
+    """Make the candidate the live model, once enough shadow traffic has been compared (or with ``force``)."""
+    comparison = shadow_for_request().report()["comparison"]
+    live, candidate = registry.current, registry.candidate
+    if candidate is None:
+        raise HTTPException(status_code=409, detail="No candidate model is loaded.")
+    # Evidence gathered for another pair (a swap or candidate reload since) says nothing about this one
+    if comparison is not None and (live is None or comparison["live_version"] != live.version
+                                   or comparison["candidate_version"] != candidate.version):
+        comparison = None
+    if not force and (comparison is None or not comparison["enough_data"]):
+        rows = comparison["rows_compared"] if comparison else 0
+        raise HTTPException(status_code=409, detail=(
+            f"Only {rows} rows compared so far (CKD_SHADOW_MIN_ROWS={SHADOW_MIN_ROWS}); pass force=true to promote anyway."
+        ))
+    try:
+        if force:
+            state = registry.promote_candidate()
+        else:
+            state = registry.promote_candidate(comparison["live_version"], comparison["candidate_version"])
+    except (LookupError, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"promoted": True, "current": state.describe(), "evidence": comparison}
+
+@app.post("/admin/candidate/discard", dependencies=[Depends(require_admin)])
+def discard_candidate():
+    shadow_for_request()
+    try:
+        state = registry.discard_candidate()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"discarded": state.describe()}
 
 @app.post("/predict")
-def predict(data: PatientData, request: Request):
+async def predict(data: PatientData, request: Request):
     try:
-        # Hot reload model if updated
-        load_model()
+        STAGE_SECONDS.observe(elapsed_since_admitted(request), endpoint="predict", stage="validation")
 
-        # Convert to DataFrame
-        input_df = pd.DataFrame([data.dict()]).astype(float)
+        # Map the validated fields straight into a feature row
+        with STAGE_SECONDS.time(endpoint="predict", stage="features"):
+            row, n_present = patient_to_row(data)
 
-        # Validate that at least one feature is provided
-        if input_df.isnull().all(axis=1).iloc[0]:
-            raise ValueError("No valid input features provided.")
+            # Validate that at least one feature is provided
+            if not n_present:
+                raise ValueError("No valid input features provided.")
+            X = row.reshape(1, -1)
 
-        # Prediction
-        prediction = model.predict(input_df)[0]
-        probability = model.predict_proba(input_df)[0].max()
+        # Prediction (labels come from the same predict_proba pass)
+        labels, probabilities, scored_by = await score_matrix(X)
 
         result = {
-            "prediction": label_encoder.inverse_transform([prediction])[0],
-            "probability": round(float(probability), 4),
+            "prediction": labels[0],
+            "probability": round(float(probabilities[0]), 4),
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "client": request.client.host
         }
 
-        log_event("Prediction made", {"input": data.dict(), "output": result})
+        with STAGE_SECONDS.time(endpoint="predict", stage="logging"):
+            if should_log_prediction():
+                log_event("Prediction made", {"input": data.dict(), "output": result})
+            if drift_monitor is not None:
+                drift_monitor.observe(X)
+            if audit_trail is not None:
+                audit_trail.record("predict", result["client"], scored_by.version, X, labels, probabilities,
+                                   elapsed_since_received(request) * 1000.0)
+            if shadow_scorer is not None:
+                shadow_scorer.submit(X, scored_by, labels, probabilities)
         return result
 
+    except HTTPException:
+        raise
     except ValidationError as ve:
         log_event("Validation error", ve.errors(), is_error=True)
         raise HTTPException(status_code=422, detail=ve.errors())
@@ -159,7 +777,263 @@ def predict(data: PatientData, request: Request):
     except Exception as e:
         log_event("Unexpected error during prediction", traceback.format_exc(), is_error=True)
         raise HTTPException(status_code=500, detail="Internal server error. See server logs for details.")
-    
+
+def build_batch_results(valid_idx, labels, probabilities):
+    return [
+        {"index": i, "prediction": label, "probability": round(float(p), 4)}
+        for i, label, p in zip(valid_idx, labels, probabilities)
+    ]
+
+def observe_scored_batch(request: Request, scored_by, X, labels, probabilities):
+    """Drift, audit and shadow bookkeeping for the valid rows of a scored batch."""
+    if drift_monitor is not None:
+        drift_monitor.observe(X)
+    if audit_trail is not None:
+        audit_trail.record("predict_batch", request.client.host, scored_by.version, X, labels, probabilities,
+                           elapsed_since_received(request) * 1000.0)
+    if shadow_scorer is not None:
+        shadow_scorer.submit(X, scored_by, labels, probabilities)
+
+async def score_batch(records: list, request: Request):
+    client = request.client.host
+    current_model()
+    BATCH_ROWS.observe(len(records))
+    # Validation and result building are CPU-bound; keep them off the event loop
+    with STAGE_SECONDS.time(endpoint="predict_batch", stage="validation"):
+        X, valid_idx, errors = await run_in_threadpool(validate_batch, records)
+
+    results = []
+    if valid_idx:
+        labels, probabilities, scored_by = await score_matrix(X, endpoint="predict_batch")
+        with STAGE_SECONDS.time(endpoint="predict_batch", stage="serialize"):
+            results = await run_in_threadpool(build_batch_results, valid_idx, labels, probabilities)
+        observe_scored_batch(request, scored_by, X, labels, probabilities)
+
+    response = {
+        "count": len(records),
+        "scored": len(results),
+        "failed": len(errors),
+        "results": results,
+        "errors": errors,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "client": client
+    }
+    log_event("Batch prediction made", {"count": len(records), "scored": len(results), "failed": len(errors)})
+    return response
+
+def wants_json(request: Request):
+    # Binary requests get a binary response unless the client explicitly asks for JSON
+    accept = request.headers.get("accept", "")
+    return "application/json" in accept and "vnd." not in accept
+
+def encode_columnar_response(fmt, dtype, labels, probabilities, masks, headers):
+    if fmt == "arrow":
+        return columnar_format.encode_arrow(labels, probabilities, masks, headers)
+    scored = masks == 0
+    # Stable class codes: the model's classes (plus any label of a model swapped in mid-request)
+    classes = np.union1d(current_model().classes.astype(str), labels[scored].astype(str))
+    codes = np.full(len(labels), -1, dtype=np.int8)
+    codes[scored] = np.searchsorted(classes, labels[scored].astype(str))
+    headers["X-CKD-Classes"] = ",".join(classes)
+    return columnar_format.encode_packed(probabilities, masks, codes, dtype)
+
+async def score_columnar(body: bytes, fmt, request: Request):
+    """/predict/batch for columnar payloads: range checks and response encoding are vectorised.
+
+    Every request row gets a result row, in order; rows failing the checks are reported through
+    their error mask instead of failing the batch.
+    """
+    fmt, dtype = fmt
+    client = request.client.host
+    version = current_model().version
+    with STAGE_SECONDS.time(endpoint="predict_batch", stage="parse"):
+        if fmt == "packed":
+            X_all = columnar_format.decode_packed(body, dtype, len(FEATURE_COLUMNS))
+        else:
+            X_all = await run_in_threadpool(columnar_format.decode_arrow, body, FEATURE_COLUMNS)
+    n = len(X_all)
+    if not n:
+        raise ValueError("Batch is empty.")
+    if n > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch too large: {n} records (max {MAX_BATCH_SIZE}).")
+    BATCH_ROWS.observe(n)
+
+    with STAGE_SECONDS.time(endpoint="predict_batch", stage="validation"):
+        masks = columnar_format.validate_matrix(X_all, FEATURE_BOUNDS)
+        valid_idx = np.flatnonzero(masks == 0)
+        X = X_all if len(valid_idx) == n else X_all[valid_idx]
+
+    labels = np.full(n, None, dtype=object)
+    probabilities = np.full(n, np.nan)
+    if len(valid_idx):
+        valid_labels, valid_probabilities, scored_by = await score_matrix(X, endpoint="predict_batch")
+        labels[valid_idx], probabilities[valid_idx] = valid_labels, valid_probabilities
+        version = scored_by.version
+        observe_scored_batch(request, scored_by, X, valid_labels, valid_probabilities)
+
+    log_event("Batch prediction made", {"count": n, "scored": len(valid_idx), "failed": n - len(valid_idx),
+                                        "format": fmt})
+    with STAGE_SECONDS.time(endpoint="predict_batch", stage="serialize"):
+        if wants_json(request):
+            failed = np.flatnonzero(masks)
+            return {
+                "count": n,
+                "scored": len(valid_idx),
+                "failed": len(failed),
+                "results": build_batch_results(valid_idx.tolist(), labels[valid_idx], probabilities[valid_idx]),
+                "errors": [{"index": int(i), "detail": columnar_format.describe_error(int(masks[i]), FEATURE_COLUMNS,
+                                                                                     FEATURE_BOUNDS)}
+                           for i in failed],
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "client": client
+            }
+        headers = {
+            "X-CKD-Count": str(n),
+            "X-CKD-Scored": str(len(valid_idx)),
+            "X-CKD-Failed": str(n - len(valid_idx)),
+            "X-CKD-Model-Version": str(version),
+        }
+        content = encode_columnar_response(fmt, dtype, labels, probabilities, masks, headers)
+    return Response(content=content, media_type=columnar_format.media_type(fmt, dtype), headers=headers)
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """Score many patients at once.
+
+    Accepts a JSON array of PatientData records, or NDJSON (one record per line) when sent
+    with an ``application/x-ndjson`` content type. Invalid rows are reported in ``errors``
+    without failing the rest of the batch. High-volume clients can send the batch as columns
+    of floats instead (see columnar_format.py) and get the results back in the same format.
+    """
+    try:
+        fmt = columnar_format.request_format(request.headers.get("content-type", ""))
+        if fmt is not None:
+            return await score_columnar(await request.body(), fmt, request)
+        with STAGE_SECONDS.time(endpoint="predict_batch", stage="parse"):
+            records = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+        if not records:
+            raise ValueError("Batch is empty.")
+        if len(records) > MAX_BATCH_SIZE:
+            raise ValueError(f"Batch too large: {len(records)} records (max {MAX_BATCH_SIZE}).")
+        return await score_batch(records, request)
+
+    except HTTPException:
+        raise
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as ve:
+        log_event("Bad batch input", str(ve), is_error=True)
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        log_event("Unexpected error during batch prediction", traceback.format_exc(), is_error=True)
+        raise HTTPException(status_code=500, detail="Internal server error. See server logs for details.")
+
+
+# =========================
+# Explanations
+# =========================
+def explainer_for_request():
+    state = current_model()
+    if not EXPLAIN_ENABLED:
+        raise HTTPException(status_code=404, detail="Explanations are disabled (CKD_EXPLAIN=0).")
+    if state.explainer is None:
+        raise HTTPException(status_code=501, detail="Explanations are not available for this model.")
+    return state
+
+def explain_rows(state, X: np.ndarray):
+    """Per-row prediction plus Saabas contributions of every feature toward the predicted class.
+
+    ``base_value`` + the sum of the contributions equals ``probability`` (before rounding).
+    Missing features are scored (and credited) at their imputed training value.
+    """
+    engine = state.explainer
+    proba, contributions = engine.explain(X)
+    best = proba.argmax(axis=1)
+    labels = state.classes[state.model_classes[best]]
+    results = []
+    for i, k in enumerate(best):
+        contribution = contributions[i, :, k]
+        results.append({
+            "prediction": labels[i],
+            "probability": round(float(proba[i, k]), 4),
+            "base_value": round(float(engine.base_value[k]), 4),
+            "contributions": [
+                {
+                    "feature": FEATURE_COLUMNS[j],
+                    "value": None if np.isnan(X[i, j]) else float(X[i, j]),
+                    "imputed": bool(np.isnan(X[i, j])),
+                    "contribution": round(float(contribution[j]), 4),
+                }
+                for j in np.argsort(-np.abs(contribution), kind="stable")
+            ],
+        })
+    return results
+
+@app.post("/explain")
+async def explain(data: PatientData, request: Request):
+    """Why the model predicts what it does for one patient: per-feature contributions."""
+    try:
+        state = explainer_for_request()
+        row, n_present = patient_to_row(data)
+        if not n_present:
+            raise ValueError("No valid input features provided.")
+        with STAGE_SECONDS.time(endpoint="explain", stage="explain"):
+            result = (await run_in_threadpool(explain_rows, state, row.reshape(1, -1)))[0]
+        result.update({
+            "model_version": state.version,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "client": request.client.host
+        })
+        return result
+
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        log_event("Bad input value", str(ve), is_error=True)
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        log_event("Unexpected error during explanation", traceback.format_exc(), is_error=True)
+        raise HTTPException(status_code=500, detail="Internal server error. See server logs for details.")
+
+@app.post("/explain/batch")
+async def explain_batch(request: Request):
+    """Explain many patients at once (JSON array or NDJSON, like /predict/batch)."""
+    try:
+        state = explainer_for_request()
+        records = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+        if not records:
+            raise ValueError("Batch is empty.")
+        if len(records) > MAX_EXPLAIN_BATCH_SIZE:
+            raise ValueError(f"Batch too large: {len(records)} records (max {MAX_EXPLAIN_BATCH_SIZE}).")
+        X, valid_idx, errors = await run_in_threadpool(validate_batch, records)
+
+        results = []
+        if valid_idx:
+            with STAGE_SECONDS.time(endpoint="explain_batch", stage="explain"):
+                results = await run_in_threadpool(explain_rows, state, X)
+            for i, result in zip(valid_idx, results):
+                result["index"] = i
+        return {
+            "count": len(records),
+            "explained": len(results),
+            "failed": len(errors),
+            "results": results,
+            "errors": errors,
+            "model_version": state.version,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "client": request.client.host
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        log_event("Bad batch input", str(ve), is_error=True)
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        log_event("Unexpected error during batch explanation", traceback.format_exc(), is_error=True)
+        raise HTTPException(status_code=500, detail="Internal server error. See server logs for details.")
+
+
 # Predefined test cases for quick model testing
 TEST_CASES = {
     1: {  # CKD-like case
@@ -173,30 +1047,35 @@ TEST_CASES = {
 }
 
 @app.get("/test_case/{case_id}")
-def run_test_case(case_id: int, request: Request):
+async def run_test_case(case_id: int, request: Request):
     try:
         if case_id not in TEST_CASES:
             raise HTTPException(status_code=404, detail="Test case not found")
 
-        load_model()
         data = TEST_CASES[case_id]
-        input_df = pd.DataFrame([data]).astype(float)
+        # Fixed fixtures, scored as-is (some sit on the edge of the PatientData ranges)
+        row = np.array([[data.get(col, np.nan) for col in FEATURE_COLUMNS]], dtype=np.float64)
 
-        prediction = model.predict(input_df)[0]
-        probability = model.predict_proba(input_df)[0].max()
+        labels, probabilities, _ = await score_matrix(row, endpoint="test_case")
 
         result = {
             "case_id": case_id,
             "input": data,
-            "prediction": label_encoder.inverse_transform([prediction])[0],
-            "probability": round(float(probability), 4),
+            "prediction": labels[0],
+            "probability": round(float(probabilities[0]), 4),
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "client": request.client.host
         }
 
-        log_event("Test case run", result)
+        if should_log_prediction():
+            log_event("Test case run", result)
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         log_event("Error running test case", str(e), is_error=True)
-        raise HTTPException(status_code=500, detail="Internal server error.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+# Module import cost (FastAPI, NumPy, the serving modules); the model load is timed separately
+startup_metrics["import_seconds"] = round(time.perf_counter() - PROCESS_START, 4)
@@ -0,0 +1,231 @@
+import argparse
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+import numpy as np
+
+# =========================
+# Memory-mapped model file
+# =========================
+# A pickled bundle is read and unpickled in full by every uvicorn/gunicorn worker, so N workers
+# hold N private copies of the forest and each pays the full load on every deploy or hot reload.
+# A mapped model file stores the compiled forest arrays (nodes, thresholds, leaf values) raw and
+# 64-byte aligned, so every process maps the same pages of the OS page cache read-only:
+#
+#   MAGIC (8 bytes) | header length (uint64 LE) | JSON header | padding | arrays ... | meta | model
+#
+#   header : {"version", "arrays": {name: {"dtype", "shape", "offset"}}, "sections": {...},
+#             "source": {"path", "sha256", "mtime"} of the bundle it was exported from, ...}
+#   meta   : small pickle of the bundle without its model (classes, features, metadata)
+#   model  : pickle of the sklearn pipeline, only unpickled if something needs sklearn
+#            (the sklearn backend, or batches above CKD_COMPILED_MAX_ROWS)
+#
+# load_bundle() in model_bundle.py recognises the magic, so CKD_MODEL_PATH can point at either
+# a .pkl bundle or a mapped file.
+MAGIC = b"CKDMMAP1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+OUTPUT_PATH = "ckd_model.ckdm"
+
+
+def is_mapped_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class LazyPipeline:
+    """Stands in for the sklearn pipeline of a mapped bundle until it is actually used.
+
+    ``classes_`` comes from the header, so serving with the compiled backend never unpickles
+    the trees. The first attribute access that needs the real pipeline loads it from the
+    mapping (which keeps pointing at the original file even if it is replaced on disk).
+    """
+
+    def __init__(self, buffer, offset, length, classes):
+        self.classes_ = classes
+        self._buffer, self._offset, self._length = buffer, offset, length
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self._pipeline is not None
+
+    def load(self):
+        if self._pipeline is None:
+            with self._lock:
+                if self._pipeline is None:
+                    self._pipeline = pickle.loads(self._buffer[self._offset:self._offset + self._length])
+        return self._pipeline
+
+    def __getattr__(self, name):
+        # Only called for attributes not set in __init__
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __reduce__(self):
+        # Shipping a mapped model to another process sends the real pipeline
+        return (_identity, (self.load(),))
+
+
+def _identity(obj):
+    return obj
+
+
+def _align(n):
+    return -n % ALIGNMENT
+
+
+def save_mapped(bundle, path, engine, input_features, atol=0.0, source=None):
+    """Write ``bundle`` plus its compiled forest ``engine`` as a mapped model file (atomically)."""
+    arrays, meta = engine.to_arrays()
+    model_blob = pickle.dumps(bundle["model"], protocol=pickle.HIGHEST_PROTOCOL)
+    rest = {k: v for k, v in bundle.items() if k not in ("model", "compiled")}
+    meta_blob = pickle.dumps(rest, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Offsets are relative to the end of the (padded) header, which is only known afterwards
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes + _align(array.nbytes)
+    sections = {"meta": [offset, len(meta_blob)], "model": [offset + len(meta_blob), len(model_blob)]}
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "arrays": layout,
+        "sections": sections,
+        "input_features": list(input_features),
+        "max_depth": meta["max_depth"],
+        "atol": atol,
+        "model_classes": np.asarray(bundle["model"].classes_).tolist(),
+        "source": source,
+    }).encode()
+    prefix = len(MAGIC) + 8 + len(header)
+    padding = _align(prefix)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header) + padding))
+        f.write(header)
+        f.write(b" " * padding)
+        for array in arrays.values():
+            f.write(array.tobytes())
+            f.write(b"\0" * _align(array.nbytes))
+        f.write(meta_blob)
+        f.write(model_blob)
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    """The JSON header of a mapped model file, without mapping the rest of it."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not a mapped model file.")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(header_length))
+
+
+def load_mapped(path):
+    """Map a model file read-only and return a bundle whose compiled arrays live in the mapping."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"'{path}' is not a mapped model file.")
+    (header_length,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+    base = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[base:base + header_length]))
+    if header["version"] > FORMAT_VERSION:
+        raise ValueError(f"Mapped model format {header['version']} is newer than supported ({FORMAT_VERSION}).")
+    data_start = base + header_length
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + spec["offset"]
+        ).reshape(spec["shape"])
+
+    meta_offset, meta_length = header["sections"]["meta"]
+    model_offset, model_length = header["sections"]["model"]
+    bundle = pickle.loads(buffer[data_start + meta_offset:data_start + meta_offset + meta_length])
+    bundle["model"] = LazyPipeline(buffer, data_start + model_offset, model_length,
+                                   np.asarray(header["model_classes"]))
+    bundle["compiled"] = {
+        "input_features": header["input_features"],
+        "arrays": arrays,
+        "max_depth": header["max_depth"],
+        "atol": header["atol"],
+        # Checked against the pipeline when the file was written; re-checking on every load
+        # would unpickle the pipeline in every worker and defeat the mapping
+        "verified": True,
+    }
+    bundle["storage"] = "mmap"
+    return bundle
+
+
+def export_mapped(bundle, path, source_path=None):
+    """Compile (or reuse the compacted arrays of) ``bundle``, check parity and write it mapped.
+
+    ``source_path`` is the bundle file it came from; its hash is recorded so serve.py can tell
+    when the mapped file is older than the bundle.
+    """
+    from fast_forest import CompiledForest, compile_pipeline, verify_parity
+    from model_bundle import file_sha256
+
+    features = [f["name"] for f in bundle["features"]]
+    packed = bundle.get("compiled")
+    if packed and packed["input_features"] == features:
+        engine = CompiledForest.from_arrays(packed["arrays"], packed["max_depth"])
+        atol = packed["atol"]
+    else:
+        engine = compile_pipeline(bundle["model"], features)
+        atol = 0.0
+    verify_parity(bundle["model"], engine, features, atol=atol)
+    source = {
+        "path": os.path.basename(source_path),
+        "sha256": file_sha256(source_path),
+        "mtime": os.path.getmtime(source_path),
+    } if source_path else None
+    save_mapped(bundle, path, engine, features, atol, source)
+    return engine
+
+
+def main():
+    from model_bundle import load_bundle
+
+    parser = argparse.ArgumentParser(description="Convert a model bundle into a memory-mapped model file.")
+    parser.add_argument("--model", default="ckd_model.pkl", help="Bundle to convert")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Where to write the mapped model file")
+    args = parser.parse_args()
+
+    print(f"📂 Loading {args.model}...")
+    bundle = load_bundle(args.model)
+    engine = export_mapped(bundle, args.output, source_path=args.model)
+    print(f"💾 Mapped model saved to {args.output} ({engine.n_trees} trees, {engine.n_nodes} nodes, "
+          f"{engine.nbytes()} bytes of arrays)")
+
+    def best_ms(fn, repeat=5):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000.0)
+        return min(samples)
+
+    pickle_ms = best_ms(lambda: load_bundle(args.model))
+    mapped_ms = best_ms(lambda: load_mapped(args.output))
+    print(f"⏱️  Load time: pickle {pickle_ms:.2f} ms, mapped {mapped_ms:.2f} ms")
+    print(f"   Serve it with CKD_MODEL_PATH={args.output} CKD_INFERENCE_BACKEND=compiled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import asyncio
+import collections
+import time
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesces concurrent small scoring requests into one matrix call.
+
+    Requests wait at most ``max_wait_ms`` (or until ``max_rows`` rows are queued), then the
+    whole group is scored with a single ``score_fn`` call and each caller gets its own rows
+    back. Up to ``max_concurrency`` batches can be scoring at once, so a process pool with
+    several workers stays busy.
+    """
+
+    def __init__(self, score_fn, max_rows=64, max_wait_ms=2.0, max_concurrency=1, sample_size=2048):
+        self.score_fn = score_fn          # async (X) -> (proba, state)
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrency = max_concurrency
+        self._queue = None
+        self._task = None
+        self._slots = None
+
+        # Stats: batch sizes bucketed by powers of two, queueing delay samples
+        self.batches = 0
+        self.rows = 0
+        self.size_buckets = collections.Counter()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._wait_samples = collections.deque(maxlen=sample_size)
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, X):
+        """Queue ``X`` for the next batch; returns ``(proba, state)`` for these rows only."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            batch, n_rows = [first], len(first[0])
+            deadline = time.perf_counter() + self.max_wait
+            while n_rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+
+            await self._slots.acquire()
+            asyncio.get_running_loop().create_task(self._score(batch, n_rows))
+
+    async def _score(self, batch, n_rows):
+        try:
+            started = time.perf_counter()
+            self._record(batch, n_rows, started)
+            X = np.vstack([item[0] for item in batch]) if len(batch) > 1 else batch[0][0]
+            try:
+                proba, state = await self.score_fn(X)
+            except BaseException as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            offset = 0
+            for rows, future, _ in batch:
+                if not future.done():
+                    future.set_result((proba[offset:offset + len(rows)], state))
+                offset += len(rows)
+        finally:
+            self._slots.release()
+
+    def _record(self, batch, n_rows, dispatched_at):
+        self.batches += 1
+        self.rows += n_rows
+        self.size_buckets[1 << max(n_rows - 1, 0).bit_length()] += 1
+        for _, _, enqueued_at in batch:
+            wait = dispatched_at - enqueued_at
+            self.wait_count += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self._wait_samples.append(wait)
+
+    def stats(self):
+        waits = np.array(self._wait_samples) * 1000.0
+        percentiles = (
+            {f"p{q}": round(float(np.percentile(waits, q)), 3) for q in (50, 95, 99)} if waits.size else {}
+        )
+        return {
+            "max_rows": self.max_rows,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_concurrency": self.max_concurrency,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_rows": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "batch_rows_histogram": {f"<={size}": count for size, count in sorted(self.size_buckets.items())},
+            "queue_wait_ms": {
+                "count": self.wait_count,
+                "mean": round(self.wait_total / self.wait_count * 1000.0, 3) if self.wait_count else 0.0,
+                "max": round(self.wait_max * 1000.0, 3),
+                **percentiles,
+            },
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -1,84 +1,70 @@
-import pandas as pd
+import os
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 import pickle
+from preprocessing import ID_COL, TARGET_COL, build_preprocessor, load_frame
 
-DATA_PATH = "../data/csv_result-chronic_kidney_disease_full.csv"
+DATA_PATH = os.getenv(
+    "CKD_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "csv_result-chronic_kidney_disease_full.csv")
+)
 MODEL_PATH = "../ckd_model.pkl"
 
 def load_and_preprocess_data(path):
     print(f"🔍 Loading dataset from: {path}\n")
-    # Load CSV with warnings on bad lines
-    df = pd.read_csv(path, on_bad_lines='warn')
-
-    # Strip quotes and whitespace from column names
-    df.columns = [col.strip().strip("'") for col in df.columns]
+    # Cleaned (quotes stripped, '?' as NaN) and typed by the shared preprocessing module
+    df, numeric_cols, categorical_cols = load_frame(path)
     print(f"✅ Columns loaded: {df.columns.tolist()}")
 
     # Drop 'id' column if exists
-    if 'id' in df.columns:
-        df.drop(columns=['id'], inplace=True)
+    if ID_COL in df.columns:
+        df = df.drop(columns=[ID_COL])
         print("🧹 Dropped 'id' column\n")
 
-    # Replace '?' with NaN
-    df.replace('?', np.nan, inplace=True)
-
-    # Detect numeric and categorical columns (exclude target 'class')
-    numeric_cols = []
-    categorical_cols = []
-    for col in df.columns:
-        if col == 'class':
-            continue
-        sample = df[col].dropna().iloc[:10]
-        if sample.empty:
-            # If no data, treat as categorical to be safe
-            categorical_cols.append(col)
-            continue
-        try:
-            pd.to_numeric(sample)
-            numeric_cols.append(col)
-        except:
-            categorical_cols.append(col)
-
     print(f"🔢 Numeric columns detected: {numeric_cols}")
     print(f"🔤 Categorical columns detected: {categorical_cols}\n")
 
-    # Convert numeric columns to numeric dtype
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
     # Show missing values count
     print("🚨 Missing Values per column:")
     print(df.isnull().sum(), "\n")
 
-    # Impute missing values: numeric -> median, categorical -> mode
-    for col in numeric_cols:
-        median_val = df[col].median()
-        df[col] = df[col].fillna(median_val)
+    # Impute missing values (numeric -> median, categorical -> mode) and encode categoricals
+    preprocessor = build_preprocessor(numeric_cols, categorical_cols, numeric_strategy='median')
+    transformed = preprocessor.fit_transform(df)
+    df[numeric_cols] = transformed[:, :len(numeric_cols)]
+    df[categorical_cols] = transformed[:, len(numeric_cols):].astype(np.int64)
+
+    num_imputer = preprocessor.named_transformers_['num'].named_steps['imputer']
+    for col, median_val in zip(numeric_cols, num_imputer.statistics_):
         print(f"Imputed numeric column '{col}' with median: {median_val}")
 
-    for col in categorical_cols:
-        mode_val = df[col].mode(dropna=True)[0] if not df[col].mode(dropna=True).empty else 'missing'
-        df[col] = df[col].fillna(mode_val)
-        print(f"Imputed categorical column '{col}' with mode: '{mode_val}'")
+    label_encoders = {}
+    if categorical_cols:
+        cat_steps = preprocessor.named_transformers_['cat'].named_steps
+        for col, mode_val, categories in zip(categorical_cols, cat_steps['imputer'].statistics_,
+                                             cat_steps['encoder'].categories_):
+            print(f"Imputed categorical column '{col}' with mode: '{mode_val}'")
+            # Same sorted codes the OrdinalEncoder produced, kept as LabelEncoders for the saved artifact
+            le = LabelEncoder()
+            le.classes_ = np.asarray(categories)
+            label_encoders[col] = le
 
     print()
 
-    # Encode categorical columns + target 'class' with LabelEncoder
-    label_encoders = {}
-    for col in categorical_cols + ['class']:
-        le = LabelEncoder()
-        df[col] = le.fit_transform(df[col])
-        label_encoders[col] = le
+    # Encode target 'class' with LabelEncoder
+    le = LabelEncoder()
+    df[TARGET_COL] = le.fit_transform(df[TARGET_COL])
+    label_encoders[TARGET_COL] = le
+    for col, le in label_encoders.items():
         print(f"Encoded '{col}' with classes: {list(le.classes_)}")
 
     print("\n✅ Data preprocessing complete.\n")
 
-    return df, label_encoders, numeric_cols, categorical_cols
+    return df, label_encoders, numeric_cols, categorical_cols, preprocessor
 
-def train_and_save_model(df, label_encoders, numeric_cols, categorical_cols, model_path):
+def train_and_save_model(df, label_encoders, numeric_cols, categorical_cols, model_path, preprocessor=None):
     print("🚀 Starting model training...")
     X = df.drop(columns=['class'])
     y = df['class']
@@ -100,11 +86,12 @@ def train_and_save_model(df, label_encoders, numeric_cols, categorical_cols, mod
             'model': model,
             'label_encoders': label_encoders,
             'numeric_cols': numeric_cols,
-            'categorical_cols': categorical_cols
+            'categorical_cols': categorical_cols,
+            'preprocessor': preprocessor
         }, f)
 
     print(f"✅ Model saved to: {model_path}\n")
 
 if __name__ == "__main__":
-    df, label_encoders, numeric_cols, categorical_cols = load_and_preprocess_data(DATA_PATH)
-    train_and_save_model(df, label_encoders, numeric_cols, categorical_cols, MODEL_PATH)
\ No newline at end of file
+    df, label_encoders, numeric_cols, categorical_cols, preprocessor = load_and_preprocess_data(DATA_PATH)
+    train_and_save_model(df, label_encoders, numeric_cols, categorical_cols, MODEL_PATH, preprocessor)
\ No newline at end of file
@@ -1,124 +1,210 @@
-import pandas as pd
+import argparse
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
 import numpy as np
-import pickle
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, OrdinalEncoder
-from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import Pipeline
-from sklearn.compose import ColumnTransformer
-from imblearn.over_sampling import SMOTE
 from sklearn.metrics import classification_report
-
-def train_model():
-    print("📂 Loading dataset...")
-    df = pd.read_csv(r"D:\Work\Others\Hamed\Project\BackEnd\Data\csv_result-chronic_kidney_disease_full.csv", on_bad_lines='skip')
-    df.replace("?", np.nan, inplace=True)
-    df.columns = df.columns.str.strip().str.replace("'", "")
-
-    target_col = "class"
-    id_col = "id"
-    leak_cols = [
-        'htn', 'dm', 'cad', 'appet', 'pe', 'ane',
-        'pcc', 'ba', 'al', 'su', 'rbc', 'pc'
-    ]
-
-    # Separate target & features
-    y = df[target_col]
-    X = df.drop(columns=[target_col, id_col] + leak_cols)
-
-    # Identify column types
-    numeric_cols = X.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = X.select_dtypes(exclude=['number']).columns.tolist()
-
-    # Encode target
-    label_enc = LabelEncoder()
-    y_encoded = label_enc.fit_transform(y)
-
-    # Convert numeric columns
-    for col in numeric_cols:
-        X[col] = pd.to_numeric(X[col], errors='coerce')
-
-    # Impute numeric
-    num_imputer = SimpleImputer(strategy='mean')
-    X_num = num_imputer.fit_transform(X[numeric_cols]) if numeric_cols else np.empty((len(X), 0))
-
-    # Impute categorical
-    cat_imputer = SimpleImputer(strategy='most_frequent')
-    X_cat = cat_imputer.fit_transform(X[categorical_cols]) if categorical_cols else np.empty((len(X), 0))
-
-    # Encode categorical for SMOTE
-    cat_encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
-    X_cat_enc = cat_encoder.fit_transform(X_cat) if categorical_cols else np.empty((len(X), 0))
-
-    # Combine numeric + categorical
-    X_processed = np.hstack([X_num, X_cat_enc])
-
-    # Apply SMOTE
-    print("🔄 Applying SMOTE to balance dataset...")
-    smote = SMOTE(random_state=42)
-    X_resampled, y_resampled = smote.fit_resample(X_processed, y_encoded)
-
-    # Prepare final DataFrame
-    df_num_resampled = pd.DataFrame(X_resampled[:, :len(numeric_cols)], columns=numeric_cols)
-    if categorical_cols:
-        X_cat_decoded = cat_encoder.inverse_transform(X_resampled[:, len(numeric_cols):])
-        df_cat_resampled = pd.DataFrame(X_cat_decoded, columns=categorical_cols)
+from drift_monitor import build_reference_profile
+from model_bundle import build_bundle, file_sha256, save_bundle
+from preprocessing import OVERSAMPLER, build_preprocessor, load_dataset, smote_resample
+
+DATA_PATH = os.getenv(
+    "CKD_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "csv_result-chronic_kidney_disease_full.csv")
+)
+MODEL_PATH = "ckd_model.pkl"
+# Optional copy of the SMOTE-resampled training set: .npz (NumPy) or .parquet (needs pyarrow)
+RESAMPLED_PATH = os.getenv("CKD_RESAMPLED_PATH", "")
+# Hold-out split, shared with model_search.py and reproduced by compact_model.py
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+
+class TrainingProfile:
+    """Wall time per training stage, plus peak traced memory with ``memory=True``.
+
+    tracemalloc hooks every allocation and slows allocation-heavy stages (SMOTE, the fit)
+    noticeably, so memory is only traced on request and the timings are otherwise clean.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stages = {}
+        self._owns_tracing = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total_seconds = time.perf_counter() - self._started
+        if self._owns_tracing:
+            tracemalloc.stop()
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        if self.memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # A stage entered more than once (e.g. once per minority class) adds up its time
+            previous = self.stages.get(name, {"seconds": 0.0})
+            self.stages[name] = {"seconds": round(previous["seconds"] + time.perf_counter() - started, 4)}
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                self.stages[name]["peak_mb"] = max(previous.get("peak_mb", 0.0), round(peak / 1024 / 1024, 2))
+
+    def summary(self):
+        return {
+            "total_seconds": round(self.total_seconds, 4),
+            # None: memory was not traced (train with --profile-memory)
+            "peak_mb": max((s["peak_mb"] for s in self.stages.values()), default=0.0) if self.memory else None,
+            "stages": self.stages,
+        }
+
+    def report(self):
+        print("\n⏱️  Training profile:")
+        for name, s in self.stages.items():
+            peak = f"   peak {s['peak_mb']:>8.2f} MB" if self.memory else ""
+            print(f"   {name:<15} {s['seconds']:>8.3f} s{peak}")
+        summary = self.summary()
+        peak = f"   peak {summary['peak_mb']:>8.2f} MB" if self.memory else ""
+        print(f"   {'total':<15} {summary['total_seconds']:>8.3f} s{peak}")
+
+
+def save_resampled(X, y, classes, path):
+    """Persist the resampled training set without losing dtypes."""
+    if path.endswith(".parquet"):
+        df = X.copy()
+        df["class"] = np.asarray(classes)[y]
+        df.to_parquet(path, index=False)
     else:
-        df_cat_resampled = pd.DataFrame()
-
-    df_resampled = pd.concat([df_num_resampled, df_cat_resampled], axis=1)
-    df_resampled[target_col] = label_enc.inverse_transform(y_resampled)
-
-    print("💾 Saving resampled dataset...")
-    df_resampled.to_csv("resampled_data.csv", index=False)
-
-    # Load resampled data for training
-    df = pd.read_csv("resampled_data.csv", on_bad_lines='skip')
-    X = df.drop(columns=[target_col])
-    y = df[target_col]
-    y = label_enc.fit_transform(y)
-
-    # Identify numeric & categorical columns
-    numeric_cols = X.select_dtypes(include=['int64', 'float64']).columns.tolist()
-    categorical_cols = X.select_dtypes(exclude=['int64', 'float64']).columns.tolist()
-
-    numeric_transformer = Pipeline(steps=[
-        ('imputer', SimpleImputer(strategy='mean'))
+        numeric = X.select_dtypes(include=['number'])
+        categorical = X.select_dtypes(exclude=['number'])
+        np.savez(
+            path,
+            X_num=numeric.to_numpy(dtype=np.float64),
+            num_cols=np.asarray(numeric.columns, dtype=str),
+            X_cat=categorical.to_numpy(dtype=str),
+            cat_cols=np.asarray(categorical.columns, dtype=str),
+            y=np.asarray(y),
+            classes=np.asarray(classes, dtype=str),
+        )
+
+
+def build_pipeline(numeric_cols, categorical_cols, classifier=None):
+    return Pipeline(steps=[
+        ('preprocessor', build_preprocessor(numeric_cols, categorical_cols)),
+        ('classifier', classifier if classifier is not None else RandomForestClassifier(random_state=42))
     ])
 
-    categorical_transformer = Pipeline(steps=[
-        ('imputer', SimpleImputer(strategy='most_frequent')),
-        ('encoder', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1))
-    ])
 
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', numeric_transformer, numeric_cols),
-            ('cat', categorical_transformer, categorical_cols)
-        ]
+def train_model(resampled_path=RESAMPLED_PATH, model_path=MODEL_PATH, oversampler=None, approximate=None,
+                profile_memory=False):
+    with TrainingProfile(memory=profile_memory) as profile:
+        with profile.stage("load"):
+            print("📂 Loading dataset...")
+            X, y, numeric_cols, categorical_cols = load_dataset(DATA_PATH)
+
+            # Encode target
+            label_enc = LabelEncoder()
+            y_encoded = label_enc.fit_transform(y)
+
+            # Live traffic is compared against the real patients, not the SMOTE'd set
+            reference_profile = build_reference_profile(X, numeric_cols)
+
+        oversampler = oversampler or OVERSAMPLER
+        X, y = smote_resample(X, y_encoded, numeric_cols, categorical_cols, profile,
+                              method=oversampler, approximate=approximate)
+
+        if resampled_path:
+            with profile.stage("persist"):
+                print(f"💾 Saving resampled dataset to {resampled_path}...")
+                save_resampled(X, y, label_enc.classes_, resampled_path)
+
+        model = build_pipeline(numeric_cols, categorical_cols)
+
+        with profile.stage("fit"):
+            print("⚡ Training model...")
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+            model.fit(X_train, y_train)
+
+        with profile.stage("evaluate"):
+            acc = model.score(X_test, y_test)
+            print(f"✅ Model trained with accuracy: {acc:.2f}")
+            y_pred = model.predict(X_test)
+            print("\n📊 Classification Report:\n")
+            print(classification_report(y_test, y_pred, target_names=label_enc.classes_))
+
+    profile.report()
+
+    # Save model bundle (pipeline + class labels + feature schema + metadata)
+    print(f"💾 Saving trained model bundle to {model_path}...")
+    bundle = build_bundle(
+        model,
+        classes=label_enc.classes_,
+        numeric_cols=numeric_cols,
+        categorical_cols=categorical_cols,
+        metadata={
+            "accuracy": round(float(acc), 4),
+            "n_train": int(len(X_train)),
+            "n_test": int(len(X_test)),
+            "data_path": os.path.abspath(DATA_PATH),
+            "data_sha256": file_sha256(DATA_PATH),
+            "classifier_params": model.named_steps['classifier'].get_params(),
+            "oversampler": oversampler,
+            "training_profile": profile.summary(),
+        },
+        reference_profile=reference_profile,
     )
-
-    model = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('classifier', RandomForestClassifier(random_state=42))
-    ])
-
-    print("⚡ Training model...")
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model.fit(X_train, y_train)
-
-    acc = model.score(X_test, y_test)
-    print(f"✅ Model trained with accuracy: {acc:.2f}")
-    y_pred = model.predict(X_test)
-    print("\n📊 Classification Report:\n")
-    print(classification_report(y_test, y_pred, target_names=label_enc.classes_))
-
-    # Save model
-    print("💾 Saving trained model to ckd_model.pkl...")
-    with open("ckd_model.pkl", "wb") as f:
-        pickle.dump(model, f)
+    save_bundle(bundle, model_path)
     print("🎉 Training complete! Model ready for use.")
+    return bundle
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the CKD model and save it as a bundle.")
+    parser.add_argument("--search", choices=["grid", "halving"],
+                        help="Run a cross-validated hyperparameter search instead of a single fit")
+    parser.add_argument("--cv", type=int, default=5, help="Stratified folds for --search (default: 5)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel fits for --search (default: all cores)")
+    parser.add_argument("--scoring", default="accuracy", help="sklearn scorer for --search (default: accuracy)")
+    parser.add_argument("--tolerance", type=float, default=0.005,
+                        help="Candidates within this of the best CV score compete on latency (default: 0.005)")
+    parser.add_argument("--top", type=int, default=10, help="Candidates refit and timed for the leaderboard")
+    parser.add_argument("--leaderboard", default="leaderboard.json", help="Where --search writes its leaderboard")
+    parser.add_argument("--output", default=MODEL_PATH,
+                        help="Bundle path (ckd_model.candidate.pkl stages it for shadow scoring instead of serving it)")
+    parser.add_argument("--oversampler", choices=["smote", "fast"], default=OVERSAMPLER,
+                        help="imblearn SMOTE or the SMOTE-NC in fast_smote.py (default: CKD_OVERSAMPLER)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Approximate neighbour search for --oversampler fast; exact search is no faster "
+                             "than imblearn, so use this on large training sets")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Also trace peak memory per training stage (tracemalloc; slows the stages down)")
+    parser.add_argument("--save-resampled", metavar="PATH", default=RESAMPLED_PATH,
+                        help="Also keep the resampled training set (.npz, or .parquet with pyarrow; "
+                             "default: CKD_RESAMPLED_PATH, empty = not saved)")
+    args = parser.parse_args()
+
+    if args.search:
+        from model_search import search_model
+        search_model(
+            method=args.search, cv=args.cv, n_jobs=args.n_jobs, scoring=args.scoring,
+            tolerance=args.tolerance, top=args.top, leaderboard_path=args.leaderboard, model_path=args.output,
+            oversampler=args.oversampler, approximate=args.approximate or None,
+        )
+    else:
+        train_model(resampled_path=args.save_resampled, model_path=args.output, oversampler=args.oversampler,
+                    approximate=args.approximate or None, profile_memory=args.profile_memory)
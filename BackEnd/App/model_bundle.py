@@ -0,0 +1,93 @@
+import hashlib
+import os
+import pickle
+import platform
+import time
+
+# =========================
+# Model bundle format
+# =========================
+# A bundle is a plain dict pickled to ckd_model.pkl. It carries everything the API needs
+# to serve, so startup never has to touch the training CSV:
+#   format_version : int, bumped on incompatible layout changes
+#   model          : fitted sklearn Pipeline (predicts encoded class indices)
+#   classes        : class labels, indexed by the encoded class the model predicts
+#   features       : ordered feature schema [{"name": ..., "kind": "numeric" | "categorical"}]
+#   metadata       : training metadata (timestamp, library versions, metrics, data hash, ...)
+#   compiled       : optional, written by compact_model.py: compact CompiledForest arrays
+#                    {"input_features", "arrays", "max_depth", "atol"} used by the compiled backend
+#   storage        : set to "mmap" by load_bundle() for memory-mapped model files
+#   reference_profile : optional training-data histograms for drift monitoring (drift_monitor.py)
+BUNDLE_FORMAT_VERSION = 1
+
+# LabelEncoder sorts labels, so models saved before bundles existed predict 0 = ckd, 1 = notckd
+DEFAULT_CLASSES = ["ckd", "notckd"]
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_bundle(model, classes, numeric_cols, categorical_cols, metadata=None, reference_profile=None):
+    import sklearn
+
+    features = [{"name": col, "kind": "numeric"} for col in numeric_cols]
+    features += [{"name": col, "kind": "categorical"} for col in categorical_cols]
+    meta = {
+        "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python_version": platform.python_version(),
+        "sklearn_version": sklearn.__version__,
+    }
+    meta.update(metadata or {})
+    bundle = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model": model,
+        "classes": [str(c) for c in classes],
+        "features": features,
+        "metadata": meta,
+    }
+    if reference_profile is not None:
+        bundle["reference_profile"] = reference_profile
+    return bundle
+
+
+def save_bundle(bundle, path):
+    # Write to a temp file and rename so a running API never sees a half-written model
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(bundle, f)
+    os.replace(tmp_path, path)
+
+
+def load_bundle(path):
+    """Load a model bundle, upgrading a legacy bare-Pipeline pickle on the fly.
+
+    Memory-mapped model files (mapped_model.py) are recognised by their magic bytes.
+    """
+    from mapped_model import is_mapped_file, load_mapped
+
+    if is_mapped_file(path):
+        return load_mapped(path)
+    with open(path, "rb") as f:
+        obj = pickle.load(f)
+
+    if isinstance(obj, dict) and "model" in obj:
+        if obj.get("format_version", 1) > BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Model bundle format {obj['format_version']} is newer than supported ({BUNDLE_FORMAT_VERSION})."
+            )
+        return obj
+
+    # Legacy artifact: just the fitted pipeline
+    feature_names = [str(c) for c in getattr(obj, "feature_names_in_", [])]
+    return {
+        "format_version": 0,
+        "model": obj,
+        "classes": list(DEFAULT_CLASSES),
+        "features": [{"name": col, "kind": "numeric"} for col in feature_names],
+        "metadata": {"legacy": True},
+    }
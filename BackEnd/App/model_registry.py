@@ -0,0 +1,335 @@
+import collections
+import copy
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from fast_forest import CompiledForest, compile_pipeline, verify_parity
+from model_bundle import file_sha256, load_bundle
+
+BACKENDS = ("sklearn", "compiled")
+
+
+class ModelState:
+    """Immutable snapshot of a loaded model bundle.
+
+    Request handlers grab ``registry.current`` once and score against that snapshot, so a
+    concurrent swap can never hand them a half-updated model.
+    """
+
+    def __init__(self, bundle, path, source_mtime, version, load_seconds, input_features, compiled_max_rows=0):
+        self.bundle = bundle
+        self.model = bundle["model"]
+        self.model_classes = self.model.classes_
+        self.classes = np.array(bundle["classes"], dtype=object)
+        self.features = list(input_features)
+        missing = [f["name"] for f in bundle["features"] if f["name"] not in self.features]
+        if missing:
+            raise ValueError(f"Model expects features the API does not accept: {missing}")
+        self.engine = None
+        self.backend = "sklearn"
+        # Compiled forest with precomputed per-node contributions, for /explain
+        self.explainer = None
+        self.compiled_max_rows = compiled_max_rows
+        self.metadata = bundle["metadata"]
+        self.format_version = bundle["format_version"]
+        self.path = path
+        self.source_mtime = source_mtime
+        self.version = version
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        # The compiled engine wins on latency; sklearn's Cython trees win on very large batches
+        if self.engine is not None and (not self.compiled_max_rows or len(X) <= self.compiled_max_rows):
+            return self.engine.predict_proba(X)
+        # Imported here so a compiled-only worker never loads pandas
+        import pandas as pd
+
+        return self.model.predict_proba(pd.DataFrame(X, columns=self.features))
+
+    def moved_to(self, path):
+        """The same loaded model, served from ``path`` (a new snapshot; this one is left as is)."""
+        state = copy.copy(self)
+        state.path = path
+        return state
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "last_modified": time.ctime(self.source_mtime),
+            "loaded_at": time.ctime(self.loaded_at),
+            "load_seconds": round(self.load_seconds, 4),
+            "bundle_format": self.format_version,
+            "backend": self.backend,
+            "classes": list(self.classes),
+            "trained_at": self.metadata.get("trained_at"),
+            "legacy": self.metadata.get("legacy", False),
+            "storage": self.bundle.get("storage", "pickle"),
+        }
+
+
+class ModelRegistry:
+    """Holds the live model and hot-swaps it off the request path.
+
+    A background thread polls the model file's mtime. When it changes, the new bundle is
+    loaded and warmed in that thread, then published with a single reference assignment.
+    Previous states are kept so an admin can roll back.
+
+    With ``candidate_path``, a challenger model found at that path is loaded next to the live
+    one (never served) for shadow scoring, until it is promoted or discarded.
+    """
+
+    def __init__(self, path, input_features, poll_interval=5.0, history_size=3, backend="sklearn",
+                 compiled_max_rows=0, explain=False, candidate_path=None, log=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}'. Choose one of {BACKENDS}.")
+        self.path = path
+        self.input_features = list(input_features)
+        self.poll_interval = poll_interval
+        self.backend = backend
+        self.compiled_max_rows = compiled_max_rows
+        self.explain = explain
+        self.current = None
+        # mtime of the last file we loaded; compared against instead of current.source_mtime
+        # so the watcher does not undo a rollback by reloading the same file
+        self._seen_mtime = None
+        self._history = collections.deque(maxlen=history_size)
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self.candidate_path = candidate_path
+        self.candidate = None
+        self._candidate_seen_mtime = None
+        self._candidate_listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        # Reload bookkeeping, exported by the API's /metrics
+        self.reloads = 0
+        self.reload_failures = 0
+        self.reload_seconds_total = 0.0
+        self.last_reload_seconds = 0.0
+        self.rollbacks = 0
+        self._log = log or (lambda event, data=None, is_error=False: None)
+
+    # -------- loading --------
+    def _load_state(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model file '{path}' not found. Train it first using model_3.py.")
+        mtime = os.path.getmtime(path)
+        started = time.perf_counter()
+        bundle = load_bundle(path)
+        version = file_sha256(path)[:12]
+        return self.build_state(bundle, path, mtime, version, time.perf_counter() - started)
+
+    def build_state(self, bundle, path, source_mtime, version, load_seconds):
+        """Wrap an already-loaded bundle in a ready-to-serve (compiled if configured, warmed) state."""
+        state = ModelState(bundle, path, source_mtime, version, load_seconds,
+                           self.input_features, self.compiled_max_rows)
+        if self.backend == "compiled":
+            self._compile(state)
+        if self.explain:
+            self._prepare_explainer(state)
+        self._warm(state)
+        return state
+
+    def _compile(self, state):
+        # Compacted bundles (compact_model.py) and mapped files (mapped_model.py) ship their own
+        # arrays; mapped ones were parity-checked on export, so loading never unpickles sklearn
+        packed = state.bundle.get("compiled")
+        try:
+            if packed and packed["input_features"] == state.features:
+                engine = CompiledForest.from_arrays(packed["arrays"], packed["max_depth"])
+                checked = 0 if packed.get("verified") else verify_parity(
+                    state.model, engine, state.features, atol=packed["atol"])
+            else:
+                engine = compile_pipeline(state.model, state.features)
+                if packed:
+                    engine = engine.compact()
+                checked = verify_parity(state.model, engine, state.features, atol=packed["atol"] if packed else 0.0)
+        except (ValueError, AssertionError) as e:
+            self._log("Compiled backend unavailable, serving with sklearn", str(e), is_error=True)
+            return
+        state.engine = engine
+        state.backend = "compiled"
+        self._log("Compiled forest ready", {
+            "trees": engine.n_trees, "nodes": engine.n_nodes, "bytes": engine.nbytes(), "parity_rows": checked,
+            "compact": engine.is_compact,
+        })
+
+    def _prepare_explainer(self, state):
+        # Reuses the serving engine when there is one; otherwise compiles a copy just for /explain.
+        # The per-node deltas are built by the first explain() call, not here: they are private
+        # memory, and workers that never explain (or serve a mapped file) should not pay for them
+        engine = state.engine
+        try:
+            if engine is None:
+                engine = compile_pipeline(state.model, state.features)
+                verify_parity(state.model, engine, state.features)
+        except (ValueError, AssertionError) as e:
+            self._log("Explanations unavailable for this model", str(e), is_error=True)
+            return
+        state.explainer = engine
+
+    @staticmethod
+    def _warm(state):
+        # First predict_proba call pays lazy sklearn initialisation; do it before going live
+        state.predict_proba(np.full((1, len(state.features)), np.nan))
+
+    def _publish(self, state, keep_previous=True):
+        previous = self.current
+        if keep_previous and previous is not None:
+            self._history.append(previous)
+        self.current = state
+        for listener in self._listeners:
+            try:
+                listener(state, previous)
+            except Exception:
+                self._log("Model swap listener failed", traceback.format_exc(), is_error=True)
+
+    def add_listener(self, listener):
+        """Register ``listener(new_state, previous_state)`` to run after every swap."""
+        self._listeners.append(listener)
+
+    def reload(self, force=False):
+        """Load the model file if it changed (or always, with ``force``). Returns True if swapped."""
+        with self._reload_lock:
+            if not force and self.current is not None and os.path.exists(self.path):
+                if os.path.getmtime(self.path) == self._seen_mtime:
+                    return False
+            started = time.perf_counter()
+            try:
+                state = self._load_state()
+            except Exception:
+                self.reload_failures += 1
+                # Remember the broken file so the watcher doesn't retry it every tick
+                if os.path.exists(self.path):
+                    self._seen_mtime = os.path.getmtime(self.path)
+                raise
+            # Includes compile, parity check and warm-up, not just unpickling
+            self.last_reload_seconds = time.perf_counter() - started
+            self.reload_seconds_total += self.last_reload_seconds
+            self.reloads += 1
+            self._seen_mtime = state.source_mtime
+            self._publish(state)
+            self._log("Model loaded successfully", state.describe())
+            return True
+
+    def rollback(self):
+        """Swap back to the previously served model."""
+        with self._reload_lock:
+            if not self._history:
+                raise LookupError("No previous model to roll back to.")
+            state = self._history.pop()
+            self._publish(state, keep_previous=False)
+            self.rollbacks += 1
+            self._log("Model rolled back", state.describe())
+            return state
+
+    def history(self):
+        return [state.describe() for state in reversed(self._history)]
+
+    # -------- challenger --------
+    def add_candidate_listener(self, listener):
+        """Register ``listener(candidate_state_or_None)`` to run whenever the candidate changes."""
+        self._candidate_listeners.append(listener)
+
+    def _set_candidate(self, state):
+        self.candidate = state
+        for listener in self._candidate_listeners:
+            try:
+                listener(state)
+            except Exception:
+                self._log("Candidate listener failed", traceback.format_exc(), is_error=True)
+
+    def reload_candidate(self, force=False):
+        """Load the candidate file if it appeared or changed. Returns True if a new candidate was loaded.
+
+        A candidate whose file disappeared (promoted by another worker, or removed) is dropped.
+        """
+        if not self.candidate_path:
+            return False
+        with self._reload_lock:
+            if not os.path.exists(self.candidate_path):
+                self._candidate_seen_mtime = None
+                if self.candidate is not None:
+                    self._set_candidate(None)
+                    self._log("Candidate model file is gone, candidate dropped", {"path": self.candidate_path})
+                return False
+            mtime = os.path.getmtime(self.candidate_path)
+            if not force and mtime == self._candidate_seen_mtime:
+                return False
+            # Remember the file even if it fails to load, so the watcher doesn't retry every tick
+            self._candidate_seen_mtime = mtime
+            state = self._load_state(self.candidate_path)
+            self._set_candidate(state)
+            self._log("Candidate model loaded", state.describe())
+            return True
+
+    def discard_candidate(self):
+        """Stop shadow scoring the current candidate (its file is left alone until it changes)."""
+        with self._reload_lock:
+            if self.candidate is None:
+                raise LookupError("No candidate model is loaded.")
+            state = self.candidate
+            self._set_candidate(None)
+            self._log("Candidate model discarded", state.describe())
+            return state
+
+    def promote_candidate(self, live_version=None, candidate_version=None):
+        """Serve the candidate: its file replaces the model file, and it goes live here at once.
+
+        The rename makes the promotion durable across restarts, and every other worker watching
+        the same paths swaps to it (and drops its candidate) on its next poll. ``live_version`` and
+        ``candidate_version``, when given, must still be the live and candidate models (checked
+        under the reload lock), so the shadow evidence behind a promotion is about this exact pair.
+        """
+        with self._reload_lock:
+            state = self.candidate
+            if state is None:
+                raise LookupError("No candidate model is loaded.")
+            if candidate_version is not None and state.version != candidate_version:
+                raise RuntimeError(f"The candidate is now {state.version}, not {candidate_version}.")
+            if live_version is not None and (self.current is None or self.current.version != live_version):
+                live = self.current.version if self.current is not None else None
+                raise RuntimeError(f"The live model is now {live}, not {live_version}.")
+            if not os.path.exists(state.path) or os.path.getmtime(state.path) != state.source_mtime:
+                raise RuntimeError("The candidate file changed on disk since it was loaded; reload it first.")
+            os.replace(state.path, self.path)
+            state = state.moved_to(self.path)
+            self._seen_mtime = state.source_mtime
+            self._candidate_seen_mtime = None
+            self._set_candidate(None)
+            self._publish(state)
+            self._log("Candidate model promoted", state.describe())
+            return state
+
+    # -------- background watcher --------
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                # Keep serving the current model; retry on the next tick
+                self._log("Background model reload failed", traceback.format_exc(), is_error=True)
+            try:
+                self.reload_candidate()
+            except Exception:
+                self._log("Background candidate load failed", traceback.format_exc(), is_error=True)
+
+    def start(self):
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
@@ -0,0 +1,205 @@
+import json
+import os
+import time
+
+import numpy as np
+from imblearn.pipeline import Pipeline as ImbPipeline
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401  (registers HalvingGridSearchCV)
+from sklearn.metrics import classification_report
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, StratifiedKFold, train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+import model_3
+from drift_monitor import build_reference_profile
+from model_bundle import build_bundle, file_sha256, save_bundle
+from preprocessing import OVERSAMPLER, build_preprocessor, load_dataset, make_oversampler, smote_resample
+
+# =========================
+# Search space
+# =========================
+PARAM_GRID = {
+    "classifier__n_estimators": [25, 50, 100, 200],
+    "classifier__max_depth": [None, 6, 10],
+    "classifier__min_samples_leaf": [1, 2, 4],
+    "classifier__max_features": ["sqrt", 0.5],
+}
+
+LATENCY_BATCH_ROWS = 1000
+LATENCY_REPEAT = 20
+
+
+def build_search_pipeline(numeric_cols, categorical_cols, oversampler=None, approximate=None):
+    """Preprocess -> SMOTE -> forest. imblearn only resamples during fit, so every CV fold is
+    balanced on its own training rows and the validation fold never contains synthetic rows."""
+    # The search already runs folds in parallel: one oversampling thread per fit
+    smote = make_oversampler(oversampler, len(categorical_cols), len(numeric_cols), n_jobs=1, approximate=approximate)
+    return ImbPipeline(steps=[
+        ('preprocessor', build_preprocessor(numeric_cols, categorical_cols)),
+        ('smote', smote),
+        ('classifier', RandomForestClassifier(random_state=42)),
+    ])
+
+
+def fit_serving_model(X, y, numeric_cols, categorical_cols, classifier_params, oversampler=None, approximate=None):
+    """Fit the plain sklearn pipeline the API serves (SMOTE applied beforehand, not as a step)."""
+    X_res, y_res = smote_resample(X, y, numeric_cols, categorical_cols, method=oversampler, approximate=approximate)
+    classifier = RandomForestClassifier(random_state=42, **classifier_params)
+    model = model_3.build_pipeline(numeric_cols, categorical_cols, classifier)
+    model.fit(X_res, y_res)
+    return model
+
+
+def measure_latency(model, X):
+    """Best-of-LATENCY_REPEAT predict_proba latency in ms for one row and for a batch."""
+    one = X.iloc[:1]
+    batch = X.sample(n=LATENCY_BATCH_ROWS, replace=True, random_state=0)
+    timings = {}
+    for name, rows in (("single_ms", one), ("batch_ms", batch)):
+        model.predict_proba(rows)
+        samples = []
+        for _ in range(LATENCY_REPEAT):
+            started = time.perf_counter()
+            model.predict_proba(rows)
+            samples.append((time.perf_counter() - started) * 1000.0)
+        timings[name] = round(min(samples), 3)
+    return timings
+
+
+def forest_size(model):
+    trees = model.named_steps['classifier'].estimators_
+    return {
+        "n_trees": len(trees),
+        "total_nodes": int(sum(t.tree_.node_count for t in trees)),
+        "max_depth": int(max(t.tree_.max_depth for t in trees)),
+    }
+
+
+def _strip_prefix(params):
+    return {k.split("__", 1)[1]: v for k, v in params.items()}
+
+
+def search_model(method="grid", cv=5, n_jobs=-1, scoring="accuracy", tolerance=0.005, top=10,
+                 leaderboard_path="leaderboard.json", param_grid=None, model_path=None, oversampler=None,
+                 approximate=None):
+    oversampler = oversampler or OVERSAMPLER
+    print("📂 Loading dataset...")
+    X, y, numeric_cols, categorical_cols = load_dataset(model_3.DATA_PATH)
+    label_enc = LabelEncoder()
+    y = label_enc.fit_transform(y)
+
+    # The hold-out split is taken before any resampling, so its score is on real patients only
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=model_3.TEST_SIZE, random_state=model_3.SPLIT_SEED, stratify=y
+    )
+
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=42)
+    search_cls = GridSearchCV if method == "grid" else HalvingGridSearchCV
+    search = search_cls(
+        build_search_pipeline(numeric_cols, categorical_cols, oversampler, approximate),
+        param_grid or PARAM_GRID,
+        cv=folds,
+        scoring=scoring,
+        n_jobs=n_jobs,
+        refit=False,
+    )
+
+    print(f"🔎 Running {method} search ({cv}-fold stratified CV, n_jobs={n_jobs})...")
+    started = time.perf_counter()
+    search.fit(X_train, y_train)
+    search_seconds = time.perf_counter() - started
+    results = search.cv_results_
+    if method == "halving":
+        # Only candidates that survived to the last iteration were scored on all the data
+        final = results["iter"] == results["iter"].max()
+    else:
+        final = np.ones(len(results["params"]), dtype=bool)
+    candidates = [
+        {
+            "params": _strip_prefix(results["params"][i]),
+            "cv_score": round(float(results["mean_test_score"][i]), 4),
+            "cv_std": round(float(results["std_test_score"][i]), 4),
+            "fit_seconds": round(float(results["mean_fit_time"][i]), 3),
+        }
+        for i in np.flatnonzero(final)
+    ]
+    candidates.sort(key=lambda c: c["cv_score"], reverse=True)
+    print(f"   {len(results['params'])} candidates scored in {search_seconds:.1f} s")
+
+    # Inference cost is not part of the CV score: refit the best few and time them as served
+    print(f"⏱️  Timing the top {min(top, len(candidates))} candidates...")
+    leaderboard = []
+    for candidate in candidates[:top]:
+        model = fit_serving_model(X_train, y_train, numeric_cols, categorical_cols, candidate["params"],
+                                  oversampler, approximate)
+        candidate.update(measure_latency(model, X_test))
+        candidate.update(forest_size(model))
+        candidate["_model"] = model
+        leaderboard.append(candidate)
+
+    # Smallest forest whose CV score is within tolerance of the best one. Size rather than the
+    # measured latency breaks the tie: per-tree overhead dominates single-row sklearn latency and
+    # node count dominates batch and compiled cost, and neither is subject to timing noise
+    best_score = leaderboard[0]["cv_score"]
+    contenders = [c for c in leaderboard if c["cv_score"] >= best_score - tolerance]
+    winner = min(contenders, key=lambda c: (c["n_trees"], c["total_nodes"]))
+    model = winner.pop("_model")
+    for candidate in leaderboard:
+        candidate.pop("_model", None)
+        candidate["winner"] = candidate is winner
+
+    print("\n🏆 Leaderboard (CV score vs inference latency):\n")
+    print(f"   {'cv_score':>8} {'±':>6} {'1 row ms':>9} {f'{LATENCY_BATCH_ROWS} rows ms':>13} {'nodes':>7}  params")
+    for c in leaderboard:
+        marker = "👉" if c["winner"] else "  "
+        print(f"{marker} {c['cv_score']:>8.4f} {c['cv_std']:>6.3f} {c['single_ms']:>9.3f} "
+              f"{c['batch_ms']:>13.3f} {c['total_nodes']:>7}  {c['params']}")
+
+    holdout = model.score(X_test, y_test)
+    print(f"\n✅ Winner hold-out accuracy: {holdout:.4f}")
+    print("\n📊 Classification Report:\n")
+    print(classification_report(y_test, model.predict(X_test), target_names=label_enc.classes_))
+
+    with open(leaderboard_path, "w") as f:
+        json.dump({
+            "method": method,
+            "cv": cv,
+            "scoring": scoring,
+            "tolerance": tolerance,
+            "search_seconds": round(search_seconds, 2),
+            "n_candidates": len(results["params"]),
+            "leaderboard": leaderboard,
+        }, f, indent=2, default=str)
+    print(f"💾 Leaderboard written to {leaderboard_path}")
+
+    # The served model is a plain sklearn Pipeline, so the API never needs imblearn
+    model_path = model_path or model_3.MODEL_PATH
+    print(f"💾 Saving winning model bundle to {model_path}...")
+    bundle = build_bundle(
+        model,
+        classes=label_enc.classes_,
+        numeric_cols=numeric_cols,
+        categorical_cols=categorical_cols,
+        metadata={
+            "accuracy": round(float(holdout), 4),
+            "n_train": int(len(X_train)),
+            "n_test": int(len(X_test)),
+            "data_path": os.path.abspath(model_3.DATA_PATH),
+            "data_sha256": file_sha256(model_3.DATA_PATH),
+            "classifier_params": model.named_steps['classifier'].get_params(),
+            "oversampler": oversampler,
+            "search": {
+                "method": method,
+                "cv": cv,
+                "scoring": scoring,
+                "cv_score": winner["cv_score"],
+                "best_cv_score": best_score,
+                "single_ms": winner["single_ms"],
+                "batch_ms": winner["batch_ms"],
+            },
+        },
+        reference_profile=build_reference_profile(X_train, numeric_cols),
+    )
+    save_bundle(bundle, model_path)
+    print("🎉 Search complete! Model ready for use.")
+    return bundle, leaderboard
@@ -0,0 +1,97 @@
+import collections
+import hashlib
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Rough per-entry overhead of the OrderedDict node, tuple and float objects; the key and
+# label sizes are measured per entry on top of this
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    """In-process LRU + TTL cache of predictions keyed on the canonical feature vector.
+
+    Keys hash the float64 feature row (NaNs and -0.0 normalised, so equal inputs always
+    collide) together with the model version. Bounded by entry count and by an estimate of
+    the memory used; entries older than ``ttl_seconds`` are treated as misses.
+    """
+
+    def __init__(self, max_entries=100000, max_bytes=64 * 1024 * 1024, ttl_seconds=3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = collections.OrderedDict()  # key -> (label, probability, expires_at, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = collections.Counter()  # reason -> count
+
+    @staticmethod
+    def key(version, row):
+        row = np.asarray(row, dtype=np.float64)
+        # One NaN bit pattern and +0.0 for -0.0, so the key depends only on the values
+        row = np.where(np.isnan(row), np.nan, row) + 0.0
+        digest = hashlib.blake2b(row.tobytes(), digest_size=16, person=b"ckd-predict")
+        digest.update(version.encode())
+        return digest.digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                self._drop(key, "ttl")
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, label, probability):
+        size = _ENTRY_OVERHEAD_BYTES + sys.getsizeof(key) + sys.getsizeof(label)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key, None)
+            self._entries[key] = (label, probability, time.monotonic() + self.ttl_seconds, size)
+            self.bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)), "capacity")
+
+    def _drop(self, key, reason):
+        entry = self._entries.pop(key)
+        self.bytes -= entry[3]
+        if reason:
+            self.evictions[reason] += 1
+
+    def clear(self, reason="model_swap"):
+        with self._lock:
+            if self._entries:
+                self.evictions[reason] += len(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+
+    def on_model_swap(self, state, previous):
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": dict(self.evictions),
+        }
@@ -0,0 +1,173 @@
+import os
+import pickle
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OrdinalEncoder
+
+from model_bundle import file_sha256
+
+# =========================
+# Shared preprocessing
+# =========================
+# One copy of the CSV cleaning, column typing, imputation and encoding used by every
+# training script. The fitted transformer from build_preprocessor() is the first step of the
+# pipeline saved in the model bundle, so the API runs exactly the transform training ran.
+TARGET_COL = "class"
+ID_COL = "id"
+LEAK_COLS = [
+    'htn', 'dm', 'cad', 'appet', 'pe', 'ane',
+    'pcc', 'ba', 'al', 'su', 'rbc', 'pc'
+]
+
+# Parsed datasets are cached here, keyed by the source file's SHA-256 ("" disables the cache)
+CACHE_DIR = os.getenv("CKD_PREPROCESS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ckd_cache"))
+# Bump when clean_frame()/coerce_numeric_columns() change, so stale cache entries are ignored
+PARSER_VERSION = 1
+# Class balancing: "smote" (imblearn, single-threaded) or "fast" (fast_smote.FastSMOTENC:
+# multi-threaded neighbour search, optional approximate index, proper SMOTE-NC categoricals)
+OVERSAMPLER = os.getenv("CKD_OVERSAMPLER", "smote")
+OVERSAMPLER_N_JOBS = int(os.getenv("CKD_OVERSAMPLER_N_JOBS", "-1"))  # threads for "fast" (-1 = all cores)
+OVERSAMPLER_APPROXIMATE = os.getenv("CKD_OVERSAMPLER_APPROXIMATE", "0") == "1"  # approximate neighbours
+
+
+def clean_frame(df):
+    """Strip quotes/whitespace from column names and turn the dataset's '?' markers into NaN."""
+    df.columns = df.columns.str.strip().str.replace("'", "")
+    return df.replace("?", np.nan)
+
+
+def coerce_numeric_columns(X, exclude=(TARGET_COL,)):
+    """Convert columns whose non-missing values all parse as numbers; returns (numeric, categorical)."""
+    numeric_cols, categorical_cols = [], []
+    for col in X.columns:
+        if col in exclude:
+            continue
+        present = X[col].notna().sum()
+        values = pd.to_numeric(X[col], errors='coerce')
+        # An all-missing column carries no type information; keep it categorical to be safe
+        if present and values.notna().sum() == present:
+            X[col] = values.astype(np.float64)
+            numeric_cols.append(col)
+        else:
+            categorical_cols.append(col)
+    return numeric_cols, categorical_cols
+
+
+def _cache_path(path):
+    return os.path.join(CACHE_DIR, f"{file_sha256(path)[:24]}-v{PARSER_VERSION}.pkl")
+
+
+def load_frame(path, use_cache=True):
+    """Read, clean and type the full CSV; returns (df, numeric_cols, categorical_cols).
+
+    The typed frame is cached on disk under the file's content hash, so repeated training and
+    evaluation runs on the same data skip CSV parsing entirely.
+    """
+    cache_path = _cache_path(path) if use_cache and CACHE_DIR else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        return cached["frame"], cached["numeric_cols"], cached["categorical_cols"]
+
+    df = clean_frame(pd.read_csv(path, on_bad_lines='skip', dtype=str))
+    numeric_cols, categorical_cols = coerce_numeric_columns(df, exclude=(TARGET_COL, ID_COL))
+
+    if cache_path:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"frame": df, "numeric_cols": numeric_cols, "categorical_cols": categorical_cols}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return df, numeric_cols, categorical_cols
+
+
+def load_dataset(path, drop_leaks=True, use_cache=True):
+    """Features and target for training; returns (X, y, numeric_cols, categorical_cols)."""
+    df, numeric_cols, categorical_cols = load_frame(path, use_cache)
+    dropped = {TARGET_COL, ID_COL} | (set(LEAK_COLS) if drop_leaks else set())
+    X = df.drop(columns=[c for c in df.columns if c in dropped])
+    y = df[TARGET_COL]
+    return (
+        X, y,
+        [c for c in numeric_cols if c not in dropped],
+        [c for c in categorical_cols if c not in dropped],
+    )
+
+
+def build_preprocessor(numeric_cols, categorical_cols, numeric_strategy='mean', categories="auto"):
+    """Impute numerics, impute + ordinal-encode categoricals. Unknown categories encode as -1."""
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy=numeric_strategy))
+    ])
+
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('encoder', OrdinalEncoder(categories=categories, handle_unknown='use_encoded_value', unknown_value=-1))
+    ])
+
+    return ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, numeric_cols),
+            ('cat', categorical_transformer, categorical_cols)
+        ]
+    )
+
+
+def make_oversampler(method=None, n_categorical=0, n_numeric=0, n_jobs=None, approximate=None):
+    """The configured SMOTE variant; categoricals are expected after the numerics, as ordinal codes."""
+    method = method or OVERSAMPLER
+    if method == "smote":
+        from imblearn.over_sampling import SMOTE
+
+        return SMOTE(random_state=42)
+    if method == "fast":
+        from fast_smote import FastSMOTENC
+
+        return FastSMOTENC(
+            categorical_features=list(range(n_numeric, n_numeric + n_categorical)),
+            n_jobs=OVERSAMPLER_N_JOBS if n_jobs is None else n_jobs,
+            approximate=OVERSAMPLER_APPROXIMATE if approximate is None else approximate,
+            random_state=42,
+        )
+    raise ValueError(f"Unknown oversampler '{method}'. Choose 'smote' or 'fast'.")
+
+
+def smote_resample(X, y, numeric_cols, categorical_cols, profile=None, method=None, n_jobs=None, approximate=None):
+    """Impute, balance the classes with SMOTE and return the resampled (X, y) in memory.
+
+    With the imblearn oversampler, categoricals are SMOTE'd as ordinal codes; the "fast" one
+    gives every synthetic row the categories most common among its neighbours (SMOTE-NC).
+    Either way they are decoded back to their labels, so the result can be fed to a pipeline
+    starting with build_preprocessor().
+    """
+    stage = profile.stage if profile else (lambda name: nullcontext())
+    method = method or OVERSAMPLER
+    oversampler = make_oversampler(method, len(categorical_cols), len(numeric_cols), n_jobs, approximate)
+
+    with stage("preprocess"):
+        imputer = build_preprocessor(numeric_cols, categorical_cols)
+        X_processed = imputer.fit_transform(X)
+        cat_encoder = imputer.named_transformers_['cat'].named_steps['encoder'] if categorical_cols else None
+
+    print(f"🔄 Applying {type(oversampler).__name__} to balance dataset...")
+    if method == "fast":
+        # Reports neighbour search and generation as separate stages
+        X_resampled, y_resampled = oversampler.fit_resample(X_processed, y, stage=stage)
+    else:
+        with stage("smote"):
+            X_resampled, y_resampled = oversampler.fit_resample(X_processed, y)
+    del X_processed
+
+    with stage("frame"):
+        X_out = pd.DataFrame(X_resampled[:, :len(numeric_cols)], columns=numeric_cols)
+        if categorical_cols:
+            X_cat_decoded = cat_encoder.inverse_transform(X_resampled[:, len(numeric_cols):])
+            X_out = pd.concat([X_out, pd.DataFrame(X_cat_decoded, columns=categorical_cols)], axis=1)
+
+    return X_out, y_resampled
@@ -0,0 +1,166 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import pickle
+import threading
+
+# =========================
+# Worker-process side
+# =========================
+# Each worker process builds its own ModelState once (in the pool initializer) and keeps it
+# for the lifetime of the pool. A model swap creates a fresh pool rather than asking live
+# workers to reload, so a worker never scores with a half-loaded model.
+_worker_state = None
+
+
+def _init_worker(bundle_bytes, path, source_mtime, version, input_features, backend, compiled_max_rows):
+    global _worker_state
+    from model_registry import ModelRegistry
+
+    if bundle_bytes is None:
+        # Mapped model file: map it here too, so all workers share the parent's pages
+        from model_bundle import load_bundle
+
+        if os.path.getmtime(path) != source_mtime:
+            raise RuntimeError(f"'{path}' changed before the scoring worker could map it.")
+        bundle = load_bundle(path)
+    else:
+        bundle = pickle.loads(bundle_bytes)
+    registry = ModelRegistry(path, input_features, poll_interval=0, backend=backend,
+                             compiled_max_rows=compiled_max_rows)
+    _worker_state = registry.build_state(bundle, path, source_mtime, version, 0.0)
+
+
+def _worker_predict_proba(X):
+    return _worker_state.predict_proba(X)
+
+
+def _worker_ping():
+    return _worker_state.version
+
+
+# =========================
+# API side
+# =========================
+class PoolSaturated(Exception):
+    """Raised when too many scoring jobs are already queued."""
+
+
+class ScoringTimeout(Exception):
+    """Raised when a scoring job does not finish within the per-request timeout."""
+
+
+class PoolNotReady(Exception):
+    """Raised when no model has been handed to the pool yet (it is still loading)."""
+
+
+class ScoringPool:
+    """Runs predict_proba off the event loop with backpressure and timeouts.
+
+    With ``workers=0`` scoring runs in the default thread pool of the API process (the
+    original behaviour). With ``workers>0`` it runs in a process pool, so CPU-bound forest
+    evaluation scales across cores instead of contending for one GIL.
+    """
+
+    def __init__(self, workers=0, max_pending=64, timeout=10.0, log=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # (state, executor) published as one tuple so a request never pairs a model with
+        # a pool built for a different one
+        self._current = (None, None)
+        self._pending = 0
+        self._swap_lock = threading.Lock()
+        self._log = log or (lambda event, data=None, is_error=False: None)
+
+    @property
+    def state(self):
+        return self._current[0]
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _new_executor(self, state):
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn: the API process runs a watcher thread, which fork would not copy safely
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                None if state.bundle.get("storage") == "mmap" else pickle.dumps(state.bundle),
+                state.path, state.source_mtime, state.version,
+                state.features, state.backend, state.compiled_max_rows
+            ),
+        )
+        # Start every worker and wait for its model to load before taking traffic
+        pings = [executor.submit(_worker_ping) for _ in range(self.workers)]
+        for ping in pings:
+            ping.result()
+        return executor
+
+    def start(self, state, replacing=None):
+        """Serve ``state``; in process mode this (re)builds and warms the worker pool first.
+
+        With ``replacing``, only rebuild if that executor is still the live one (so many
+        requests failing on the same broken pool trigger a single restart).
+        """
+        with self._swap_lock:
+            if replacing is not None and self._current[1] is not replacing:
+                return
+            if self.workers <= 0:
+                self._current = (state, None)
+                return
+            executor = self._new_executor(state)
+            old = self._current[1]
+            self._current = (state, executor)
+        if old is not None:
+            # In-flight jobs on the old pool still complete; new jobs go to the new pool
+            old.shutdown(wait=False)
+        self._log("Scoring pool ready", {"workers": self.workers, "model_version": state.version})
+
+    def on_model_swap(self, state, previous):
+        self.start(state)
+
+    def shutdown(self):
+        state, executor = self._current
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._current = (state, None)
+
+    def _job_done(self, future):
+        # Runs on the event loop when the job itself finishes, not when its request stops waiting
+        self._pending -= 1
+        if not future.cancelled():
+            future.exception()  # mark it retrieved: a timed-out job's error is not worth a warning
+
+    async def predict_proba(self, X):
+        """Score ``X`` and return ``(proba, state)`` for the model that produced it."""
+        state, executor = self._current
+        if state is None:
+            # With CKD_LOAD_IN_BACKGROUND, requests can arrive before start() has run
+            raise PoolNotReady("Model is not loaded yet.")
+        if self._pending >= self.max_pending:
+            raise PoolSaturated(f"{self._pending} scoring jobs already queued or running.")
+
+        loop = asyncio.get_running_loop()
+        if executor is None:
+            future = loop.run_in_executor(None, state.predict_proba, X)
+        else:
+            future = loop.run_in_executor(executor, _worker_predict_proba, X)
+        # A timed-out job keeps its thread or worker busy until it finishes, so it stays counted
+        # until then (asyncio.wait, unlike wait_for, leaves the job alone when it gives up)
+        self._pending += 1
+        future.add_done_callback(self._job_done)
+        done, _ = await asyncio.wait((future,), timeout=self.timeout or None)
+        if not done:
+            raise ScoringTimeout(f"Scoring did not finish within {self.timeout}s.")
+        try:
+            proba = future.result()
+        except concurrent.futures.BrokenExecutor:
+            # A worker died (e.g. OOM-killed); rebuild the pool in the background
+            self._log("Scoring pool broken, restarting workers", is_error=True)
+            loop.run_in_executor(None, self.start, state, executor)
+            raise
+        return proba, state
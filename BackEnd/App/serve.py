@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# =========================
+# Serving-only entry point
+# =========================
+# `uvicorn main:app` works as before; this launcher adds defaults that make a new replica
+# answer sooner:
+#   - the compiled backend, so single and small-batch scoring never imports pandas/sklearn
+#   - the mapped model file (ckd_model.ckdm) when one sits next to ckd_model.pkl and was exported
+#     from that very file, so loading the model is a header read instead of unpickling the whole
+#     sklearn pipeline. After a retrain the .ckdm is stale: the pickle is served (with a warning)
+#     until `python mapped_model.py` re-exports it
+#   - the model loads in the background: /health/live answers as soon as the port is open and
+#     /health/ready turns 200 once the model is in (point the load balancer at the latter)
+# Explicit CKD_* environment variables always win over these defaults.
+#
+# The mapped file is a build step, not something this repo ships: the checked-in ckd_model.pkl is a
+# legacy bare pipeline and there is no ckd_model.ckdm. Until `python mapped_model.py` has been run,
+# serve.py serves the pickle, which imports pandas and sklearn like `uvicorn main:app` does, and says
+# so at startup and in `--check`. Only the background load and readiness probe help then.
+#
+# Nothing here, nor in main.py, imports the training code (preprocessing, imblearn/SMOTE,
+# train_test_split). `python serve.py --check` loads the app and model once, prints the
+# cold-start profile and fails if any training-only module ended up imported.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MAPPED_MODEL_PATH = os.path.join(APP_DIR, "ckd_model.ckdm")
+PICKLE_MODEL_PATH = os.path.join(APP_DIR, "ckd_model.pkl")
+TRAINING_MODULES = (
+    "imblearn", "preprocessing", "model_1", "model_2", "model_3", "model_search", "stream_training",
+    "compact_model", "fast_smote",
+)
+
+
+def mapped_model_status(mapped_path=MAPPED_MODEL_PATH, pickle_path=PICKLE_MODEL_PATH):
+    """``(usable, reason)``: whether ``mapped_path`` was exported from the current ``pickle_path``."""
+    from mapped_model import read_header
+    from model_bundle import file_sha256
+
+    if not os.path.exists(pickle_path):
+        return True, f"no {os.path.basename(pickle_path)} to compare with"
+    try:
+        source = read_header(mapped_path).get("source")
+    except (OSError, ValueError) as e:
+        return False, f"unreadable: {e}"
+    if not source:
+        return False, "it records no source bundle (exported by an older version)"
+    # Same mtime: nothing was written since the export. Otherwise compare contents
+    if source["mtime"] == os.path.getmtime(pickle_path) or source["sha256"] == file_sha256(pickle_path):
+        return True, f"exported from the current {os.path.basename(pickle_path)}"
+    return False, f"{os.path.basename(pickle_path)} changed after it was exported"
+
+
+def apply_serving_defaults():
+    os.environ.setdefault("CKD_INFERENCE_BACKEND", "compiled")
+    os.environ.setdefault("CKD_LOAD_IN_BACKGROUND", "1")
+    if "CKD_MODEL_PATH" in os.environ:
+        return
+    if not os.path.exists(MAPPED_MODEL_PATH):
+        print(f"⚠️  No {os.path.basename(MAPPED_MODEL_PATH)}: serving {os.path.basename(PICKLE_MODEL_PATH)}, "
+              f"which imports pandas and sklearn. Run `python mapped_model.py` once for the fast cold start.")
+    else:
+        usable, reason = mapped_model_status()
+        if usable:
+            os.environ["CKD_MODEL_PATH"] = MAPPED_MODEL_PATH
+            print(f"📂 Serving {os.path.basename(MAPPED_MODEL_PATH)} ({reason})")
+        else:
+            os.environ["CKD_MODEL_PATH"] = PICKLE_MODEL_PATH
+            print(f"⚠️  Serving {os.path.basename(PICKLE_MODEL_PATH)}, not {os.path.basename(MAPPED_MODEL_PATH)}: "
+                  f"{reason}. Re-export it with `python mapped_model.py`.")
+
+
+def loaded_training_modules():
+    return sorted(
+        name for name in sys.modules
+        if name in TRAINING_MODULES or name.split(".", 1)[0] in TRAINING_MODULES
+    )
+
+
+def check():
+    """Import the app and load the model in this process, then report what it cost."""
+    # Load in the foreground so the timings cover the whole cold start
+    os.environ["CKD_LOAD_IN_BACKGROUND"] = "0"
+    started = time.perf_counter()
+    import main
+
+    imported = time.perf_counter()
+    main.load_and_start()
+    ready = time.perf_counter()
+    state = main.registry.current
+    asyncio.run(main.shutdown_event())
+
+    print(f"📂 Model: {state.path} ({state.bundle.get('storage', 'pickle')}, backend {state.backend})")
+    print(f"⏱️  Import {(imported - started) * 1000:.0f} ms, model load {(ready - imported) * 1000:.0f} ms")
+    for module in ("pandas", "sklearn", "scipy"):
+        print(f"   {module}: {'imported' if module in sys.modules else 'not imported'}")
+    if state.bundle.get("storage", "pickle") == "pickle":
+        print("⚠️  Served from a pickle, so this is not the slim cold start: convert it with "
+              "`python mapped_model.py` (the checked-in model needs this too)")
+    training = loaded_training_modules()
+    if training:
+        print(f"❌ Training-only modules imported by the serving path: {', '.join(training)}")
+        return 1
+    print("✅ No training-only modules on the serving import graph")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the CKD Prediction API with serving-only defaults.")
+    parser.add_argument("--host", default=os.getenv("CKD_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("CKD_PORT", "9000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--proxy-headers", action="store_true", help="Trust X-Forwarded-For from the proxy")
+    parser.add_argument("--check", action="store_true", help="Load once, print the cold-start profile and exit")
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    apply_serving_defaults()
+    if args.check:
+        sys.exit(check())
+
+    import uvicorn
+
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers,
+                proxy_headers=args.proxy_headers, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
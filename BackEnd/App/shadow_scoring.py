@@ -0,0 +1,253 @@
+import collections
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+# =========================
+# Champion/challenger shadow scoring
+# =========================
+# A candidate model is loaded next to the live one (ModelRegistry.reload_candidate). A share
+# of the scored requests is queued here, together with the live predictions the request already
+# made; a background thread scores the same rows with the candidate and keeps running comparison
+# statistics: agreement rate, probability deltas and the candidate's latency. The live model is
+# never run again for this, and the request never waits for the candidate: queueing is an
+# append, and when the queue is full samples are dropped and counted.
+# The thread also keeps out of the way of live traffic: while ``busy()`` says requests are being
+# scored it holds off, and a batch still waiting after ``max_defer`` seconds is dropped (and
+# counted) rather than scored, so shadow work only ever runs in idle time. Under sustained load
+# comparisons stall instead of adding latency.
+#
+# Live model latency is the request path's own (ckd_stage_seconds, stage="predict_proba").
+_STOP = object()
+# |delta| histogram edges for the probability of the class the live model predicted
+DELTA_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.2, 0.5, 1.0)
+# Per-batch latency samples kept for percentiles
+LATENCY_SAMPLES = 1000
+
+
+class _Comparison:
+    """Running statistics of one (live, candidate) pair."""
+
+    def __init__(self, live_version, candidate_version):
+        self.live_version = live_version
+        self.candidate_version = candidate_version
+        self.started_at = time.time()
+        self.rows = 0
+        self.agreements = 0
+        self.disagreements = collections.Counter()  # (live label, candidate label) -> rows
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.delta_buckets = np.zeros(len(DELTA_BUCKETS), dtype=np.int64)
+        self.latency_seconds = 0.0
+        self.latency_batches = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def add_latency(self, seconds):
+        self.latency_seconds += seconds
+        self.latency_batches.append(seconds)
+
+    def report(self, min_rows):
+        batches = np.asarray(self.latency_batches, dtype=np.float64) * 1000.0
+
+        return {
+            "live_version": self.live_version,
+            "candidate_version": self.candidate_version,
+            "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "rows_compared": self.rows,
+            "enough_data": self.rows >= min_rows,
+            "agreement_rate": round(self.agreements / self.rows, 4) if self.rows else None,
+            "disagreements": [
+                {"live": live, "candidate": candidate, "rows": n}
+                for (live, candidate), n in self.disagreements.most_common()
+            ],
+            "probability_delta": {
+                "mean": round(self.delta_sum / self.rows, 4) if self.rows else None,
+                "mean_abs": round(self.abs_delta_sum / self.rows, 4) if self.rows else None,
+                "max_abs": round(self.max_abs_delta, 4),
+                "abs_histogram": {f"<={edge}": int(n) for edge, n in zip(DELTA_BUCKETS, self.delta_buckets)},
+            },
+            "candidate_latency": {
+                "us_per_row": round(self.latency_seconds / self.rows * 1e6, 2) if self.rows else None,
+                "batch_p50_ms": round(float(np.percentile(batches, 50)), 3) if batches.size else None,
+                "batch_p99_ms": round(float(np.percentile(batches, 99)), 3) if batches.size else None,
+            },
+        }
+
+
+class ShadowScorer:
+    """Scores a sample of live traffic on a candidate model off the request path."""
+
+    def __init__(self, sample_rate=0.1, max_queue_rows=10000, batch_rows=256, min_rows=1000, busy=None,
+                 max_defer=1.0, log=None):
+        self.sample_rate = sample_rate
+        self.max_queue_rows = max_queue_rows
+        self.batch_rows = batch_rows
+        self.min_rows = min_rows
+        self.busy = busy or (lambda: False)
+        self.max_defer = max_defer
+        self.candidate = None
+        self._comparison = None
+        self._queue = queue.Queue()
+        self._queued_rows = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._log = log or (lambda event, data=None, is_error=False: None)
+        # Bookkeeping, exported by /admin/candidate and /metrics
+        self.sampled = 0
+        self.dropped = 0
+        self.skipped_busy = 0
+        self.errors = 0
+        self.deferred_seconds = 0.0
+
+    # -------- model changes --------
+    def set_candidate(self, state):
+        """Compare against ``state`` from now on (``None`` stops shadow scoring)."""
+        with self._lock:
+            self.candidate = state
+            self._comparison = None
+
+    def on_model_swap(self, state, previous):
+        # A new champion (promotion, reload or rollback) starts a new comparison
+        with self._lock:
+            if self.candidate is not None and self.candidate.version == state.version:
+                self.candidate = None
+            self._comparison = None
+
+    # -------- request side --------
+    def submit(self, X, live_state, labels, probabilities):
+        """Maybe queue ``X`` for shadow scoring. Never blocks; returns True if it was queued.
+
+        ``labels`` and ``probabilities`` are what ``live_state`` answered for the rows (label and
+        winning-class probability), so the live model is not run a second time.
+        """
+        if self.candidate is None or random.random() >= self.sample_rate:
+            return False
+        n = len(X)
+        with self._lock:
+            if self._queued_rows + n > self.max_queue_rows:
+                self.dropped += n
+                return False
+            self._queued_rows += n
+            self.sampled += n
+        self._queue.put((X, live_state, labels, probabilities))
+        return True
+
+    # -------- shadow thread --------
+    def _score(self, items):
+        candidate = self.candidate
+        # Group by live model, so a swap in the middle of a batch compares each row correctly
+        by_live = collections.defaultdict(list)
+        for X, live, labels, probabilities in items:
+            by_live[live].append((X, labels, probabilities))
+        for live, blocks in by_live.items():
+            if candidate is None or live.version == candidate.version:
+                continue
+            X = np.concatenate([block[0] for block in blocks])
+            live_labels = np.concatenate([block[1] for block in blocks]).astype(str)
+            live_probability = np.concatenate([block[2] for block in blocks]).astype(np.float64)
+            live_columns = [str(c) for c in live.classes[live.model_classes]]
+            candidate_columns = [str(c) for c in candidate.classes[candidate.model_classes]]
+            if sorted(live_columns) != sorted(candidate_columns):
+                self.errors += 1
+                self._log("Shadow scoring skipped: candidate predicts different classes",
+                          {"live": live_columns, "candidate": candidate_columns}, is_error=True)
+                continue
+
+            started = time.perf_counter()
+            candidate_proba = candidate.predict_proba(X)[:, [candidate_columns.index(c) for c in live_columns]]
+            candidate_seconds = time.perf_counter() - started
+
+            rows = np.arange(len(X))
+            column = {c: i for i, c in enumerate(live_columns)}
+            live_best = np.array([column[label] for label in live_labels], dtype=np.intp)
+            candidate_best = candidate_proba.argmax(axis=1)
+            delta = candidate_proba[rows, live_best] - live_probability
+            abs_delta = np.abs(delta)
+            disagree = live_best != candidate_best
+
+            with self._lock:
+                comparison = self._comparison
+                if (comparison is None or comparison.live_version != live.version
+                        or comparison.candidate_version != candidate.version):
+                    if self.candidate is not candidate:
+                        return
+                    comparison = self._comparison = _Comparison(live.version, candidate.version)
+                comparison.rows += len(X)
+                comparison.agreements += int(len(X) - disagree.sum())
+                for i in np.flatnonzero(disagree):
+                    comparison.disagreements[(live_columns[live_best[i]], live_columns[candidate_best[i]])] += 1
+                comparison.delta_sum += float(delta.sum())
+                comparison.abs_delta_sum += float(abs_delta.sum())
+                comparison.max_abs_delta = max(comparison.max_abs_delta, float(abs_delta.max()))
+                comparison.delta_buckets += np.bincount(
+                    np.searchsorted(DELTA_BUCKETS, abs_delta), minlength=len(DELTA_BUCKETS)
+                )[:len(DELTA_BUCKETS)]
+                comparison.add_latency(candidate_seconds)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            started = time.monotonic()
+            while self.busy() and time.monotonic() - started < self.max_defer:
+                time.sleep(0.005)
+            self.deferred_seconds += time.monotonic() - started
+            # Take whatever else is already queued, up to batch_rows, and score it in one pass
+            items, rows, stop = [item], len(item[0]), False
+            while rows < self.batch_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                items.append(item)
+                rows += len(item[0])
+            try:
+                if self.busy():
+                    # Still no idle moment after max_defer: drop the batch rather than compete
+                    # with live requests for the CPU (and the GIL)
+                    self.skipped_busy += rows
+                else:
+                    self._score(items)
+            except Exception as e:
+                self.errors += 1
+                self._log("Shadow scoring failed", str(e), is_error=True)
+            finally:
+                with self._lock:
+                    self._queued_rows -= rows
+            if stop:
+                return
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=5.0):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # -------- reporting --------
+    def report(self):
+        with self._lock:
+            comparison = self._comparison
+            return {
+                "candidate": self.candidate.describe() if self.candidate is not None else None,
+                "sample_rate": self.sample_rate,
+                "min_rows": self.min_rows,
+                "queued_rows": self._queued_rows,
+                "sampled_rows": self.sampled,
+                "dropped_rows": self.dropped,
+                "skipped_busy_rows": self.skipped_busy,
+                "errors": self.errors,
+                "deferred_seconds": round(self.deferred_seconds, 3),
+                "comparison": comparison.report(self.min_rows) if comparison is not None else None,
+            }
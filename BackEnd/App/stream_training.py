@@ -0,0 +1,453 @@
+import argparse
+import collections
+import glob
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from drift_monitor import DEFAULT_BINS, PROFILE_VERSION
+from model_bundle import build_bundle, file_sha256, save_bundle
+from preprocessing import ID_COL, LEAK_COLS, TARGET_COL, build_preprocessor, clean_frame, coerce_numeric_columns
+
+# =========================
+# Out-of-core training
+# =========================
+# For extracts too large for one DataFrame. Two passes over the CSV, each one chunk at a time:
+#   1. prepare: column types, class counts and imputation statistics (mean, KLL-sketch median,
+#      Misra-Gries mode) in constant memory per column
+#   2. write:   impute + encode every chunk with those statistics and scatter its rows at random
+#               over the shards (raw float64/int64 files, memory-mapped when read back), so every
+#               shard is a class-mixed sample even when the file is sorted by class or date
+# The forest is then grown shard by shard with warm_start, so peak memory follows the chunk
+# size rather than the dataset size. The saved bundle is the usual preprocessor -> classifier
+# pipeline, so the API (and the compiled backend) serve it unchanged.
+DATA_PATH = os.getenv(
+    "CKD_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "csv_result-chronic_kidney_disease_full.csv")
+)
+MODEL_PATH = "ckd_model.pkl"
+MANIFEST_NAME = "manifest.json"
+SHARD_FORMAT = 2  # 1: one .npy shard per source chunk; 2: rows scattered over .f64/.i64 shards
+# Training rows that may sit in shards missing a class (and be skipped) before training fails
+MAX_SKIPPED_FRACTION = 0.05
+
+
+class KLLSketch:
+    """KLL quantile sketch: approximate quantiles of a stream in O(k log(n/k)) memory.
+
+    Level ``h`` holds items of weight ``2**h``. When a level outgrows its capacity it is
+    sorted and every other item (random offset) is promoted, halving its size.
+    """
+
+    def __init__(self, k=256, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.n += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item stays behind so total weight is preserved exactly
+                keep, items = items[:items.size % 2], items[items.size % 2:]
+                self.levels[level] = keep
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        if self.n == 0:
+            return float("nan")
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(lvl.size, 2 ** h, dtype=np.float64) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        return float(items[order][np.searchsorted(cumulative, q * cumulative[-1])])
+
+    @property
+    def size(self):
+        return sum(lvl.size for lvl in self.levels)
+
+
+class MisraGries:
+    """Heavy-hitter counter with at most ``k`` tracked values; the true mode survives whenever
+    it occurs in more than 1/(k+1) of the rows."""
+
+    def __init__(self, k=1000):
+        self.k = k
+        self.counts = collections.Counter()
+
+    def update(self, values):
+        self.counts.update(values)
+        if len(self.counts) > self.k:
+            floor = sorted(self.counts.values(), reverse=True)[self.k]
+            self.counts = collections.Counter({v: c - floor for v, c in self.counts.items() if c > floor})
+
+    def mode(self, default="missing"):
+        if not self.counts:
+            return default
+        # Ties go to the smallest value, like pandas' mode()[0]
+        best = max(self.counts.values())
+        return min(v for v, c in self.counts.items() if c == best)
+
+
+class NumericStats:
+    def __init__(self, sketch_k):
+        self.count = 0
+        self.missing = 0
+        self.total = 0.0
+        self.sketch = KLLSketch(sketch_k)
+
+    def update(self, values):
+        present = values[~np.isnan(values)]
+        self.count += present.size
+        self.missing += values.size - present.size
+        self.total += float(present.sum())
+        self.sketch.update(present)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "missing": self.missing,
+            "mean": self.total / self.count if self.count else float("nan"),
+            "median": self.sketch.quantile(0.5),
+            # Interior cut points of the drift reference histogram (see build_reference_profile)
+            "quantiles": [self.sketch.quantile(q) for q in np.linspace(0.0, 1.0, DEFAULT_BINS + 1)[1:-1]],
+        }
+
+
+class CategoricalStats:
+    def __init__(self, max_categories):
+        self.missing = 0
+        self.heavy = MisraGries(max_categories)
+        self.categories = set()
+        self.max_categories = max_categories
+
+    def update(self, values):
+        present = values.dropna()
+        self.missing += len(values) - len(present)
+        self.heavy.update(present.tolist())
+        if len(self.categories) <= self.max_categories:
+            self.categories.update(present.unique().tolist())
+
+    def summary(self):
+        if len(self.categories) > self.max_categories:
+            raise ValueError(f"More than {self.max_categories} distinct categories; raise --max-categories.")
+        return {"missing": self.missing, "mode": self.heavy.mode(), "categories": sorted(self.categories)}
+
+
+def read_chunks(path, chunksize):
+    """Yield cleaned feature/target chunks: quotes stripped from headers, '?' as NaN."""
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str, on_bad_lines='skip'):
+        chunk = clean_frame(chunk)
+        y = chunk[TARGET_COL]
+        X = chunk.drop(columns=[TARGET_COL, ID_COL] + LEAK_COLS, errors='ignore')
+        yield X, y
+
+
+def collect_statistics(path, chunksize=100000, sketch_k=256, max_categories=1000):
+    """Pass 1: column types (decided on the first chunk), class counts and imputation stats."""
+    numeric, categorical, classes = {}, {}, collections.Counter()
+    rows = 0
+    for X, y in read_chunks(path, chunksize):
+        if not numeric and not categorical:
+            numeric_cols, categorical_cols = coerce_numeric_columns(X.copy())
+            numeric = {col: NumericStats(sketch_k) for col in numeric_cols}
+            categorical = {col: CategoricalStats(max_categories) for col in categorical_cols}
+        for col, stats in numeric.items():
+            stats.update(pd.to_numeric(X[col], errors='coerce').to_numpy(dtype=np.float64))
+        for col, stats in categorical.items():
+            stats.update(X[col])
+        classes.update(y.dropna().tolist())
+        rows += len(X)
+    return {
+        "rows": rows,
+        "numeric": {col: s.summary() for col, s in numeric.items()},
+        "categorical": {col: s.summary() for col, s in categorical.items()},
+        "class_counts": dict(sorted(classes.items())),
+    }
+
+
+class _ReferenceHistograms:
+    """Drift reference profile of the raw numeric values, accumulated chunk by chunk.
+
+    Same format as drift_monitor.build_reference_profile, with the bin edges taken from the
+    pass-1 quantile sketches instead of exact quantiles.
+    """
+
+    def __init__(self, stats, numeric_cols):
+        self.columns = numeric_cols
+        self.edges = [np.unique(np.asarray(stats["numeric"][c]["quantiles"], dtype=np.float64)) for c in numeric_cols]
+        self.counts = [np.zeros(len(e) + 1, dtype=np.int64) for e in self.edges]
+        self.present = np.zeros(len(numeric_cols), dtype=np.int64)
+        self.total = np.zeros(len(numeric_cols))
+        self.low = np.full(len(numeric_cols), np.inf)
+        self.high = np.full(len(numeric_cols), -np.inf)
+        self.rows = 0
+
+    def update(self, X_num):
+        self.rows += len(X_num)
+        for j in range(len(self.columns)):
+            values = X_num[:, j][~np.isnan(X_num[:, j])]
+            if not values.size:
+                continue
+            self.counts[j] += np.bincount(np.searchsorted(self.edges[j], values, side="right"),
+                                          minlength=len(self.counts[j]))
+            self.present[j] += values.size
+            self.total[j] += float(values.sum())
+            self.low[j] = min(self.low[j], float(values.min()))
+            self.high[j] = max(self.high[j], float(values.max()))
+
+    def profile(self):
+        features = {}
+        for j, col in enumerate(self.columns):
+            if not self.present[j] or not len(self.edges[j]):
+                continue
+            features[col] = {
+                "edges": self.edges[j].tolist(),
+                "proportions": (self.counts[j] / self.present[j]).tolist(),
+                "missing_rate": float(1.0 - self.present[j] / self.rows),
+                "min": float(self.low[j]),
+                "max": float(self.high[j]),
+                "mean": float(self.total[j] / self.present[j]),
+            }
+        return {"version": PROFILE_VERSION, "n_rows": int(self.rows), "bins": DEFAULT_BINS, "features": features}
+
+
+def _shard_paths(shard_dir, name):
+    return os.path.join(shard_dir, f"{name}_X.f64"), os.path.join(shard_dir, f"{name}_y.i64")
+
+
+def write_shards(path, shard_dir, stats, strategy="median", chunksize=100000, test_size=0.2, seed=42):
+    """Pass 2: impute and encode each chunk with the pass-1 statistics into shards.
+
+    Every row goes to a seeded random shard (and split), so each shard is a uniform sample of the
+    whole file rather than one stretch of it. Shards are appended to chunk by chunk.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    for pattern in ("*.npy", "*.f64", "*.i64"):
+        for old in glob.glob(os.path.join(shard_dir, pattern)):
+            os.remove(old)
+
+    numeric_cols = list(stats["numeric"])
+    categorical_cols = list(stats["categorical"])
+    classes = list(stats["class_counts"])
+    fill = np.array([stats["numeric"][c][strategy] for c in numeric_cols], dtype=np.float64)
+    codes = {c: {v: i for i, v in enumerate(stats["categorical"][c]["categories"])} for c in categorical_cols}
+    class_index = {c: i for i, c in enumerate(classes)}
+    # About chunksize rows per shard (train + test), as when shards were cut per chunk
+    n_shards = max(1, math.ceil(stats["rows"] / chunksize))
+    reference = _ReferenceHistograms(stats, numeric_cols)
+
+    rows = collections.Counter()
+    for i, (X, y) in enumerate(read_chunks(path, chunksize)):
+        keep = y.isin(class_index).to_numpy()
+        X, y = X[keep], y[keep]
+        X_num = X[numeric_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        reference.update(X_num)
+        X_num = np.where(np.isnan(X_num), fill, X_num)
+        X_cat = np.column_stack([
+            X[c].fillna(stats["categorical"][c]["mode"]).map(codes[c]).fillna(-1).to_numpy(dtype=np.float64)
+            for c in categorical_cols
+        ]) if categorical_cols else np.empty((len(X), 0))
+        features = np.hstack([X_num, X_cat])
+        target = y.map(class_index).to_numpy(dtype=np.int64)
+
+        # Seeded per chunk, so a re-run writes identical shards
+        rng = np.random.default_rng([seed, i])
+        is_test = rng.random(len(target)) < test_size
+        destination = is_test * n_shards + rng.integers(n_shards, size=len(target))
+        order = np.argsort(destination, kind="stable")
+        targets, starts = np.unique(destination[order], return_index=True)
+        for dest, start, stop in zip(targets, starts, list(starts[1:]) + [len(order)]):
+            rows_here = order[start:stop]
+            name = f"{'test' if dest >= n_shards else 'train'}_{dest % n_shards:05d}"
+            X_path, y_path = _shard_paths(shard_dir, name)
+            with open(X_path, "ab") as f:
+                f.write(features[rows_here].astype("<f8").tobytes())
+            with open(y_path, "ab") as f:
+                f.write(target[rows_here].astype("<i8").tobytes())
+            rows[name] += len(rows_here)
+
+    manifest = {
+        "format": SHARD_FORMAT,
+        "data_path": os.path.abspath(path),
+        "strategy": strategy,
+        "numeric_cols": numeric_cols,
+        "categorical_cols": categorical_cols,
+        "classes": classes,
+        "n_features": len(numeric_cols) + len(categorical_cols),
+        "stats": stats,
+        "reference_profile": reference.profile(),
+        "shards": [
+            {"name": name, "split": name.split("_", 1)[0], "rows": int(n)} for name, n in sorted(rows.items())
+        ],
+    }
+    with open(os.path.join(shard_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_shard(shard_dir, manifest, shard):
+    # Memory-mapped: only the shard being fit is paged in
+    X_path, y_path = _shard_paths(shard_dir, shard["name"])
+    X = np.memmap(X_path, dtype="<f8", mode="r", shape=(shard["rows"], manifest["n_features"]))
+    y = np.fromfile(y_path, dtype="<i8")
+    return X, y
+
+
+def fit_preprocessor(manifest):
+    """The shared preprocessor, fitted to reproduce the streamed statistics exactly.
+
+    Fitting each imputer on a single row of the streamed fill values makes its ``statistics_``
+    equal to them for both the mean and median strategies.
+    """
+    numeric_cols, categorical_cols = manifest["numeric_cols"], manifest["categorical_cols"]
+    stats = manifest["stats"]
+    prototype = pd.DataFrame([{
+        **{c: stats["numeric"][c][manifest["strategy"]] for c in numeric_cols},
+        **{c: stats["categorical"][c]["mode"] for c in categorical_cols},
+    }])
+    preprocessor = build_preprocessor(
+        numeric_cols, categorical_cols,
+        numeric_strategy=manifest["strategy"],
+        categories=[stats["categorical"][c]["categories"] for c in categorical_cols] or "auto",
+    )
+    return preprocessor.fit(prototype.astype({c: np.float64 for c in numeric_cols}))
+
+
+def train_from_shards(shard_dir, trees_per_shard=10, max_trees=None, balance=True, random_state=42):
+    """Grow a RandomForest one shard at a time with warm_start; returns (pipeline, report)."""
+    with open(os.path.join(shard_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SHARD_FORMAT:
+        raise ValueError(f"Shards in {shard_dir} were written by an older version; rerun without --reuse-shards.")
+    n_classes = len(manifest["classes"])
+    counts = np.array([manifest["stats"]["class_counts"][c] for c in manifest["classes"]], dtype=np.float64)
+    # Global class weights stand in for SMOTE, which needs the whole minority class in memory
+    class_weight = dict(enumerate(counts.sum() / (n_classes * counts))) if balance else None
+
+    forest = RandomForestClassifier(
+        n_estimators=0, warm_start=True, random_state=random_state, class_weight=class_weight
+    )
+    train_shards = [s for s in manifest["shards"] if s["split"] == "train"]
+    n_train = sum(s["rows"] for s in train_shards)
+    # A warm-started tree must see every class; decide which shards qualify before fitting any
+    skipped = [s for s in train_shards
+               if len(np.unique(load_shard(shard_dir, manifest, s)[1])) < n_classes]
+    skipped_rows = sum(s["rows"] for s in skipped)
+    if skipped_rows > MAX_SKIPPED_FRACTION * n_train:
+        raise ValueError(
+            f"{skipped_rows} of {n_train} training rows are in shards missing a class "
+            f"(limit {MAX_SKIPPED_FRACTION:.0%}); use a larger --chunksize."
+        )
+    skipped_names = {s["name"] for s in skipped}
+
+    fitted_shards = 0
+    for shard in train_shards:
+        if shard["name"] in skipped_names:
+            print(f"⚠️  Skipping shard {shard['name']}: not every class is present")
+            continue
+        X, y = load_shard(shard_dir, manifest, shard)
+        forest.n_estimators += trees_per_shard
+        forest.fit(X, y)
+        fitted_shards += 1
+        print(f"🌲 {shard['name']}: {shard['rows']} rows, {forest.n_estimators} trees")
+        if max_trees and forest.n_estimators >= max_trees:
+            break
+    if not fitted_shards:
+        raise ValueError("No training shard contains every class; use a larger --chunksize.")
+
+    correct = total = 0
+    for shard in manifest["shards"]:
+        if shard["split"] != "test":
+            continue
+        X, y = load_shard(shard_dir, manifest, shard)
+        correct += int((forest.predict(X) == y).sum())
+        total += len(y)
+
+    model = Pipeline(steps=[('preprocessor', fit_preprocessor(manifest)), ('classifier', forest)])
+    report = {
+        "accuracy": round(correct / total, 4) if total else None,
+        "n_train": n_train,
+        "n_test": total,
+        "shards_fitted": fitted_shards,
+        "shards_skipped": len(skipped),
+        "rows_skipped": skipped_rows,
+        "n_estimators": forest.n_estimators,
+    }
+    return model, manifest, report
+
+
+def train_streaming(data_path=DATA_PATH, shard_dir="shards", model_path=MODEL_PATH, chunksize=100000,
+                    strategy="median", trees_per_shard=10, max_trees=None, reuse_shards=False):
+    started = time.perf_counter()
+    if not reuse_shards:
+        print(f"📂 Pass 1: collecting statistics from {data_path} ({chunksize} rows per chunk)...")
+        stats = collect_statistics(data_path, chunksize)
+        print(f"   {stats['rows']} rows, classes {stats['class_counts']}")
+        print(f"💾 Pass 2: writing shards to {shard_dir}...")
+        write_shards(data_path, shard_dir, stats, strategy, chunksize)
+    prepare_seconds = time.perf_counter() - started
+
+    print("⚡ Training forest shard by shard...")
+    model, manifest, report = train_from_shards(shard_dir, trees_per_shard, max_trees)
+    train_seconds = time.perf_counter() - started - prepare_seconds
+    print(f"✅ Model trained with hold-out accuracy: {report['accuracy']}")
+
+    print(f"💾 Saving trained model bundle to {model_path}...")
+    bundle = build_bundle(
+        model,
+        classes=manifest["classes"],
+        numeric_cols=manifest["numeric_cols"],
+        categorical_cols=manifest["categorical_cols"],
+        metadata={
+            **report,
+            "data_path": manifest["data_path"],
+            "data_sha256": file_sha256(manifest["data_path"]),
+            "training_mode": "streaming",
+            "imputation_strategy": manifest["strategy"],
+            "chunksize": chunksize,
+            "prepare_seconds": round(prepare_seconds, 3),
+            "train_seconds": round(train_seconds, 3),
+            "classifier_params": model.named_steps['classifier'].get_params(),
+        },
+        reference_profile=manifest["reference_profile"],
+    )
+    save_bundle(bundle, model_path)
+    print("🎉 Training complete! Model ready for use.")
+    return bundle
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Out-of-core training on CSVs too large for memory.")
+    parser.add_argument("--data", default=DATA_PATH, help="Source CSV")
+    parser.add_argument("--shard-dir", default="shards", help="Where preprocessed .npy shards are written")
+    parser.add_argument("--output", default=MODEL_PATH, help="Model bundle path")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per chunk / shard")
+    parser.add_argument("--strategy", choices=["mean", "median"], default="median", help="Numeric imputation")
+    parser.add_argument("--trees-per-shard", type=int, default=10)
+    parser.add_argument("--max-trees", type=int, help="Stop once the forest has this many trees")
+    parser.add_argument("--reuse-shards", action="store_true", help="Skip both passes and train on existing shards")
+    args = parser.parse_args()
+    train_streaming(args.data, args.shard_dir, args.output, args.chunksize, args.strategy,
+                    args.trees_per_shard, args.max_trees, args.reuse_shards)
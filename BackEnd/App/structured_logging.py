@@ -0,0 +1,121 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+
+# =========================
+# Structured, non-blocking logging
+# =========================
+# Request threads only build a LogRecord and drop it on a bounded in-memory queue. A
+# background QueueListener thread does the JSON formatting and the stdout write. If the
+# queue is full (stdout stalled), records are dropped and counted instead of blocking.
+
+LOGGER_NAME = "ckd_api"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        data = getattr(record, "data", None)
+        if data is not None:
+            entry["data"] = data
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The original human-readable console format."""
+
+    def format(self, record):
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        prefix = "❌ ERROR" if record.levelno >= logging.ERROR else "✅ INFO"
+        data = getattr(record, "data", None)
+        if data is not None:
+            return f"[{ts}] {prefix} | {record.getMessage()} | Data: {data}"
+        return f"[{ts}] {prefix} | {record.getMessage()}"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and defers all formatting to the listener thread."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stock implementation formats the message here, on the request thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogSettings:
+    def __init__(self):
+        self.sample_rate = 1.0
+        self.handler = None
+        self.listener = None
+
+    def sampled(self):
+        """True if a sampled (per-prediction) event should be logged this time."""
+        rate = self.sample_rate
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    def stats(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0,
+        }
+
+
+settings = LogSettings()
+
+
+def configure_logging(level="INFO", fmt="json", sample_rate=1.0, queue_size=10000, stream=None):
+    """Route the API logger through a bounded queue to a background writer thread."""
+    if settings.listener is not None:
+        settings.listener.stop()
+
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=False)
+
+    logger = logging.getLogger(LOGGER_NAME)
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+    settings.sample_rate = sample_rate
+    settings.handler = handler
+    settings.listener = listener
+    listener.start()
+    return logger
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    if settings.listener is not None:
+        settings.listener.stop()
+        settings.listener = None
+
+
+atexit.register(shutdown_logging)
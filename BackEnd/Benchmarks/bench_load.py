@@ -0,0 +1,79 @@
+"""In-process load test of the FastAPI app: latency percentiles and QPS per endpoint."""
+import argparse
+import asyncio
+import time
+
+from common import MODEL_PATH, environment, latency_summary, synthetic_records, write_results
+
+
+async def _drive(client, make_request, total, concurrency):
+    latencies, statuses = [], {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            i = next_index
+            next_index += 1
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    summary = latency_summary(latencies, time.perf_counter() - started)
+    summary["status_codes"] = {str(k): v for k, v in sorted(statuses.items())}
+    return summary
+
+
+def run(quick=False, model_path=MODEL_PATH, concurrency=32):
+    import httpx
+    from fastapi.testclient import TestClient
+
+    import main
+
+    main.registry.path = model_path
+
+    n_single = 500 if quick else 5000
+    n_batches = 20 if quick else 100
+    # Unique payloads so the prediction cache does not flatter the numbers
+    records = synthetic_records(n_single, seed=1, missing_rate=0.0)
+    batch = synthetic_records(1000, seed=2, missing_rate=0.0)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = {}
+            print(f"🚦 /predict: {n_single} requests, concurrency {concurrency}...")
+            results["predict"] = await _drive(
+                client, lambda c, i: c.post("/predict", json=records[i]), n_single, concurrency
+            )
+            print(f"🚦 /predict (cached repeats): {n_single} requests...")
+            results["predict_cached"] = await _drive(
+                client, lambda c, i: c.post("/predict", json=records[i % 10]), n_single, concurrency
+            )
+            print(f"🚦 /predict/batch x1000 rows: {n_batches} requests...")
+            results["predict_batch_1000"] = await _drive(
+                client, lambda c, i: c.post("/predict/batch", json=batch), n_batches, min(concurrency, 4)
+            )
+            return results
+
+    # TestClient runs the startup/shutdown events around the load test
+    with TestClient(main.app):
+        results = asyncio.run(scenario())
+    results["concurrency"] = concurrency
+    for name, summary in results.items():
+        if isinstance(summary, dict):
+            print(f"   {name}: p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms, {summary['qps']} req/s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="Fewer requests")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--model", default=MODEL_PATH, help="Model bundle to serve")
+    parser.add_argument("--output", help="JSON output path (default: results/bench-<timestamp>.json)")
+    args = parser.parse_args()
+    write_results({"environment": environment(), "load": run(args.quick, args.model, args.concurrency)}, args.output)
@@ -0,0 +1,134 @@
+"""Micro-benchmarks for the serving path: request decoding and validation, DataFrame construction, predict_proba."""
+import argparse
+
+from common import MODEL_PATH, synthetic_matrix, synthetic_records, time_call, write_results, environment
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000, 100000)
+QUICK_BATCH_SIZES = (1, 10, 100, 1000)
+
+
+def _repeat_for(n_rows):
+    return max(3, min(200, 20000 // max(n_rows, 1)))
+
+
+def dataframe_row(patient, feature_columns):
+    """The pre-fast-path /predict conversion, kept as the reference implementation."""
+    import pandas as pd
+
+    input_df = pd.DataFrame([patient.model_dump()]).astype(float)
+    input_df.isnull().all(axis=1).iloc[0]
+    return input_df[feature_columns].to_numpy()
+
+
+def run_request_conversion(n_records=1000):
+    """Before/after for the single-request conversion: one-row DataFrame vs patient_to_row()."""
+    import numpy as np
+
+    from main import FEATURE_COLUMNS, PatientData, patient_to_row
+
+    patients = [PatientData(**r) for r in synthetic_records(n_records, seed=7, missing_rate=0.3)]
+    # Both paths must produce the same matrix (NaN for missing) before the timings mean anything
+    matches = all(
+        np.array_equal(patient_to_row(p)[0].reshape(1, -1), dataframe_row(p, FEATURE_COLUMNS), equal_nan=True)
+        for p in patients
+    )
+    sample = patients[0]
+    before = time_call(lambda: dataframe_row(sample, FEATURE_COLUMNS), repeat=7, number=200)
+    after = time_call(lambda: patient_to_row(sample)[0].reshape(1, -1), repeat=7, number=2000)
+    print(f"🔁 request -> features: DataFrame {before['median_ms'] * 1000:.1f} µs, "
+          f"fast path {after['median_ms'] * 1000:.2f} µs (identical: {matches})")
+    return {
+        "records_checked": n_records,
+        "identical": matches,
+        "dataframe": before,
+        "fast_path": after,
+        "speedup": round(before["median_ms"] / after["median_ms"], 1),
+    }
+
+
+def run_request_decoding(records, X):
+    """Body -> validated feature matrix: JSON records vs the packed columnar format."""
+    import json
+
+    import columnar_format
+    from main import FEATURE_BOUNDS, FEATURE_COLUMNS, parse_batch_body, validate_batch
+
+    json_body = json.dumps(records).encode()
+    packed_body = columnar_format.encode_request(X)
+    dtype = columnar_format.DTYPES["float64"]
+    repeat = _repeat_for(len(X))
+
+    def packed():
+        matrix = columnar_format.decode_packed(packed_body, dtype, len(FEATURE_COLUMNS))
+        return matrix, columnar_format.validate_matrix(matrix, FEATURE_BOUNDS)
+
+    return {
+        "json_bytes": len(json_body),
+        "packed_bytes": len(packed_body),
+        "json": time_call(lambda: validate_batch(parse_batch_body(json_body, "application/json")), repeat=repeat),
+        "packed": time_call(packed, repeat=repeat),
+    }
+
+
+def run(quick=False, model_path=MODEL_PATH):
+    import numpy as np
+    import pandas as pd
+
+    from compact_model import COMPILED_ATOL
+    from fast_forest import compile_pipeline
+    from main import FEATURE_COLUMNS, PatientData
+    from model_bundle import load_bundle
+
+    pipeline = load_bundle(model_path)["model"]
+    try:
+        compiled = compile_pipeline(pipeline, FEATURE_COLUMNS)
+    except ValueError:
+        compiled = None
+
+    results = {"request_conversion": run_request_conversion()}
+    for n_rows in (QUICK_BATCH_SIZES if quick else BATCH_SIZES):
+        print(f"⏱️  batch size {n_rows}...")
+        records = synthetic_records(n_rows, seed=n_rows)
+        X = synthetic_matrix(n_rows, seed=n_rows)
+        df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        repeat = _repeat_for(n_rows)
+
+        row = {
+            "validation": time_call(lambda: [PatientData(**r) for r in records], repeat=repeat),
+            "dataframe_from_dicts": time_call(lambda: pd.DataFrame(records).astype(float), repeat=repeat),
+            "dataframe_from_matrix": time_call(lambda: pd.DataFrame(X, columns=FEATURE_COLUMNS), repeat=repeat),
+            "predict_proba_sklearn": time_call(lambda: pipeline.predict_proba(df), repeat=repeat),
+        }
+        if compiled is not None:
+            row["predict_proba_compiled"] = time_call(lambda: compiled.predict_proba(X), repeat=repeat)
+        row["request_decoding"] = run_request_decoding(records, X)
+        results[str(n_rows)] = row
+        per_row = row["predict_proba_sklearn"]["median_ms"] / n_rows * 1000.0
+        print(f"   sklearn predict_proba: {row['predict_proba_sklearn']['median_ms']:.3f} ms ({per_row:.2f} µs/row)")
+        if compiled is not None:
+            print(f"   compiled predict_proba: {row['predict_proba_compiled']['median_ms']:.3f} ms")
+        decoding = row["request_decoding"]
+        print(f"   body -> validated matrix: JSON {decoding['json']['median_ms']:.3f} ms, "
+              f"packed {decoding['packed']['median_ms']:.3f} ms")
+
+    # Sanity check: both engines must agree on a sample before their timings mean anything.
+    # Same criterion as verify_parity: compacted bundles store float32 leaves, so agree to
+    # COMPILED_ATOL on the probabilities and exactly on the predicted class
+    if compiled is not None:
+        X = synthetic_matrix(1000, seed=123)
+        actual = compiled.predict_proba(X)
+        expected = pipeline.predict_proba(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+        results["compiled_matches_sklearn"] = bool(
+            np.allclose(actual, expected, atol=COMPILED_ATOL, rtol=0)
+            and np.array_equal(actual.argmax(axis=1), expected.argmax(axis=1))
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="Skip the largest batch sizes")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model bundle to benchmark")
+    parser.add_argument("--output", help="JSON output path (default: results/bench-<timestamp>.json)")
+    args = parser.parse_args()
+    write_results({"environment": environment(), "serving": run(args.quick, args.model)}, args.output)
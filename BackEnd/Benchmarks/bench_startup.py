@@ -0,0 +1,127 @@
+"""Cold-start benchmark: import-time profile of the API and time until a fresh process is ready."""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import APP_DIR, MODEL_PATH, RESULTS_DIR, environment, sample_summary, write_results
+
+HEAVY_MODULES = ("pandas", "sklearn", "scipy", "imblearn", "sklearn.model_selection")
+PROFILE_TOP = 12
+
+# Runs in a fresh interpreter per sample, so nothing is already imported or cached in memory
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+print("--- model load ---", file=sys.stderr, flush=True)
+main.load_and_start()
+ready = time.perf_counter()
+ready_at = time.time()
+main.registry.stop()
+main.scoring_pool.shutdown()
+if main.audit_trail is not None:
+    main.audit_trail.close()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000.0,
+    "load_ms": (ready - imported) * 1000.0,
+    "ready_at": ready_at,
+    "modules": {m: m in sys.modules for m in %r},
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _launch(model_path, backend, importtime=False):
+    env = dict(os.environ, CKD_MODEL_PATH=model_path, CKD_INFERENCE_BACKEND=backend, CKD_LOAD_IN_BACKGROUND="0")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD]
+    launched_at = time.time()
+    done = subprocess.run(command, cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(done.stdout.strip().splitlines()[-1])
+    # Wall time from exec to ready, interpreter start-up included
+    result["ready_ms"] = (result.pop("ready_at") - launched_at) * 1000.0
+    return result, done.stderr
+
+
+def import_profile(stderr, top=PROFILE_TOP):
+    """Top-level packages by cumulative import time (ms): what ``import main`` pulls in, and
+    what loading the model imports on top of that."""
+    phases = {"import": {}, "model_load": {}}
+    children, loading = {}, False
+    for line in stderr.splitlines():
+        if line.startswith("--- model load ---"):
+            loading = True
+            continue
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        package = name.strip().split(".", 1)[0]
+        ms = int(cumulative) / 1000.0
+        # A module's imports are printed before the module itself, one level deeper
+        if depth == 1 and not loading:
+            children[package] = children.get(package, 0.0) + ms
+        elif depth == 0:
+            if loading:
+                phases["model_load"][package] = phases["model_load"].get(package, 0.0) + ms
+            elif package == "main":
+                phases["import"] = children
+            children = {}
+    return {
+        name: {package: round(ms, 1) for package, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:top]}
+        for name, packages in phases.items()
+    }
+
+
+def mapped_copy(model_path):
+    """Export ``model_path`` as a mapped model file under results/ (None if it cannot be compiled)."""
+    from mapped_model import export_mapped
+    from model_bundle import load_bundle
+
+    path = os.path.join(RESULTS_DIR, "startup_model.ckdm")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    try:
+        export_mapped(load_bundle(model_path), path, source_path=model_path)
+    except ValueError as e:
+        print(f"⚠️  Skipping the mapped scenario: {e}")
+        return None
+    return path
+
+
+def run(quick=False, model_path=MODEL_PATH):
+    repeat = 3 if quick else 7
+    scenarios = {"pickle_sklearn": (model_path, "sklearn"), "pickle_compiled": (model_path, "compiled")}
+    mapped_path = mapped_copy(model_path)
+    if mapped_path is not None:
+        scenarios["mapped_compiled"] = (mapped_path, "compiled")
+
+    results = {}
+    for name, (path, backend) in scenarios.items():
+        print(f"🧊 {name}: {repeat} cold starts...")
+        samples = [_launch(path, backend)[0] for _ in range(repeat)]
+        _, stderr = _launch(path, backend, importtime=True)
+        results[name] = {
+            "model": os.path.basename(path),
+            "backend": backend,
+            "import": sample_summary([s["import_ms"] for s in samples]),
+            "model_load": sample_summary([s["load_ms"] for s in samples]),
+            "ready": sample_summary([s["ready_ms"] for s in samples]),
+            "heavy_modules_loaded": sorted(m for m, loaded in samples[-1]["modules"].items() if loaded),
+            "import_profile": import_profile(stderr),
+        }
+        print(f"   import {results[name]['import']['median_ms']:.0f} ms, "
+              f"model load {results[name]['model_load']['median_ms']:.0f} ms, "
+              f"ready after {results[name]['ready']['median_ms']:.0f} ms "
+              f"(heavy modules: {', '.join(results[name]['heavy_modules_loaded']) or 'none'})")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="Fewer cold starts per scenario")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model bundle to start from")
+    parser.add_argument("--output", help="JSON output path (default: results/bench-<timestamp>.json)")
+    args = parser.parse_args()
+    write_results({"environment": environment(), "startup": run(args.quick, args.model)}, args.output)
@@ -0,0 +1,127 @@
+"""Training-time benchmarks on synthetically scaled copies of the CKD dataset."""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from common import DATA_PATH, environment, write_results
+
+SCALES = (1, 10, 50)
+QUICK_SCALES = (1, 5)
+# Minority-class rows for the oversampler comparison (majority is 3x larger, 12 features)
+OVERSAMPLE_ROWS = (10000, 100000)
+QUICK_OVERSAMPLE_ROWS = (10000, 30000)
+
+
+def scaled_dataset(scale, path, seed=0):
+    """Write ``scale`` x the rows of the raw CSV, with numeric values jittered by ~2%."""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(DATA_PATH, on_bad_lines='skip', dtype=str)
+    if scale > 1:
+        rng = np.random.default_rng(seed)
+        df = df.sample(n=len(df) * scale, replace=True, random_state=seed).reset_index(drop=True)
+        for col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            numeric = values.notna()
+            if col.strip("'") == "id" or numeric.mean() < 0.5:
+                continue
+            jitter = 1.0 + rng.normal(0.0, 0.02, len(df))
+            df.loc[numeric, col] = (values[numeric] * jitter[numeric]).round(3).astype(str)
+        df[df.columns[0]] = np.arange(1, len(df) + 1).astype(str)
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def _timed(fn):
+    import tracemalloc
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(wall, 3), "peak_python_mb": round(peak / 1024 / 1024, 2)}
+
+
+def oversampler_comparison(minority_rows, n_features=12, seed=0):
+    """imblearn SMOTE vs FastSMOTENC (exact and approximate) on a synthetic 3:1 imbalanced set."""
+    import numpy as np
+    from preprocessing import make_oversampler
+
+    rng = np.random.default_rng(seed)
+    X = np.vstack([rng.normal(0.0, 1.0, (3 * minority_rows, n_features)),
+                   rng.normal(0.5, 1.0, (minority_rows, n_features))])
+    y = np.repeat([0, 1], [3 * minority_rows, minority_rows])
+    samplers = {
+        "smote": make_oversampler("smote"),
+        "fast_exact": make_oversampler("fast", approximate=False),
+        "fast_approximate": make_oversampler("fast", approximate=True),
+    }
+    return {name: _timed(lambda: sampler.fit_resample(X, y)) for name, sampler in samplers.items()}
+
+
+def run(quick=False):
+    import model_1
+    import model_3
+    import stream_training
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in (QUICK_SCALES if quick else SCALES):
+            csv_path = os.path.join(workdir, f"ckd_x{scale}.csv")
+            n_rows = scaled_dataset(scale, csv_path)
+            print(f"🏋️  scale x{scale} ({n_rows} rows)...")
+
+            row = {"rows": n_rows}
+            row["model_1.load_and_preprocess_data"] = _timed(lambda: model_1.load_and_preprocess_data(csv_path))
+
+            # train_model writes its artifacts to the working directory and reads DATA_PATH
+            cwd, data_path = os.getcwd(), model_3.DATA_PATH
+            try:
+                os.chdir(workdir)
+                model_3.DATA_PATH = csv_path
+                with contextlib.redirect_stdout(io.StringIO()):
+                    # Timed without tracemalloc, which would inflate the stage times; the peak
+                    # comes from a second, traced run
+                    profile = model_3.train_model()["metadata"]["training_profile"]
+                    traced = model_3.train_model(profile_memory=True)["metadata"]["training_profile"]
+                row["model_3.train_model"] = {
+                    "seconds": profile["total_seconds"],
+                    "peak_python_mb": traced["peak_mb"],
+                    "stages": {name: {**stage, "peak_mb": traced["stages"][name]["peak_mb"]}
+                               for name, stage in profile["stages"].items()},
+                }
+            finally:
+                model_3.DATA_PATH = data_path
+                os.chdir(cwd)
+
+            shard_dir = os.path.join(workdir, "shards")
+            row["stream_training.train_streaming"] = _timed(lambda: stream_training.train_streaming(
+                csv_path, shard_dir, os.path.join(workdir, "stream_model.pkl"), chunksize=2000, trees_per_shard=5
+            ))
+
+            results[f"x{scale}"] = row
+            print(f"   preprocess {row['model_1.load_and_preprocess_data']['seconds']} s, "
+                  f"train {row['model_3.train_model']['seconds']} s, "
+                  f"streaming {row['stream_training.train_streaming']['seconds']} s")
+
+    results["oversampling"] = {}
+    for minority_rows in (QUICK_OVERSAMPLE_ROWS if quick else OVERSAMPLE_ROWS):
+        print(f"⚖️  oversampling {minority_rows} minority rows...")
+        row = results["oversampling"][f"{minority_rows}_minority"] = oversampler_comparison(minority_rows)
+        print("   " + ", ".join(f"{name} {r['seconds']} s / {r['peak_python_mb']} MB" for name, r in row.items()))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quick", action="store_true", help="Smaller scale factors")
+    parser.add_argument("--output", help="JSON output path (default: results/bench-<timestamp>.json)")
+    args = parser.parse_args()
+    write_results({"environment": environment(), "training": run(args.quick)}, args.output)
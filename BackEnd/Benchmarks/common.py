@@ -0,0 +1,125 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Benchmarks import the serving and training code straight from BackEnd/App
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.normpath(os.path.join(BENCH_DIR, "..", "App"))
+DATA_PATH = os.path.normpath(os.path.join(BENCH_DIR, "..", "Data", "csv_result-chronic_kidney_disease_full.csv"))
+MODEL_PATH = os.path.join(APP_DIR, "ckd_model.pkl")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# main.py reads its settings at import time; benchmarks must not depend on the working
+# directory, nor pay for per-request log lines
+os.environ.setdefault("CKD_MODEL_PATH", MODEL_PATH)
+os.environ.setdefault("CKD_MODEL_POLL_SECONDS", "0")
+os.environ.setdefault("CKD_LOG_LEVEL", "WARNING")
+# Every benchmark request comes from one client address; measure capacity, not the per-client limit
+os.environ.setdefault("CKD_RATE_LIMIT_PER_SECOND", "0")
+# The audit trail is measured as part of the request path, but writes under results/
+os.environ.setdefault("CKD_AUDIT", "1")
+os.environ.setdefault("CKD_AUDIT_PATH", os.path.join(RESULTS_DIR, "audit.sqlite3"))
+
+# Ranges of the PatientData fields, used to generate valid synthetic requests
+FEATURE_RANGES = {
+    "age": (2, 90), "bp": (50, 180), "sg": (1.005, 1.025), "bgr": (22, 490), "bu": (1.5, 290),
+    "sc": (0.4, 14), "sod": (104, 163), "pot": (2.5, 9.5), "hemo": (3.1, 17.8), "pcv": (11, 54),
+    "wbcc": (2200, 24000), "rbcc": (2.1, 8),
+}
+
+
+def synthetic_matrix(n_rows, seed=0, missing_rate=0.05):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.uniform(lo, hi, n_rows) for lo, hi in FEATURE_RANGES.values()])
+    X[rng.random(X.shape) < missing_rate] = np.nan
+    return X
+
+
+def synthetic_records(n_rows, seed=0, missing_rate=0.05):
+    import numpy as np
+
+    X = synthetic_matrix(n_rows, seed, missing_rate)
+    names = list(FEATURE_RANGES)
+    return [
+        {name: (None if np.isnan(v) else round(float(v), 3)) for name, v in zip(names, row)}
+        for row in X
+    ]
+
+
+def time_call(fn, repeat=5, number=1, warmup=1):
+    """Run ``fn`` ``number`` times per sample, ``repeat`` samples; returns per-call stats in ms."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number * 1000.0)
+    return {"repeat": repeat, "number": number, **sample_summary(samples)}
+
+
+def sample_summary(samples_ms):
+    return {
+        "min_ms": round(min(samples_ms), 4),
+        "median_ms": round(statistics.median(samples_ms), 4),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+        "max_ms": round(max(samples_ms), 4),
+    }
+
+
+def latency_summary(latencies_ms, wall_seconds=None):
+    import numpy as np
+
+    lat = np.asarray(latencies_ms, dtype=float)
+    summary = {
+        "requests": int(lat.size),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "max_ms": round(float(lat.max()), 3),
+        "mean_ms": round(float(lat.mean()), 3),
+    }
+    if wall_seconds:
+        summary["qps"] = round(lat.size / wall_seconds, 1)
+    return summary
+
+
+def environment():
+    info = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    for module in ("numpy", "pandas", "sklearn", "imblearn", "fastapi", "pydantic"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def write_results(results, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, time.strftime("bench-%Y%m%d-%H%M%S.json"))
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"💾 Results written to {path}")
+    return path
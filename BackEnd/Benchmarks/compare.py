@@ -0,0 +1,63 @@
+"""Compare two benchmark result files and flag regressions.
+
+Every timing (``*_ms`` / ``seconds``) present in both files is compared; a metric is a
+regression when the candidate is slower than the baseline by more than ``--threshold``.
+Throughput (``qps``) is compared the other way round. Exits with status 1 on regressions.
+"""
+import argparse
+import json
+import sys
+
+# Only the headline statistics; min/max are too noisy to gate on
+TIMING_KEYS = ("median_ms", "p50_ms", "p95_ms", "p99_ms", "seconds")
+HIGHER_IS_BETTER = ("qps",)
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if key in TIMING_KEYS or key in HIGHER_IS_BETTER:
+                flat[path] = float(value)
+    return flat
+
+
+def compare(baseline, candidate, threshold):
+    base, cand = flatten(baseline), flatten(candidate)
+    rows = []
+    for path in sorted(set(base) & set(cand)):
+        if base[path] <= 0:
+            continue
+        change = cand[path] / base[path] - 1.0
+        if path.rsplit(".", 1)[-1] in HIGHER_IS_BETTER:
+            change = -change
+        rows.append((path, base[path], cand[path], change, change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (default: 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold)
+    regressions = [row for row in rows if row[4]]
+    for path, old, new, change, regressed in rows:
+        marker = "❌" if regressed else "  "
+        print(f"{marker} {path:<70} {old:>12.3f} -> {new:>12.3f} ({change:+.1%} slower)")
+    print(f"\n{len(rows)} metrics compared, {len(regressions)} regressions over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Run the benchmark suites and write one JSON result file."""
+import argparse
+
+from common import MODEL_PATH, environment, write_results
+
+SUITES = ("serving", "load", "startup", "training")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--suite", action="append", choices=SUITES, help="Suite to run (repeatable, default: all)")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast smoke run")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model bundle for the serving, load and startup suites")
+    parser.add_argument("--output", help="JSON output path (default: results/bench-<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "quick": args.quick}
+    for suite in args.suite or SUITES:
+        print(f"\n===== {suite} =====")
+        if suite == "serving":
+            import bench_serving
+            results["serving"] = bench_serving.run(args.quick, args.model)
+        elif suite == "load":
+            import bench_load
+            results["load"] = bench_load.run(args.quick, args.model)
+        elif suite == "startup":
+            import bench_startup
+            results["startup"] = bench_startup.run(args.quick, args.model)
+        elif suite == "training":
+            import bench_training
+            results["training"] = bench_training.run(args.quick)
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
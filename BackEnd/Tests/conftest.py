@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(TESTS_DIR, "..", "App")
+MODEL_PATH = os.path.join(APP_DIR, "ckd_model.pkl")
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# main.py reads its settings at import time: serve the checked-in model, with nothing that
+# depends on the working directory (watcher, candidate file, audit database) or the clock
+os.environ.setdefault("CKD_MODEL_PATH", MODEL_PATH)
+os.environ.setdefault("CKD_MODEL_POLL_SECONDS", "0")
+os.environ.setdefault("CKD_CANDIDATE_MODEL_PATH", "")
+os.environ.setdefault("CKD_AUDIT", "0")
+os.environ.setdefault("CKD_LOG_LEVEL", "WARNING")
+os.environ.setdefault("CKD_RATE_LIMIT_PER_SECOND", "0")
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient of the API, started once (startup loads the model) for the whole session."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
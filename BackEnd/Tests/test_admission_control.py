@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import admission_control
+from admission_control import AdmissionController, AdmissionMiddleware, TokenBuckets
+
+
+def test_token_bucket_allows_the_burst_then_reports_the_wait():
+    buckets = TokenBuckets(rate=2.0, burst=3)
+    assert [buckets.take("a", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("a", now=0.0) == 0.5  # one token every 1/rate seconds
+    assert buckets.take("a", now=0.25) == 0.25
+
+
+def test_token_bucket_refills_up_to_the_burst():
+    buckets = TokenBuckets(rate=1.0, burst=2)
+    buckets.take("a", now=0.0)
+    buckets.take("a", now=0.0)
+    assert buckets.take("a", now=1.0) == 0.0
+    # A long idle period refills no more than the burst
+    assert [buckets.take("a", now=100.0) for _ in range(3)] == [0.0, 0.0, 1.0]
+
+
+def test_clients_have_separate_buckets():
+    buckets = TokenBuckets(rate=1.0, burst=1)
+    assert buckets.take("a", now=0.0) == 0.0
+    assert buckets.take("a", now=0.0) > 0
+    assert buckets.take("b", now=0.0) == 0.0
+
+
+def test_least_recently_seen_clients_are_forgotten():
+    buckets = TokenBuckets(rate=1.0, burst=1, max_keys=2)
+    for client in ("a", "b", "c"):
+        buckets.take(client, now=0.0)
+    assert len(buckets) == 2
+    # "a" was dropped, so it starts over with a full bucket
+    assert buckets.take("a", now=0.0) == 0.0
+    assert buckets.take("c", now=0.0) > 0
+
+
+# -------- AdmissionController --------
+def _request(controller, log, name, hold=0.0):
+    """One scoring request as AdmissionMiddleware runs it: acquire, handle, release."""
+    async def run():
+        rejection = await controller.acquire("client")
+        if rejection is not None:
+            log.append((name, rejection[0]))
+            return
+        log.append((name, "admitted"))
+        try:
+            await asyncio.sleep(hold)
+        finally:
+            controller.release()
+    return run()
+
+
+def test_slots_are_handed_over_in_arrival_order():
+    async def scenario():
+        controller = AdmissionController(rate_per_second=0, max_in_flight=1, queue_timeout=5.0)
+        log = []
+        first = asyncio.ensure_future(_request(controller, log, "first", hold=0.05))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(_request(controller, log, name, hold=0.01)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert (controller.in_flight, controller.queued) == (1, 3)
+        await asyncio.gather(first, *waiters)
+        assert log == [("first", "admitted"), ("a", "admitted"), ("b", "admitted"), ("c", "admitted")]
+        assert (controller.in_flight, controller.queued, controller.admitted) == (0, 0, 4)
+
+    asyncio.run(scenario())
+
+
+def test_waiters_time_out_and_full_queues_shed_at_once():
+    async def scenario():
+        controller = AdmissionController(rate_per_second=0, max_in_flight=1, max_queued=1, queue_timeout=0.05)
+        log = []
+        holder = asyncio.ensure_future(_request(controller, log, "holder", hold=0.2))
+        await asyncio.sleep(0)
+        await asyncio.gather(_request(controller, log, "waiter"), _request(controller, log, "overflow"))
+        await holder
+        assert log == [("holder", "admitted"), ("overflow", 503), ("waiter", 503)]
+        assert controller.rejected == {"queue_full": 1, "queue_timeout": 1}
+        assert (controller.in_flight, controller.queued) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def _handover_then(exception, controller):
+    # Stand-in for asyncio.wait_for that loses the race: release() hands the waiter its slot
+    # at the very moment the wait times out or is cancelled
+    async def wait_for(future, timeout):
+        controller.release()
+        assert future.done() and not future.cancelled()
+        raise exception
+    return wait_for
+
+
+def test_timeout_racing_a_handover_keeps_the_slot(monkeypatch):
+    async def scenario():
+        controller = AdmissionController(rate_per_second=0, max_in_flight=1, queue_timeout=0.05)
+        assert await controller.acquire("holder") is None
+        monkeypatch.setattr(admission_control.asyncio, "wait_for", _handover_then(asyncio.TimeoutError(), controller))
+        # The holder's slot went to the waiter, so the waiter is admitted, not rejected
+        assert await controller.acquire("waiter") is None
+        assert (controller.in_flight, controller.queued, controller.rejected) == (1, 0, {})
+        controller.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancellation_after_a_handover_passes_the_slot_on(monkeypatch):
+    async def scenario():
+        controller = AdmissionController(rate_per_second=0, max_in_flight=1, queue_timeout=5.0)
+        assert await controller.acquire("holder") is None
+        monkeypatch.setattr(admission_control.asyncio, "wait_for",
+                            _handover_then(asyncio.CancelledError(), controller))
+        with pytest.raises(asyncio.CancelledError):
+            await controller.acquire("gone")
+        monkeypatch.undo()
+        assert (controller.in_flight, controller.queued) == (0, 0)
+        assert await controller.acquire("next") is None
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiters_never_leak_slots():
+    async def scenario():
+        controller = AdmissionController(rate_per_second=0, max_in_flight=1, queue_timeout=5.0)
+        log = []
+        holder = asyncio.ensure_future(_request(controller, log, "holder", hold=0.01))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(_request(controller, log, "queued"))
+        handed_over = asyncio.ensure_future(_request(controller, log, "handed_over"))
+        await asyncio.sleep(0)
+        queued.cancel()  # client gone while waiting
+        await holder
+        handed_over.cancel()  # client gone right after its slot was handed over
+        await asyncio.gather(queued, handed_over, return_exceptions=True)
+        assert (controller.in_flight, controller.queued) == (0, 0)
+        assert await controller.acquire("next") is None
+
+    asyncio.run(scenario())
+
+
+def test_rate_limited_clients_get_429_with_retry_after():
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    controller = AdmissionController(rate_per_second=0.5, burst=2, paths=("/predict",))
+    app = Starlette(routes=[Route("/predict", ok, methods=["POST"]), Route("/health", ok)])
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    with TestClient(app) as client:
+        assert [client.post("/predict").status_code for _ in range(2)] == [200, 200]
+        response = client.post("/predict")
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"  # one token every 2 s, rounded up
+        assert response.json() == {"detail": "Too many requests from this client."}
+        # Routes outside the scoring paths are not limited
+        assert client.get("/health").status_code == 200
+    assert controller.rejected == {"rate_limited": 1}
+    assert controller.in_flight == 0
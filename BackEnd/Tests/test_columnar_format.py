@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import columnar_format
+from columnar_format import DTYPES, NO_FEATURES_BIT, decode_packed, encode_request, validate_matrix
+
+
+@pytest.mark.parametrize("dtype", sorted(DTYPES))
+def test_round_trip(dtype):
+    X = np.array([[1.5, np.nan, 3.0], [4.0, 5.0, np.nan]])
+    decoded = decode_packed(encode_request(X, dtype), DTYPES[dtype], 3)
+    assert decoded.dtype == np.float64 and decoded.flags.c_contiguous
+    np.testing.assert_array_equal(decoded, X)
+
+
+@pytest.mark.parametrize("n_bytes", [1, 7, 8, 23, 3 * 8 + 1])
+def test_truncated_or_oversized_bodies_are_rejected(n_bytes):
+    # 3 float64 columns: only whole multiples of 24 bytes are valid bodies
+    with pytest.raises(ValueError, match="not a multiple of 24"):
+        decode_packed(b"\x00" * n_bytes, DTYPES["float64"], 3)
+
+
+def test_a_row_cut_off_mid_body_is_rejected():
+    body = encode_request(np.ones((10, 12)))
+    with pytest.raises(ValueError):
+        decode_packed(body[:-8], DTYPES["float64"], 12)
+    with pytest.raises(ValueError):
+        decode_packed(body + b"\x00" * 4, DTYPES["float64"], 12)
+
+
+def test_empty_body_decodes_to_no_rows():
+    assert decode_packed(b"", DTYPES["float32"], 12).shape == (0, 12)
+
+
+def test_unknown_dtype_is_rejected():
+    assert columnar_format.request_format("application/vnd.ckd.columnar") == ("packed", DTYPES["float64"])
+    with pytest.raises(ValueError, match="Unsupported dtype"):
+        columnar_format.request_format("application/vnd.ckd.columnar; dtype=int8")
+
+
+def test_error_masks():
+    bounds = (np.array([0.0, 0.0]), np.array([True, False]), np.array([10.0, 10.0]), np.array([True, True]))
+    X = np.array([
+        [0.0, 5.0],         # valid: lower bound of feature 0 is inclusive
+        [5.0, 0.0],         # feature 1 must be > 0
+        [np.inf, np.nan],   # infinity is out of range, NaN is missing
+        [np.nan, np.nan],   # nothing present
+    ])
+    masks = validate_matrix(X, bounds)
+    assert masks.tolist() == [0, 0b10, 0b01, NO_FEATURES_BIT]
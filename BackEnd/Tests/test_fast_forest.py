@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import MODEL_PATH
+from fast_forest import compile_pipeline, parity_probe, verify_parity
+from model_bundle import load_bundle
+
+
+@pytest.fixture(scope="module")
+def model():
+    bundle = load_bundle(MODEL_PATH)
+    return bundle["model"], [feature["name"] for feature in bundle["features"]]
+
+
+def test_checked_in_model_compiles_bit_for_bit(model):
+    pipeline, features = model
+    forest = compile_pipeline(pipeline, features)
+    assert verify_parity(pipeline, forest, features) == 512
+
+
+def test_parity_on_rows_with_every_feature_missing(model):
+    pipeline, features = model
+    forest = compile_pipeline(pipeline, features)
+    X = np.full((4, len(features)), np.nan)
+    assert verify_parity(pipeline, forest, features, X=X) == 4
+
+
+def test_verify_parity_rejects_a_diverging_forest(model):
+    pipeline, features = model
+    forest = compile_pipeline(pipeline, features)
+    X = parity_probe(forest, n_rows=64)
+    expected = pipeline.predict_proba(pd.DataFrame(X, columns=features))
+
+    class Perturbed:
+        def predict_proba(self, X):
+            return expected + 1e-3
+
+    with pytest.raises(AssertionError, match="differs"):
+        verify_parity(pipeline, Perturbed(), features, X=X)
+    with pytest.raises(AssertionError):
+        verify_parity(pipeline, Perturbed(), features, X=X, atol=1e-6)
+    assert verify_parity(pipeline, Perturbed(), features, X=X, atol=1e-2) == 64
+
+
+def test_explanation_arrays_are_built_on_first_use(model):
+    pipeline, features = model
+    forest = compile_pipeline(pipeline, features)
+    assert getattr(forest, "_delta", None) is None
+    X = parity_probe(forest, n_rows=8)
+    proba, contributions = forest.explain(X)
+    assert forest._delta is not None
+    np.testing.assert_allclose(forest.base_value + contributions.sum(axis=1), proba, atol=1e-9)
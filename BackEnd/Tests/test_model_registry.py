@@ -0,0 +1,77 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import MODEL_PATH
+from model_registry import ModelRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """A registry serving a copy of the checked-in model, with a different candidate next to it."""
+    import main
+
+    live_path, candidate_path = tmp_path / "live.pkl", tmp_path / "candidate.pkl"
+    shutil.copy(MODEL_PATH, live_path)
+    # Bytes after the pickle's STOP opcode are ignored on load but change the version hash
+    candidate_path.write_bytes(open(MODEL_PATH, "rb").read() + b"\n")
+    registry = ModelRegistry(str(live_path), main.FEATURE_COLUMNS, poll_interval=0,
+                             candidate_path=str(candidate_path))
+    registry.reload(force=True)
+    registry.reload_candidate(force=True)
+    return registry
+
+
+def test_promotion_is_refused_when_the_compared_pair_changed(registry):
+    live, candidate = registry.current, registry.candidate
+    assert live.version != candidate.version
+    with pytest.raises(RuntimeError, match="candidate is now"):
+        registry.promote_candidate(live.version, "0123456789ab")
+    with pytest.raises(RuntimeError, match="live model is now"):
+        registry.promote_candidate("0123456789ab", candidate.version)
+    assert registry.current is live and registry.candidate is candidate
+
+
+
+def test_promotion_leaves_the_loaded_states_untouched(registry):
+    live, candidate = registry.current, registry.candidate
+    candidate_path = candidate.path
+    promoted = registry.promote_candidate(live.version, candidate.version)
+
+    assert registry.current is promoted and registry.candidate is None
+    assert promoted.version == candidate.version and promoted.path == registry.path
+    # The snapshot the shadow scorer (or a request) may still hold keeps describing itself
+    assert candidate.path == candidate_path
+    assert not os.path.exists(candidate_path)
+
+
+def test_api_refuses_evidence_about_another_pair(client, monkeypatch, registry):
+    import main
+    from shadow_scoring import ShadowScorer, _Comparison
+
+    scorer = ShadowScorer(min_rows=1)
+    comparison = scorer._comparison = _Comparison(registry.current.version, "0123456789ab")
+    comparison.rows = 5
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "registry", registry)
+    monkeypatch.setattr(main, "shadow_scorer", scorer)
+
+    response = client.post("/admin/candidate/promote", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 409
+    assert response.json()["detail"].startswith("Only 0 rows compared")
+    assert registry.candidate is not None
+
+    comparison.candidate_version = registry.candidate.version
+    response = client.post("/admin/candidate/promote", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["evidence"]["rows_compared"] == 5
+
+
+def test_loading_with_explanations_defers_the_per_node_arrays():
+    import main
+
+    registry = ModelRegistry(MODEL_PATH, main.FEATURE_COLUMNS, poll_interval=0, backend="compiled", explain=True)
+    registry.reload(force=True)
+    assert registry.current.explainer is registry.current.engine
+    assert getattr(registry.current.explainer, "_delta", None) is None
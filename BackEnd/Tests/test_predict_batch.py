@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+
+import columnar_format
+
+VALID = {"age": 48, "bp": 80, "sg": 1.02, "hemo": 15.4}
+
+
+def test_invalid_rows_are_reported_without_failing_the_batch(client):
+    records = [VALID, {"age": -5}, {}, {"bp": "high"}, {**VALID, "age": 60}]
+    response = client.post("/predict/batch", json=records)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert (body["count"], body["scored"], body["failed"]) == (5, 2, 3)
+    assert [r["index"] for r in body["results"]] == [0, 4]
+    assert all(0.0 <= r["probability"] <= 1.0 for r in body["results"])
+    errors = {e["index"]: e["detail"] for e in body["errors"]}
+    assert sorted(errors) == [1, 2, 3]
+    assert errors[1][0]["loc"] == ["age"]
+    assert errors[2] == "No valid input features provided."
+    assert errors[3][0]["loc"] == ["bp"]
+
+
+def test_batch_rows_match_single_predictions(client):
+    records = [VALID, {"age": 70, "sc": 6.5, "hemo": 8.0}]
+    batch = client.post("/predict/batch", json=records).json()["results"]
+    for record, result in zip(records, batch):
+        single = client.post("/predict", json=record).json()
+        assert (single["prediction"], single["probability"]) == (result["prediction"], result["probability"])
+
+
+def test_ndjson_lines_are_numbered_like_array_rows(client):
+    body = "\n".join([json.dumps(VALID), json.dumps({"age": 500}), "", json.dumps(VALID)])
+    response = client.post("/predict/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    body = response.json()
+    assert (body["count"], body["scored"]) == (3, 2)
+    assert [e["index"] for e in body["errors"]] == [1]
+
+
+def test_empty_and_malformed_batches_are_rejected(client):
+    assert client.post("/predict/batch", json=[]).status_code == 400
+    assert client.post("/predict/batch", json={"age": 40}).status_code in (400, 422)
+    assert client.post("/predict/batch", content=b"[{", headers={"content-type": "application/json"}).status_code == 400
+
+
+def test_columnar_errors_match_json_errors(client):
+    import main
+
+    X = np.full((3, len(main.FEATURE_COLUMNS)), np.nan)
+    X[0, main.FEATURE_COLUMNS.index("age")] = 48
+    X[1, main.FEATURE_COLUMNS.index("age")] = -5
+    response = client.post("/predict/batch", content=columnar_format.encode_request(X),
+                           headers={"content-type": columnar_format.CONTENT_TYPE, "accept": "application/json"})
+    body = response.json()
+    assert (body["count"], body["scored"], body["failed"]) == (3, 1, 2)
+    errors = {e["index"]: e["detail"] for e in body["errors"]}
+    assert errors[1][0]["loc"] == ["age"]
+    assert errors[2] == "No valid input features provided."
+
+
+def test_batches_over_the_limit_are_rejected(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    assert client.post("/predict/batch", json=[VALID] * 3).status_code == 400
+    X = np.tile(48.0, (3, len(main.FEATURE_COLUMNS)))
+    response = client.post("/predict/batch", content=columnar_format.encode_request(X),
+                           headers={"content-type": columnar_format.CONTENT_TYPE})
+    assert response.status_code == 400
+    assert "too large" in response.json()["detail"]
@@ -0,0 +1,70 @@
+import numpy as np
+
+import prediction_cache
+from prediction_cache import PredictionCache
+
+
+def _key(i, version="v1"):
+    return PredictionCache.key(version, [float(i), 1.0])
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = PredictionCache(max_entries=3)
+    for i in range(3):
+        cache.put(_key(i), "ckd", 0.9)
+    assert cache.get(_key(0)) == ("ckd", 0.9)  # 0 is now the most recently used
+    cache.put(_key(3), "notckd", 0.2)
+
+    assert len(cache) == 3
+    assert cache.get(_key(1)) is None
+    assert all(cache.get(_key(i)) is not None for i in (0, 2, 3))
+    assert cache.evictions["capacity"] == 1
+
+
+def test_memory_bound_evicts_entries():
+    probe = PredictionCache()
+    probe.put(_key(0), "ckd", 0.9)
+    entry_bytes = probe.bytes
+
+    cache = PredictionCache(max_entries=1000, max_bytes=entry_bytes * 5)
+    for i in range(20):
+        cache.put(_key(i), "ckd", 0.9)
+    assert len(cache) == 5
+    assert cache.bytes <= cache.max_bytes
+    assert cache.evictions["capacity"] == 15
+
+
+def test_replacing_a_key_does_not_leak_bytes():
+    cache = PredictionCache()
+    for _ in range(10):
+        cache.put(_key(0), "ckd", 0.9)
+    single = PredictionCache()
+    single.put(_key(0), "ckd", 0.9)
+    assert (len(cache), cache.bytes) == (1, single.bytes)
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: now[0])
+    cache = PredictionCache(ttl_seconds=60)
+    cache.put(_key(0), "ckd", 0.9)
+    now[0] += 59
+    assert cache.get(_key(0)) is not None
+    now[0] += 2
+    assert cache.get(_key(0)) is None
+    assert (len(cache), cache.bytes, cache.evictions["ttl"]) == (0, 0, 1)
+
+
+def test_model_swap_clears_the_cache():
+    cache = PredictionCache()
+    for i in range(4):
+        cache.put(_key(i), "ckd", 0.9)
+    cache.on_model_swap(None, None)
+    assert (len(cache), cache.bytes, cache.evictions["model_swap"]) == (0, 0, 4)
+
+
+def test_keys_normalise_nan_and_negative_zero_and_include_the_version():
+    quiet_nan = np.float64("nan")
+    other_nan = np.frombuffer(np.uint64(0x7FF8000000000001).tobytes(), dtype=np.float64)[0]
+    assert PredictionCache.key("v1", [quiet_nan, 0.0]) == PredictionCache.key("v1", [other_nan, -0.0])
+    assert PredictionCache.key("v1", [1.0, 2.0]) != PredictionCache.key("v2", [1.0, 2.0])
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from scoring_pool import PoolNotReady, PoolSaturated, ScoringPool, ScoringTimeout
+
+
+class BlockingModel:
+    """predict_proba blocks until ``finish`` is set, then echoes its input (or fails)."""
+
+    version = "test"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.started = threading.Event()
+        self.finish = threading.Event()
+
+    def predict_proba(self, X):
+        self.started.set()
+        self.finish.wait(5)
+        if self.fail:
+            raise ValueError("model failed")
+        return X
+
+
+async def _until(condition, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_requests_before_start_are_not_ready():
+    pool = ScoringPool(workers=0)
+    with pytest.raises(PoolNotReady):
+        asyncio.run(pool.predict_proba(np.zeros((1, 2))))
+    assert pool.pending == 0
+
+
+def test_api_answers_503_until_the_pool_has_a_model(client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.scoring_pool, "_current", (None, None))
+    response = client.post("/predict", json={"age": 31.5, "bp": 71})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json() == {"detail": "Model is not loaded yet."}
+
+
+def test_pending_counts_jobs_until_they_finish():
+    async def scenario():
+        model = BlockingModel()
+        pool = ScoringPool(workers=0, max_pending=2, timeout=0.05)
+        pool.start(model)
+        with pytest.raises(ScoringTimeout):
+            await pool.predict_proba(np.zeros((1, 2)))
+        # The timed-out job still occupies its thread, so it is still counted
+        assert pool.pending == 1
+        model.finish.set()
+        await _until(lambda: pool.pending == 0)
+
+        pool.timeout = 5.0
+        proba, state = await pool.predict_proba(np.ones((1, 2)))
+        assert state is model and proba.tolist() == [[1.0, 1.0]]
+        assert pool.pending == 0
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_jobs_count_against_the_limit():
+    async def scenario():
+        model = BlockingModel()
+        pool = ScoringPool(workers=0, max_pending=2, timeout=0.05)
+        pool.start(model)
+        for _ in range(2):
+            with pytest.raises(ScoringTimeout):
+                await pool.predict_proba(np.zeros((1, 2)))
+        with pytest.raises(PoolSaturated):
+            await pool.predict_proba(np.zeros((1, 2)))
+        model.finish.set()
+        await _until(lambda: pool.pending == 0)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_and_failed_jobs_are_released_when_they_end():
+    async def scenario():
+        model = BlockingModel(fail=True)
+        pool = ScoringPool(workers=0, max_pending=4, timeout=5.0)
+        pool.start(model)
+        request = asyncio.ensure_future(pool.predict_proba(np.zeros((1, 2))))
+        await _until(model.started.is_set)
+        request.cancel()  # client gone; the job keeps running
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        assert pool.pending == 1
+        model.finish.set()
+        await _until(lambda: pool.pending == 0)
+
+        with pytest.raises(ValueError, match="model failed"):
+            await pool.predict_proba(np.zeros((1, 2)))
+        assert pool.pending == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+import numpy as np
+
+from shadow_scoring import ShadowScorer
+
+
+class FixedModel:
+    """A model state stand-in that answers fixed probabilities and counts its calls."""
+
+    def __init__(self, version, proba):
+        self.version = version
+        self.classes = np.array(["ckd", "notckd"], dtype=object)
+        self.model_classes = np.array([0, 1])
+        self.proba = np.asarray(proba, dtype=np.float64)
+        self.calls = 0
+
+    def predict_proba(self, X):
+        self.calls += 1
+        return np.repeat(self.proba[None, :], len(X), axis=0)
+
+    def describe(self):
+        return {"version": self.version}
+
+
+def _scorer(busy=False):
+    return ShadowScorer(sample_rate=1.0, min_rows=1, busy=lambda: busy, max_defer=0.01)
+
+
+def test_live_predictions_are_reused_not_recomputed():
+    live = FixedModel("live", [0.9, 0.1])
+    candidate = FixedModel("candidate", [0.3, 0.7])
+    scorer = _scorer()
+    scorer.set_candidate(candidate)
+    assert scorer.submit(np.zeros((2, 3)), live, ["ckd", "ckd"], [0.9, 0.9])
+    scorer.start()
+    scorer.close()
+
+    comparison = scorer.report()["comparison"]
+    assert live.calls == 0 and candidate.calls == 1
+    assert comparison["rows_compared"] == 2
+    assert comparison["agreement_rate"] == 0.0
+    assert comparison["disagreements"] == [{"live": "ckd", "candidate": "notckd", "rows": 2}]
+    assert comparison["probability_delta"]["mean"] == -0.6  # 0.3 - 0.9 for the live label
+
+
+def test_batches_still_busy_after_max_defer_are_dropped():
+    live = FixedModel("live", [0.9, 0.1])
+    candidate = FixedModel("candidate", [0.3, 0.7])
+    scorer = _scorer(busy=True)
+    scorer.set_candidate(candidate)
+    scorer.submit(np.zeros((3, 3)), live, ["ckd"] * 3, [0.9] * 3)
+    scorer.start()
+    scorer.close()
+
+    report = scorer.report()
+    assert candidate.calls == 0
+    assert report["skipped_busy_rows"] == 3
+    assert report["queued_rows"] == 0
+    assert report["comparison"] is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from stream_training import KLLSketch, MisraGries
+
+
+def _rank(sorted_data, value):
+    return np.searchsorted(sorted_data, value, side="right") / len(sorted_data)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_kll_rank_error(seed):
+    rng = np.random.default_rng(seed)
+    data = rng.lognormal(size=200000)
+    sketch = KLLSketch(k=256, seed=seed)
+    for chunk in np.array_split(data, 97):
+        sketch.update(chunk)
+
+    ordered = np.sort(data)
+    errors = [abs(_rank(ordered, sketch.quantile(q)) - q) for q in np.linspace(0.01, 0.99, 99)]
+    # Measured worst case over 20 seeds is ~0.012 at k=256
+    assert max(errors) < 0.02
+    assert sketch.size < 3 * sketch.k
+
+
+def test_kll_keeps_the_total_weight_and_skips_nan():
+    sketch = KLLSketch(k=16)
+    values = np.arange(10001, dtype=np.float64)
+    values[::100] = np.nan
+    for chunk in np.array_split(values, 13):
+        sketch.update(chunk)
+    assert sketch.n == 9900
+    assert sum(level.size * 2 ** h for h, level in enumerate(sketch.levels)) == sketch.n
+
+
+def test_kll_small_streams_are_exact():
+    sketch = KLLSketch(k=256)
+    sketch.update([3.0, 1.0, 2.0, np.nan])
+    assert [sketch.quantile(q) for q in (0.0, 0.5, 1.0)] == [1.0, 2.0, 3.0]
+    assert np.isnan(KLLSketch().quantile(0.5))
+
+
+def test_misra_gries_finds_a_frequent_mode_among_many_rare_values():
+    rng = np.random.default_rng(0)
+    rare = [f"v{i}" for i in rng.integers(0, 50000, size=20000)]
+    values = rare + ["common"] * 500
+    rng.shuffle(values)
+    counter = MisraGries(k=100)
+    for start in range(0, len(values), 1000):
+        counter.update(values[start:start + 1000])
+    assert len(counter.counts) <= 100
+    assert counter.mode() == "common"
+
+
+def test_misra_gries_ties_go_to_the_smallest_value():
+    counter = MisraGries(k=10)
+    counter.update(["b", "a", "b", "a", "c"])
+    assert counter.mode() == "a"
+    assert MisraGries().mode() == "missing"